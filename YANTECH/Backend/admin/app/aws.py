@@ -1,19 +1,13 @@
 """AWS service setup operations for admin service."""
-import boto3
 from typing import Dict, Any, List
+from . import aws_clients
 from .config import settings
 
 def setup_app_services(app: Any) -> Dict[str, Any]:
     """Set up AWS services (SES, SNS) for an application."""
     try:
-        ses = boto3.client(
-            "ses",
-            region_name=settings.AWS_REGION
-        )
-        sns = boto3.client(
-            "sns",
-            region_name=settings.AWS_REGION
-        )
+        ses = aws_clients.client("ses", settings.AWS_REGION)
+        sns = aws_clients.client("sns", settings.AWS_REGION)
     except Exception as e:
         raise RuntimeError(f"Failed to create AWS clients: {str(e)}")
 
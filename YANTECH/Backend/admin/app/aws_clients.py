@@ -0,0 +1,119 @@
+"""Shared, connection-pooled AWS clients.
+
+boto3 clients are thread-safe but expensive to build (tens of milliseconds
+each), and every client keeps its own connection pool. This registry creates
+one client (or resource) per service, region and endpoint on first use and
+hands the same instance to every caller, so connections are reused across
+requests and threads.
+
+The same module is used by the admin, requestor and worker services; keep the
+copies identical (``check_shared_modules.py``). Settings come from the environment:
+
+- ``AWS_MAX_POOL_CONNECTIONS``: connections per client; size it to the
+  number of threads calling AWS at once (default 50)
+- ``AWS_CONNECT_TIMEOUT`` / ``AWS_READ_TIMEOUT``: seconds (default 2 / 30;
+  the read timeout must exceed the SQS long-poll wait)
+- ``AWS_MAX_ATTEMPTS`` / ``AWS_RETRY_MODE``: default 5 attempts, ``adaptive``
+  retries with client-side rate limiting on throttling
+- ``AWS_TCP_KEEPALIVE``: keep idle pooled connections alive (default true)
+- ``AWS_BACKEND``: ``aws`` (default) or ``memory`` for the in-process
+  stand-ins in ``memory_backend``; ``install`` overrides a single service
+"""
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+import boto3
+from botocore.config import Config
+
+DEFAULT_REGION = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
+BACKEND = os.getenv("AWS_BACKEND", "aws").lower()
+
+_settings: Dict[str, Any] = {
+    "max_pool_connections": int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50")),
+    "connect_timeout": float(os.getenv("AWS_CONNECT_TIMEOUT", "2")),
+    "read_timeout": float(os.getenv("AWS_READ_TIMEOUT", "30")),
+    "max_attempts": int(os.getenv("AWS_MAX_ATTEMPTS", "5")),
+    "retry_mode": os.getenv("AWS_RETRY_MODE", "adaptive"),
+    "tcp_keepalive": os.getenv("AWS_TCP_KEEPALIVE", "true").lower() == "true",
+}
+
+_lock = threading.Lock()
+_session: Optional[boto3.session.Session] = None
+# (kind, service, region, endpoint) -> client or resource
+_instances: Dict[Tuple[str, str, str, Optional[str]], Any] = {}
+# service -> object returned for it regardless of kind, region or endpoint
+_installed: Dict[str, Any] = {}
+
+
+def configure(**settings: Any) -> None:
+    """Override settings (e.g. ``max_pool_connections``) for clients created afterwards."""
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError(f"Unknown AWS client settings: {', '.join(sorted(unknown))}")
+    with _lock:
+        _settings.update(settings)
+
+
+def client_config() -> Config:
+    """Return the botocore ``Config`` used for every shared client."""
+    return Config(
+        max_pool_connections=_settings["max_pool_connections"],
+        connect_timeout=_settings["connect_timeout"],
+        read_timeout=_settings["read_timeout"],
+        retries={"total_max_attempts": _settings["max_attempts"], "mode": _settings["retry_mode"]},
+        tcp_keepalive=_settings["tcp_keepalive"],
+    )
+
+
+def install(service: str, instance: Any) -> None:
+    """Serve ``instance`` for every client and resource of ``service``.
+
+    Lets several services loaded in one process share one stand-in (e.g. the
+    queue between requestor and worker), or a test substitute a fake.
+    """
+    with _lock:
+        _installed[service] = instance
+
+
+def _get(kind: str, service: str, region: Optional[str], endpoint_url: Optional[str]) -> Any:
+    global _session
+    installed = _installed.get(service)
+    if installed is not None:
+        return installed
+    key = (kind, service, region or DEFAULT_REGION, endpoint_url)
+    instance = _instances.get(key)
+    if instance is not None:
+        return instance
+    with _lock:
+        instance = _instances.get(key)
+        if instance is None and BACKEND == "memory":
+            from . import memory_backend
+            # One stand-in per service, whatever the kind or region, so all callers see the same state
+            instance = _installed[service] = memory_backend.create(service)
+        elif instance is None:
+            # boto3's default session is not safe to build clients from concurrently
+            if _session is None:
+                _session = boto3.session.Session()
+            factory = _session.client if kind == "client" else _session.resource
+            instance = factory(service, region_name=key[2], endpoint_url=endpoint_url, config=client_config())
+            _instances[key] = instance
+    return instance
+
+
+def client(service: str, region: Optional[str] = None, endpoint_url: Optional[str] = None) -> Any:
+    """Return the shared low-level client for ``service``."""
+    return _get("client", service, region, endpoint_url)
+
+
+def resource(service: str, region: Optional[str] = None, endpoint_url: Optional[str] = None) -> Any:
+    """Return the shared resource for ``service`` (e.g. DynamoDB tables)."""
+    return _get("resource", service, region, endpoint_url)
+
+
+def reset() -> None:
+    """Drop every shared client, e.g. after a fork or a credentials change."""
+    global _session
+    with _lock:
+        _instances.clear()
+        _installed.clear()
+        _session = None
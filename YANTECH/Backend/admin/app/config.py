@@ -12,6 +12,7 @@ class Settings:
     AWS_SECRET_ACCESS_KEY: Optional[str] = os.getenv("AWS_SECRET_ACCESS_KEY")
     AWS_ACCOUNT_ID: Optional[str] = os.getenv("AWS_ACCOUNT_ID")
     APP_CONFIG_TABLE: str = os.getenv("APP_CONFIG_TABLE", "Applications")
+    TEMPLATES_TABLE: str = os.getenv("TEMPLATES_TABLE", "YANTECH-YNP01-AWS-DYNAMODB-TEMPLATES-DEV")
 
 settings = Settings()
 
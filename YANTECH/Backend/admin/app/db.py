@@ -1,14 +1,11 @@
 """Database operations for admin service."""
-import boto3
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from . import aws_clients
 from .config import settings
 
 def get_dynamodb_resource() -> Any:
-    """Get DynamoDB resource client."""
-    return boto3.resource(
-        "dynamodb",
-        region_name=settings.AWS_REGION
-    )
+    """Get the shared DynamoDB resource."""
+    return aws_clients.resource("dynamodb", settings.AWS_REGION)
 
 def save_app_record(app_record: Dict[str, Any]) -> None:
     """Save application record to DynamoDB."""
@@ -53,3 +50,63 @@ def delete_app_record(app_id: str) -> None:
         table.delete_item(Key={"Application": app_id})
     except Exception as e:
         raise RuntimeError(f"Failed to delete app record: {str(e)}")
+
+def save_template(template_record: Dict[str, Any]) -> None:
+    """Save a message template to DynamoDB, replacing any with the same id."""
+    if not template_record or not isinstance(template_record, dict):
+        raise ValueError("Invalid template_record: must be a non-empty dictionary")
+    
+    try:
+        table = get_dynamodb_resource().Table(settings.TEMPLATES_TABLE)
+        table.put_item(Item=template_record)
+    except Exception as e:
+        raise RuntimeError(f"Failed to save template: {str(e)}")
+
+def get_app_templates(app_id: str) -> List[Dict[str, Any]]:
+    """Retrieve all message templates of an application."""
+    if not app_id or not isinstance(app_id, str):
+        raise ValueError("app_id must be a non-empty string")
+    
+    try:
+        table = get_dynamodb_resource().Table(settings.TEMPLATES_TABLE)
+        query = {
+            "KeyConditionExpression": "#app = :app",
+            "ExpressionAttributeNames": {"#app": "Application"},
+            "ExpressionAttributeValues": {":app": app_id},
+        }
+        items: List[Dict[str, Any]] = []
+        while True:
+            response = table.query(**query)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return items
+            query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    except Exception as e:
+        raise RuntimeError(f"Failed to retrieve templates: {str(e)}")
+
+def get_template(app_id: str, template_id: str) -> Optional[Dict[str, Any]]:
+    """Retrieve one message template, or None if it does not exist."""
+    if not app_id or not isinstance(app_id, str):
+        raise ValueError("app_id must be a non-empty string")
+    if not template_id or not isinstance(template_id, str):
+        raise ValueError("template_id must be a non-empty string")
+    
+    try:
+        table = get_dynamodb_resource().Table(settings.TEMPLATES_TABLE)
+        response = table.get_item(Key={"Application": app_id, "TemplateId": template_id})
+        return response.get("Item")
+    except Exception as e:
+        raise RuntimeError(f"Failed to retrieve template: {str(e)}")
+
+def delete_template(app_id: str, template_id: str) -> None:
+    """Delete a message template from DynamoDB."""
+    if not app_id or not isinstance(app_id, str):
+        raise ValueError("app_id must be a non-empty string")
+    if not template_id or not isinstance(template_id, str):
+        raise ValueError("template_id must be a non-empty string")
+    
+    try:
+        table = get_dynamodb_resource().Table(settings.TEMPLATES_TABLE)
+        table.delete_item(Key={"Application": app_id, "TemplateId": template_id})
+    except Exception as e:
+        raise RuntimeError(f"Failed to delete template: {str(e)}")
@@ -1,8 +1,12 @@
+from datetime import datetime, timezone
+from typing import Optional
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, EmailStr
 from fastapi.middleware.cors import CORSMiddleware
 # Removed AWS services import - admin only handles app registration
 from .db import save_app_record, get_all_apps, update_app_record, delete_app_record
+from .db import save_template, get_app_templates, get_template, delete_template
+from .templates import MessageTemplate, TemplateError
 
 app = FastAPI()
 
@@ -20,6 +24,14 @@ class AppRequest(BaseModel):
     Application: str
     Email: EmailStr
     Domain: str
+    # Needed to send PUSH to raw device tokens; without it PUSH goes to the app's topic
+    SNS_Platform_Application_ARN: Optional[str] = None
+
+class TemplateRequest(BaseModel):
+    TemplateId: Optional[str] = None  # Taken from the URL on update
+    Subject: Optional[str] = None
+    Html: Optional[str] = None
+    Text: Optional[str] = None
 
 @app.get("/health")
 def health_check():
@@ -46,6 +58,8 @@ def register_application(app_req: AppRequest):
             "role": "client",
             "Status": "ACTIVE"
         }
+        if app_req.SNS_Platform_Application_ARN:
+            app_record["SNS-Platform-Application-ARN"] = app_req.SNS_Platform_Application_ARN
         
         save_app_record(app_record)
         
@@ -77,6 +91,8 @@ def update_application(app_id: str, app_req: AppRequest):
             "Domain": app_req.Domain,
             "Status": "ACTIVE"
         }
+        if app_req.SNS_Platform_Application_ARN:
+            app_record["SNS-Platform-Application-ARN"] = app_req.SNS_Platform_Application_ARN
         
         update_app_record(app_id, app_record)
         
@@ -102,6 +118,82 @@ def delete_application(app_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _store_template(app_id: str, template_id: str, template_req: TemplateRequest) -> dict:
+    """Validate a template by compiling it, then save it."""
+    if not template_id:
+        raise HTTPException(status_code=422, detail="TemplateId is required")
+    try:
+        compiled = MessageTemplate(template_id, template_req.Subject, template_req.Html, template_req.Text)
+    except TemplateError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid template: {str(e)}")
+    
+    template_record = {
+        "Application": app_id,
+        "TemplateId": template_id,
+        "UpdatedAt": datetime.now(timezone.utc).isoformat(),
+    }
+    for part in ("Subject", "Html", "Text"):
+        if getattr(template_req, part):
+            template_record[part] = getattr(template_req, part)
+    save_template(template_record)
+    return {"template_id": template_id, "application": app_id, "variables": compiled.variables}
+
+@app.post("/applications/{app_id}/templates")
+def register_template(app_id: str, template_req: TemplateRequest):
+    """Register a message template; requests then send only TemplateId and Variables"""
+    try:
+        result = _store_template(app_id, template_req.TemplateId, template_req)
+        return dict(result, status="created", message="Template registered successfully")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/applications/{app_id}/templates")
+def list_templates(app_id: str):
+    """List the message templates of an application"""
+    try:
+        return get_app_templates(app_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/applications/{app_id}/templates/{template_id}")
+def read_template(app_id: str, template_id: str):
+    """Get one message template"""
+    try:
+        template_record = get_template(app_id, template_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if template_record is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template_record
+
+@app.put("/applications/{app_id}/templates/{template_id}")
+def update_template(app_id: str, template_id: str, template_req: TemplateRequest):
+    """Replace a message template. Workers pick up the change within TEMPLATE_CACHE_TTL"""
+    try:
+        result = _store_template(app_id, template_id, template_req)
+        return dict(result, status="updated", message="Template updated successfully")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/applications/{app_id}/templates/{template_id}")
+def remove_template(app_id: str, template_id: str):
+    """Delete a message template"""
+    try:
+        delete_template(app_id, template_id)
+        
+        return {
+            "status": "deleted",
+            "application": app_id,
+            "template_id": template_id,
+            "message": "Template deleted successfully"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/applications/{app_id}/api-key")
 def create_application_api_key(app_id: str, api_key_req: ApiKeyRequest):
     """Create a new API key for an application"""
@@ -0,0 +1,105 @@
+"""Per-application message templates.
+
+Applications register templates through the admin service: a ``Subject``
+and an ``Html`` and/or ``Text`` part, each of which may contain
+placeholders such as ``{{ first_name }}`` or ``{{ order.total }}``.
+Notification requests then carry only ``TemplateId`` and ``Variables``, and
+the worker renders the message. Values are HTML-escaped in the ``Html``
+part and inserted as they are elsewhere. A placeholder whose variable is
+missing is an error, so a message is never sent with a hole in it.
+
+Templates are parsed once into a list of literal and placeholder parts;
+rendering is a single join over that list.
+
+The same module is used by the admin and worker services; keep the copies
+identical (``check_shared_modules.py``).
+"""
+import html
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)\s*\}\}")
+PARTS = ("Subject", "Html", "Text")
+MAX_TEMPLATE_LENGTH = 256 * 1024  # Characters per part
+
+_Segment = Union[str, Tuple[str, ...]]
+
+
+class TemplateError(ValueError):
+    """Raised for a template that cannot be parsed or variables that cannot fill it."""
+
+
+class CompiledTemplate:
+    """One parsed template part."""
+    def __init__(self, source: str) -> None:
+        if len(source) > MAX_TEMPLATE_LENGTH:
+            raise TemplateError(f"Template is longer than {MAX_TEMPLATE_LENGTH} characters")
+        self.source = source
+        self.segments: List[_Segment] = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source):
+            self._literal(source[position:match.start()])
+            self.segments.append(tuple(match.group(1).split(".")))
+            position = match.end()
+        self._literal(source[position:])
+
+    def _literal(self, text: str) -> None:
+        if "{{" in text or "}}" in text:
+            raise TemplateError(f"Invalid placeholder near: {text[max(0, text.find('{{')):][:40]!r}")
+        if text:
+            self.segments.append(text)
+
+    @property
+    def variables(self) -> Set[str]:
+        """Top-level variable names the template uses."""
+        return {segment[0] for segment in self.segments if isinstance(segment, tuple)}
+
+    def render(self, variables: Dict[str, Any], escape: bool = False) -> str:
+        out = []
+        for segment in self.segments:
+            if isinstance(segment, str):
+                out.append(segment)
+                continue
+            value: Any = variables
+            for name in segment:
+                if not isinstance(value, dict) or name not in value:
+                    raise TemplateError(f"Missing template variable: {'.'.join(segment)}")
+                value = value[name]
+            text = "" if value is None else str(value)
+            out.append(html.escape(text) if escape else text)
+        return "".join(out)
+
+
+class MessageTemplate:
+    """A registered template: compiled ``Subject``, ``Html`` and ``Text`` parts."""
+    def __init__(self, template_id: str, subject: Optional[str] = None, html_part: Optional[str] = None, text_part: Optional[str] = None) -> None:
+        if not html_part and not text_part:
+            raise TemplateError("A template needs an Html or a Text part")
+        self.template_id = template_id
+        self.subject = CompiledTemplate(subject) if subject else None
+        self.html = CompiledTemplate(html_part) if html_part else None
+        self.text = CompiledTemplate(text_part) if text_part else None
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "MessageTemplate":
+        """Build a template from its stored record."""
+        return cls(item["TemplateId"], item.get("Subject"), item.get("Html"), item.get("Text"))
+
+    @property
+    def variables(self) -> List[str]:
+        names: Set[str] = set()
+        for part in (self.subject, self.html, self.text):
+            if part is not None:
+                names |= part.variables
+        return sorted(names)
+
+    def render(self, variables: Optional[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """Return the rendered ``Subject``, ``Html`` and ``Text``; parts the template lacks are None."""
+        if variables is not None and not isinstance(variables, dict):
+            raise TemplateError("Variables must be an object")
+        variables = variables or {}
+        return {
+            "Subject": self.subject.render(variables) if self.subject else None,
+            "Html": self.html.render(variables, escape=True) if self.html else None,
+            "Text": self.text.render(variables) if self.text else None,
+        }
@@ -13,8 +13,8 @@ import secrets
 import hashlib
 import os
 import uuid
-import boto3
 from botocore.exceptions import ClientError
+from app import aws_clients
 
 # Environment Configuration
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
@@ -31,13 +31,9 @@ DYNAMODB_ENDPOINT = os.getenv("DYNAMODB_ENDPOINT")  # For local development
 APPLICATIONS_TABLE = os.getenv("APPLICATIONS_TABLE", "applications")
 API_KEYS_TABLE = os.getenv("API_KEYS_TABLE", "api_keys")
 
-# Initialize DynamoDB resource
-dynamodb_config = {"region_name": AWS_REGION}
-if DYNAMODB_ENDPOINT:
-    dynamodb_config["endpoint_url"] = DYNAMODB_ENDPOINT
-
-dynamodb = boto3.resource("dynamodb", **dynamodb_config)
-dynamodb_client = boto3.client("dynamodb", **dynamodb_config)
+# Shared, connection-pooled DynamoDB resource and client
+dynamodb = aws_clients.resource("dynamodb", AWS_REGION, DYNAMODB_ENDPOINT)
+dynamodb_client = aws_clients.client("dynamodb", AWS_REGION, DYNAMODB_ENDPOINT)
 
 
 # Helper function to convert datetime to ISO string for DynamoDB
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""End-to-end throughput and latency benchmark for requestor + worker.
+
+Runs the requestor (behind uvicorn) and the worker in this process against
+the in-memory AWS stand-ins (``AWS_BACKEND=memory``), drives
+``POST /notifications`` at a fixed open-loop rate and reports latency
+percentiles and sustained throughput as JSON.
+
+Latency is measured from each request's *scheduled* send time, so client-side
+queueing under overload is counted instead of hidden:
+
+- ``api_latency_ms``: scheduled send -> HTTP response from the requestor
+- ``e2e_latency_ms``: scheduled send -> SES/SNS call made by the worker
+
+Usage::
+
+    python benchmark.py --rate 200 --duration 30 --mix EMAIL=2,SMS=1,PUSH=1
+    python benchmark.py --rate 300 --priorities high=1,bulk=9 --env WORKER_CONCURRENCY=20
+    python benchmark.py --rate 500 --ses-latency 0.05 --env WORKER_CONCURRENCY=50 --output results.json
+
+Requires the requestor and worker requirements (FastAPI, uvicorn, boto3).
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+QUEUE_URL = "https://sqs.local/000000000000/benchmark-queue"
+HIGH_QUEUE_URL = "https://sqs.local/000000000000/benchmark-queue-high"
+BULK_QUEUE_URL = "https://sqs.local/000000000000/benchmark-queue-bulk"
+DLQ_URL = "https://sqs.local/000000000000/benchmark-dlq"
+PLATFORM_ARN = "arn:aws:sns:us-east-1:000000000000:app/GCM/benchmark"
+MARKER = re.compile(r"bench-(\d+)")
+
+
+def load_service(alias: str, service: str) -> Any:
+    """Import ``<service>/app`` as package ``alias`` so both services' ``app`` packages can coexist."""
+    package_dir = os.path.join(BACKEND_DIR, service, "app")
+    spec = importlib.util.spec_from_file_location(
+        alias, os.path.join(package_dir, "__init__.py"), submodule_search_locations=[package_dir]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[alias] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def _parse_weights(value: str, allowed: Tuple[str, ...], what: str) -> List[Tuple[str, float]]:
+    mix = []
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip().upper()
+        if name not in allowed:
+            raise argparse.ArgumentTypeError(f"Unknown {what}: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def parse_mix(value: str) -> List[Tuple[str, float]]:
+    return _parse_weights(value, ("EMAIL", "SMS", "PUSH"), "OutputType in mix")
+
+
+def parse_priorities(value: str) -> List[Tuple[str, float]]:
+    return [(tier.lower(), weight) for tier, weight in _parse_weights(value, ("HIGH", "NORMAL", "BULK"), "priority tier")]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+class DeliveryRecorder:
+    """Wraps the SES/SNS stand-ins to timestamp every benchmark message they receive."""
+    def __init__(self) -> None:
+        self.delivered: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, text: str) -> None:
+        match = MARKER.search(text or "")
+        if match:
+            now = time.perf_counter()
+            with self._lock:
+                self.delivered.setdefault(int(match.group(1)), now)
+
+    def wrap(self, ses: Any, sns: Any) -> None:
+        send_email, publish, publish_batch = ses.send_email, sns.publish, sns.publish_batch
+
+        def recording_send_email(**kwargs: Any) -> Dict[str, Any]:
+            response = send_email(**kwargs)
+            self._record(kwargs["Message"]["Body"]["Text"]["Data"])
+            return response
+
+        def recording_publish(**kwargs: Any) -> Dict[str, Any]:
+            response = publish(**kwargs)
+            self._record(kwargs.get("Message", ""))
+            return response
+
+        def recording_publish_batch(**kwargs: Any) -> Dict[str, Any]:
+            response = publish_batch(**kwargs)
+            succeeded = {entry["Id"] for entry in response.get("Successful", [])}
+            for entry in kwargs["PublishBatchRequestEntries"]:
+                if entry["Id"] in succeeded:
+                    self._record(entry["Message"])
+            return response
+
+        ses.send_email = recording_send_email
+        sns.publish = recording_publish
+        sns.publish_batch = recording_publish_batch
+
+
+class LoadGenerator:
+    """Open-loop client: request ``i`` is due at ``start + i / rate`` whatever happened before."""
+    def __init__(
+        self, port: int, rate: float, duration: float, mix: List[Tuple[str, float]], apps: int, concurrency: int,
+        priorities: Optional[List[Tuple[str, float]]] = None,
+    ) -> None:
+        self.port = port
+        self.rate = rate
+        self.duration = duration
+        self.mix = mix
+        self.apps = apps
+        self.concurrency = concurrency
+        self.scheduled: Dict[int, float] = {}
+        self.priorities = priorities
+        self.output_types: Dict[int, str] = {}
+        self.tiers: Dict[int, str] = {}
+        self.api_latency: List[float] = []
+        self.accepted: List[int] = []
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        return connection
+
+    def _payload(self, seq: int, output_type: str) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "Application": f"bench-app-{seq % self.apps}",
+            "Recipient": f"user-{seq}",
+            "Subject": "Benchmark",
+            "Message": f"bench-{seq}",
+            "OutputType": output_type,
+            "Interval": {},
+        }
+        if seq in self.tiers:
+            payload["Priority"] = self.tiers[seq]
+        if output_type == "EMAIL":
+            payload["EmailAddresses"] = [f"user-{seq}@example.com"]
+        elif output_type == "SMS":
+            payload["PhoneNumber"] = f"+1555{seq % 10000000:07d}"
+        else:
+            payload["PushToken"] = f"token-{seq % 1000}"
+        return payload
+
+    def _send(self, seq: int) -> None:
+        body = json.dumps(self._payload(seq, self.output_types[seq]))
+        error = None
+        try:
+            connection = self._connection()
+            connection.request("POST", "/notifications", body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                error = f"HTTP {response.status}"
+        except Exception as e:
+            self._local.connection = None
+            error = type(e).__name__
+        finished = time.perf_counter()
+        with self._lock:
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+            else:
+                self.accepted.append(seq)
+                self.api_latency.append((finished - self.scheduled[seq]) * 1000)
+
+    def run(self) -> float:
+        """Send for ``duration`` seconds; returns the start time."""
+        total = int(self.rate * self.duration)
+        types, weights = zip(*self.mix)
+        start = time.perf_counter() + 0.1
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bench-client") as pool:
+            for seq in range(total):
+                due = start + seq / self.rate
+                self.scheduled[seq] = due
+                self.output_types[seq] = random.choices(types, weights)[0]
+                if self.priorities:
+                    self.tiers[seq] = random.choices(*zip(*self.priorities))[0]
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self._send, seq)
+        return start
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark requestor + worker end to end against in-memory AWS stand-ins.")
+    parser.add_argument("--rate", type=float, default=100, help="Requests per second (open loop)")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("EMAIL=1,SMS=1,PUSH=1"), help="OutputType weights, e.g. EMAIL=2,SMS=1,PUSH=1")
+    parser.add_argument("--priorities", type=parse_priorities, help="Priority tier weights, e.g. high=1,bulk=9 (one queue per tier)")
+    parser.add_argument("--apps", type=int, default=5, help="Number of distinct applications")
+    parser.add_argument("--client-concurrency", type=int, default=64, help="Max requests in flight from the load generator")
+    parser.add_argument("--drain-timeout", type=float, default=30, help="Seconds to wait for deliveries after the load stops")
+    parser.add_argument("--ses-latency", type=float, default=0.0, help="Simulated SES call latency in seconds")
+    parser.add_argument("--sns-latency", type=float, default=0.0, help="Simulated SNS call latency in seconds")
+    parser.add_argument("--sqs-latency", type=float, default=0.0, help="Simulated SQS call latency in seconds")
+    parser.add_argument("--dynamodb-latency", type=float, default=0.0, help="Simulated DynamoDB call latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Injected SES/SNS failure rate (0..1)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra service setting, e.g. WORKER_CONCURRENCY=50 (repeatable)")
+    parser.add_argument("--output", help="Write the JSON result to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Services read their settings at import time
+    settings = {
+        "AWS_BACKEND": "memory",
+        "SQS_QUEUE_URL": QUEUE_URL,
+        "SQS_DLQ_URL": DLQ_URL,
+        "METRICS_PORT": "0",
+        "SCHEDULER_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+        # Keep stdout for the JSON result; the in-process worker logs there by default
+        "LOG_STREAM": "stderr",
+        # Measure the pipeline, not the account send quotas
+        "SES_MAX_SEND_RATE": "0",
+        "SNS_SMS_MAX_SEND_RATE": "0",
+        "SNS_PUSH_MAX_SEND_RATE": "0",
+        # Retry injected failures within the drain timeout instead of after a visibility timeout
+        "RETRY_BASE_DELAY": "1",
+        "MEMORY_SES_LATENCY": str(args.ses_latency),
+        "MEMORY_SNS_LATENCY": str(args.sns_latency),
+        "MEMORY_SQS_LATENCY": str(args.sqs_latency),
+        "MEMORY_DYNAMODB_LATENCY": str(args.dynamodb_latency),
+        "MEMORY_SES_FAILURE_RATE": str(args.failure_rate),
+        "MEMORY_SNS_FAILURE_RATE": str(args.failure_rate),
+    }
+    if args.priorities:
+        settings.update(SQS_HIGH_PRIORITY_QUEUE_URL=HIGH_QUEUE_URL, SQS_BULK_QUEUE_URL=BULK_QUEUE_URL)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        settings[key.strip()] = value
+    os.environ.update(settings)
+
+    import logging
+    import uvicorn
+
+    worker = load_service("bench_worker", "worker")
+    requestor = load_service("bench_requestor", "requestor")
+    worker_clients = importlib.import_module("bench_worker.aws_clients")
+    requestor_clients = importlib.import_module("bench_requestor.aws_clients")
+    worker_config = importlib.import_module("bench_worker.config")
+    worker_main = importlib.import_module("bench_worker.main")
+    requestor_main = importlib.import_module("bench_requestor.main")
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # One set of stand-ins shared by both services: the requestor's queue is the worker's queue
+    for service in ("sqs", "ses", "sns", "dynamodb"):
+        instance = worker_clients.client(service)
+        requestor_clients.install(service, instance)
+    applications = worker_clients.resource("dynamodb").Table(worker_config.APPLICATIONS_TABLE)
+    for index in range(args.apps):
+        applications.put_item(Item={
+            "Application": f"bench-app-{index}",
+            "SES-Domain-ARN": "arn:aws:ses:us-east-1:000000000000:identity/example.com",
+            "SNS-Topic-ARN": f"arn:aws:sns:us-east-1:000000000000:bench-app-{index}",
+            "SNS-Platform-Application-ARN": PLATFORM_ARN,
+        })
+    recorder = DeliveryRecorder()
+    recorder.wrap(worker_clients.client("ses"), worker_clients.client("sns"))
+
+    stop_event = threading.Event()
+    worker_thread = threading.Thread(target=worker_main.run_worker, args=(stop_event, 0), name="bench-worker", daemon=True)
+    worker_thread.start()
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(requestor_main.app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    server_thread = threading.Thread(target=server.run, name="bench-requestor", daemon=True)
+    server_thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    generator = LoadGenerator(port, args.rate, args.duration, args.mix, args.apps, args.client_concurrency, args.priorities)
+    started = generator.run()
+    sending_done = time.perf_counter()
+
+    accepted = set(generator.accepted)
+    deadline = time.perf_counter() + args.drain_timeout
+    while time.perf_counter() < deadline and not accepted <= recorder.delivered.keys():
+        time.sleep(0.05)
+
+    stop_event.set()
+    worker_thread.join(timeout=30)
+    server.should_exit = True
+    server_thread.join(timeout=10)
+
+    delivered = {seq: at for seq, at in recorder.delivered.items() if seq in accepted}
+    e2e = [(at - generator.scheduled[seq]) * 1000 for seq, at in delivered.items()]
+    by_type: Dict[str, List[float]] = {}
+    by_tier: Dict[str, List[float]] = {}
+    for seq, at in delivered.items():
+        by_type.setdefault(generator.output_types[seq], []).append((at - generator.scheduled[seq]) * 1000)
+        if seq in generator.tiers:
+            by_tier.setdefault(generator.tiers[seq], []).append((at - generator.scheduled[seq]) * 1000)
+    last_delivery = max(delivered.values(), default=started)
+    elapsed = max(last_delivery - started, 1e-9)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "rate": args.rate,
+            "duration": args.duration,
+            "mix": dict(args.mix),
+            "priorities": dict(args.priorities or []),
+            "apps": args.apps,
+            "client_concurrency": args.client_concurrency,
+            "settings": {key: value for key, value in settings.items() if "QUEUE_URL" not in key and key != "SQS_DLQ_URL"},
+        },
+        "requests": {
+            "sent": len(generator.scheduled),
+            "accepted": len(accepted),
+            "errors": generator.errors,
+            "achieved_rate": round(len(generator.scheduled) / max(sending_done - started, 1e-9), 2),
+        },
+        "deliveries": {
+            "delivered": len(delivered),
+            "missing": len(accepted) - len(delivered),
+            "messages_per_second": round(len(delivered) / elapsed, 2),
+        },
+        "api_latency_ms": percentiles(generator.api_latency),
+        "e2e_latency_ms": percentiles(e2e),
+        "e2e_latency_ms_by_output_type": {output_type: percentiles(samples) for output_type, samples in sorted(by_type.items())},
+        "e2e_latency_ms_by_priority": {tier: percentiles(samples) for tier, samples in sorted(by_tier.items())},
+    }
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Check that the modules shared between services are identical.
+
+Each service image is built with its own directory as the Docker build
+context (``./admin``, ``./requestor``, ``./worker``), so a module used by
+more than one service is copied into each ``app/`` package rather than
+installed from a common one. This script fails, printing a diff, as soon as
+one copy differs from the first.
+
+Usage::
+
+    python check_shared_modules.py
+"""
+import difflib
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+# Module -> services that ship a copy of it
+SHARED_MODULES = {
+    "aws_clients.py": ("admin", "requestor", "worker"),
+    "memory_backend.py": ("admin", "requestor", "worker"),
+    "memory_messaging.py": ("requestor", "worker"),
+    "envelope.py": ("requestor", "worker"),
+    "recurrence.py": ("requestor", "worker"),
+    "templates.py": ("admin", "worker"),
+}
+
+
+def check() -> int:
+    """Print a diff for every copy that differs from the first; return the number of such copies."""
+    drifted = 0
+    for name, services in SHARED_MODULES.items():
+        paths = [ROOT / service / "app" / name for service in services]
+        reference = paths[0].read_text().splitlines(keepends=True)
+        for path in paths[1:]:
+            copy = path.read_text().splitlines(keepends=True)
+            if copy == reference:
+                continue
+            drifted += 1
+            sys.stdout.writelines(difflib.unified_diff(reference, copy, str(paths[0].relative_to(ROOT)), str(path.relative_to(ROOT))))
+    return drifted
+
+
+def main() -> None:
+    drifted = check()
+    if drifted:
+        print(f"{drifted} shared module copies differ; apply the same change to every copy", file=sys.stderr)
+        sys.exit(1)
+    print(f"{len(SHARED_MODULES)} shared modules identical")
+
+
+if __name__ == "__main__":
+    main()
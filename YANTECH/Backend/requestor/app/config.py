@@ -9,6 +9,19 @@ class Settings:
     """Application settings loaded from environment variables."""
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
     SQS_QUEUE_URL: Optional[str] = os.getenv("SQS_QUEUE_URL")
+    SCHEDULE_TABLE: str = os.getenv("SCHEDULE_TABLE", "YANTECH-YNP01-AWS-DYNAMODB-SCHEDULES-DEV")
+    # Priority tiers: empty URLs fall back to SQS_QUEUE_URL
+    SQS_HIGH_PRIORITY_QUEUE_URL: str = os.getenv("SQS_HIGH_PRIORITY_QUEUE_URL", "")
+    SQS_BULK_QUEUE_URL: str = os.getenv("SQS_BULK_QUEUE_URL", "")
+    DEFAULT_PRIORITY: str = os.getenv("DEFAULT_PRIORITY", "normal")
+    # e.g. "auth-service=high,newsletter=bulk": an application's tier and the highest it may request
+    APPLICATION_PRIORITIES: str = os.getenv("APPLICATION_PRIORITIES", "")
+    # POST /notifications/batch
+    BATCH_MAX_NOTIFICATIONS: int = int(os.getenv("BATCH_MAX_NOTIFICATIONS", "1000"))
+    SQS_BATCH_CONCURRENCY: int = int(os.getenv("SQS_BATCH_CONCURRENCY", "8"))  # SendMessageBatch calls in parallel
+    # Coalesce concurrent POST /notifications sends into SendMessageBatch calls
+    SQS_COALESCE_ENABLED: bool = os.getenv("SQS_COALESCE_ENABLED", "true").lower() == "true"
+    SQS_COALESCE_MAX_WAIT: float = float(os.getenv("SQS_COALESCE_MAX_WAIT", "0.005"))  # Seconds a send may wait for company
     
     def __post_init__(self) -> None:
         """Validate required environment variables."""
@@ -0,0 +1,198 @@
+"""Message envelopes: compression and claim-check storage for large payloads.
+
+SQS bills every started 64 KB of a message and rejects bodies over 256 KB, so
+notification requests are encoded before they are queued:
+
+- bodies under ``PAYLOAD_COMPRESS_THRESHOLD`` bytes are sent as plain JSON,
+  exactly as before
+- larger bodies are gzipped and base64-encoded into an envelope, when that
+  makes them smaller
+- bodies that are still over ``PAYLOAD_MAX_INLINE`` bytes are stored
+  (gzipped) under ``PAYLOAD_STORE_URL`` and only a reference is queued
+
+``PAYLOAD_STORE_URL`` is ``s3://bucket/prefix`` or, for local runs and
+tests, ``file:///some/directory``. Stored payloads are never deleted by the
+services (a message may be retried or redriven); expire them with a bucket
+lifecycle rule on the prefix. Envelopes keep ``Application``,
+``OutputType`` and ``Priority`` readable so tools can group and route
+messages without resolving them.
+
+The same module is used by the requestor and worker services; keep the copies
+identical (``check_shared_modules.py``).
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from . import aws_clients
+
+COMPRESS_THRESHOLD = int(os.getenv("PAYLOAD_COMPRESS_THRESHOLD", "8192"))  # 0 disables compression
+MAX_INLINE = int(os.getenv("PAYLOAD_MAX_INLINE", "245760"))  # Leaves room under 256 KB for attributes
+STORE_URL = os.getenv("PAYLOAD_STORE_URL", "").rstrip("/")
+CACHE_BYTES = int(os.getenv("PAYLOAD_CACHE_BYTES", str(64 * 1024 * 1024)))  # Resolved payloads kept in memory
+
+ENVELOPE_KEY = "Envelope"
+GZIP = "gzip"
+REFERENCE = "ref"
+# Fields copied into every envelope so it can be routed and summarized unresolved
+_HEADER_FIELDS = ("Application", "OutputType", "Priority")
+
+
+def _dumps(message: Dict[str, Any]) -> str:
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def _header(message: Dict[str, Any], kind: str) -> Dict[str, Any]:
+    header: Dict[str, Any] = {ENVELOPE_KEY: kind}
+    for field in _HEADER_FIELDS:
+        if field in message:
+            header[field] = message[field]
+    return header
+
+
+def _store_location(key: str) -> Tuple[str, str, str]:
+    """Split a store URL into ``(scheme, bucket, key)``; file URLs have no bucket and a path as key."""
+    parsed = urlparse(key)
+    if parsed.scheme == "s3":
+        return "s3", parsed.netloc, parsed.path.lstrip("/")
+    if parsed.scheme == "file":
+        return "file", "", parsed.path
+    raise ValueError(f"Unsupported payload store URL: {key}")
+
+
+def _put_blob(data: bytes) -> str:
+    if not STORE_URL:
+        raise ValueError(
+            f"Payload of {len(data)} compressed bytes exceeds PAYLOAD_MAX_INLINE and PAYLOAD_STORE_URL is not set"
+        )
+    name = datetime.now(timezone.utc).strftime("%Y/%m/%d/") + f"{uuid.uuid4().hex}.json.gz"
+    location = f"{STORE_URL}/{name}"
+    scheme, bucket, key = _store_location(location)
+    if scheme == "s3":
+        aws_clients.client("s3").put_object(
+            Bucket=bucket, Key=key, Body=data, ContentType="application/json", ContentEncoding="gzip"
+        )
+    else:
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        # Write then rename so a reader never sees a partial file
+        with open(key + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(key + ".tmp", key)
+    return location
+
+
+def _get_blob(location: str) -> bytes:
+    # Only read from the configured store: a message must not name arbitrary objects or files
+    if not STORE_URL or not location.startswith(STORE_URL + "/") or ".." in location:
+        raise ValueError(f"Payload location is outside PAYLOAD_STORE_URL: {location}")
+    scheme, bucket, key = _store_location(location)
+    if scheme == "s3":
+        return aws_clients.client("s3").get_object(Bucket=bucket, Key=key)["Body"].read()
+    with open(key, "rb") as f:
+        return f.read()
+
+
+def encode(message: Dict[str, Any]) -> str:
+    """Return the SQS message body for ``message``, compressed or stored as needed."""
+    if not message or not isinstance(message, dict):
+        raise ValueError("message must be a non-empty dictionary")
+    text = _dumps(message)
+    raw = text.encode("utf-8")
+    fits = len(raw) <= MAX_INLINE
+    if fits and not (COMPRESS_THRESHOLD and len(raw) >= COMPRESS_THRESHOLD):
+        return text
+    compressed = gzip.compress(raw, compresslevel=6)
+    body = _dumps(dict(_header(message, GZIP), Data=base64.b64encode(compressed).decode("ascii")))
+    size = len(body.encode("utf-8"))
+    if size <= MAX_INLINE and (size < len(raw) or not fits):
+        return body
+    if fits:
+        # Compresses badly: cheaper to send as it is
+        return text
+    location = _put_blob(compressed)
+    reference = dict(
+        _header(message, REFERENCE),
+        Location=location,
+        Size=len(compressed),
+        Sha256=hashlib.sha256(compressed).hexdigest(),
+    )
+    return _dumps(reference)
+
+
+class _PayloadCache:
+    """LRU of resolved payload text, bounded by total size. Stored payloads never change."""
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, location: str) -> Optional[str]:
+        with self._lock:
+            text = self._data.get(location)
+            if text is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(location)
+            self.hits += 1
+            return text
+
+    def set(self, location: str, text: str) -> None:
+        if len(text) > self.max_bytes:
+            return
+        with self._lock:
+            if location in self._data:
+                return
+            self._data[location] = text
+            self.size += len(text)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+
+payload_cache = _PayloadCache(CACHE_BYTES)
+
+
+def _resolve(envelope: Dict[str, Any]) -> str:
+    location = envelope["Location"]
+    text = payload_cache.get(location)
+    if text is not None:
+        return text
+    data = _get_blob(location)
+    if envelope.get("Sha256") and hashlib.sha256(data).hexdigest() != envelope["Sha256"]:
+        raise ValueError(f"Stored payload does not match its checksum: {location}")
+    text = gzip.decompress(data).decode("utf-8")
+    payload_cache.set(location, text)
+    return text
+
+
+def decode(body: str) -> Dict[str, Any]:
+    """Return the notification request carried by an SQS message body.
+
+    Plain JSON bodies (including those queued before envelopes existed) are
+    returned as they are.
+    """
+    message = json.loads(body)
+    if not isinstance(message, dict) or ENVELOPE_KEY not in message:
+        return message
+    kind = message[ENVELOPE_KEY]
+    if kind == GZIP:
+        text = gzip.decompress(base64.b64decode(message["Data"])).decode("utf-8")
+    elif kind == REFERENCE:
+        text = _resolve(message)
+    else:
+        raise ValueError(f"Unknown message envelope: {kind}")
+    return json.loads(text)
@@ -1,12 +1,18 @@
 """Main FastAPI application for requestor service."""
 from fastapi import FastAPI, HTTPException
-from typing import Dict, Any
-from .models import NotificationRequest
-from .sqs_client import send_message_to_queue
+from pydantic import ValidationError
+from typing import Dict, Any, List, Tuple
+from .config import settings
+from .models import BatchNotificationRequest, NotificationRequest
+from .sqs_client import get_sqs_client, send_message_to_queue, send_messages_to_queue
+from . import priority
+from .recurrence import first_run, is_recurring
+from .schedule_store import save_schedule, format_due, MAX_DELAY_SECONDS
+from datetime import datetime, timezone
 import logging
-import boto3
 import os
 import time
+import uuid
 
 app = FastAPI()
 
@@ -29,7 +35,8 @@ async def startup_event() -> None:
     # Test SQS connectivity with timing
     sqs_start = time.time()
     try:
-        sqs = boto3.client('sqs', region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+        # Also builds the shared client and opens its first pooled connection
+        sqs = get_sqs_client()
         queue_url = os.getenv('SQS_QUEUE_URL')
         if queue_url:
             sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['QueueArn'])
@@ -58,22 +65,69 @@ def health_check() -> Dict[str, Any]:
     logging.info(f"✅ Health check passed in {health_time:.3f}s")
     return {"status": "ok", "service": "requestor", "ready": True}
 
+def _plan(req: NotificationRequest, now: datetime) -> Dict[str, Any]:
+    """Resolve a request's tier and due time, and decide how it is sent.
+
+    Returns the message, its due time and SQS delay, and whether it must be
+    stored in the schedule table. Raises ValueError for impossible schedules.
+    """
+    request_dict = req.dict()
+    request_dict["Priority"] = priority.resolve(req.Application, req.Priority)
+    try:
+        due = first_run(request_dict, now)
+    except ValueError as e:
+        raise ValueError(f"Invalid Date/Time: {str(e)}")
+    recurring = is_recurring(request_dict.get("Interval"))
+    if recurring and due is None:
+        raise ValueError("Interval has no future occurrences")
+
+    series_id = str(uuid.uuid4())
+    delay = (due - now).total_seconds() if due else 0
+    store = bool(due) and delay > MAX_DELAY_SECONDS
+    if (due or recurring) and not store:
+        # The worker needs these to expand the next occurrence of a recurring notification
+        request_dict = dict(request_dict, ScheduledFor=format_due(due or now), ScheduleSeriesId=series_id)
+    return {"request": request_dict, "due": due, "delay": max(0, int(delay)), "series_id": series_id, "store": store}
+
 @app.post("/notifications")
 def notify(req: NotificationRequest) -> Dict[str, Any]:
-    """Send notification request to SQS queue. JWT validation handled by API Gateway."""
+    """Send notification request to SQS queue. JWT validation handled by API Gateway.
+
+    Requests with a future ``Date``/``Time`` or a recurring ``Interval`` are
+    delayed by SQS when due within 15 minutes, and stored in the schedule
+    table otherwise. The ``Priority`` tier picks the queue (see ``priority``).
+    """
     request_start = time.time()
     logging.info(f"📨 Processing notification request...")
     
+    # Time Pydantic validation
+    validation_start = time.time()
+    now = datetime.now(timezone.utc)
     try:
-        # Time Pydantic validation
-        validation_start = time.time()
-        request_dict = req.dict()
-        validation_time = time.time() - validation_start
-        logging.info(f"✅ Pydantic validation completed in {validation_time:.3f}s")
-        
+        plan = _plan(req, now)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    request_dict, due, series_id = plan["request"], plan["due"], plan["series_id"]
+    validation_time = time.time() - validation_start
+    logging.info(f"✅ Pydantic validation completed in {validation_time:.3f}s")
+
+    try:
+        if plan["store"]:
+            save_schedule(request_dict, due, series_id)
+            total_time = time.time() - request_start
+            logging.info(f"🗓️ Notification scheduled for {format_due(due)} in {total_time:.3f}s - ScheduleId: {series_id}")
+            return {
+                "message_id": None,
+                "schedule_id": series_id,
+                "status": "scheduled",
+                "priority": request_dict["Priority"],
+                "scheduled_for": format_due(due),
+                "processing_time_ms": round(total_time * 1000, 2)
+            }
+
         # Time SQS operation
         sqs_start = time.time()
-        response = send_message_to_queue(request_dict)
+        response = send_message_to_queue(request_dict, delay_seconds=plan["delay"])
         sqs_time = time.time() - sqs_start
         logging.info(f"✅ SQS message sent in {sqs_time:.3f}s")
         
@@ -83,9 +137,77 @@ def notify(req: NotificationRequest) -> Dict[str, Any]:
         return {
             "message_id": response.get("MessageId"),
             "status": "queued",
+            "priority": request_dict["Priority"],
+            "scheduled_for": format_due(due) if due else None,
             "processing_time_ms": round(total_time * 1000, 2)
         }
     except Exception as e:
         error_time = time.time() - request_start
         logging.error(f"❌ Request failed in {error_time:.3f}s: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/notifications/batch")
+def notify_batch(batch: BatchNotificationRequest) -> Dict[str, Any]:
+    """Send up to ``BATCH_MAX_NOTIFICATIONS`` notification requests in one call.
+
+    Each item is validated and routed like a ``POST /notifications`` body.
+    Queued items are sent with SendMessageBatch, 10 per call and several
+    calls at once. An invalid or failed item does not fail the others: the
+    response has one result per item, in order, with its ``message_id`` or
+    ``schedule_id`` or its ``error``.
+    """
+    request_start = time.time()
+    count = len(batch.Notifications)
+    if count > settings.BATCH_MAX_NOTIFICATIONS:
+        raise HTTPException(status_code=413, detail=f"A batch holds at most {settings.BATCH_MAX_NOTIFICATIONS} notifications")
+    logging.info(f"📨 Processing batch of {count} notification requests...")
+
+    now = datetime.now(timezone.utc)
+    results: List[Dict[str, Any]] = []
+    queued: List[Tuple[int, Dict[str, Any]]] = []
+    for index, item in enumerate(batch.Notifications):
+        try:
+            plan = _plan(NotificationRequest(**item), now)
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(str(part) for part in error['loc']) or 'request'}: {error['msg']}" for error in e.errors())
+            results.append({"index": index, "status": "failed", "error": errors})
+            continue
+        except ValueError as e:
+            results.append({"index": index, "status": "failed", "error": str(e)})
+            continue
+        request_dict, due = plan["request"], plan["due"]
+        result = {
+            "index": index,
+            "status": "queued",
+            "priority": request_dict["Priority"],
+            "scheduled_for": format_due(due) if due else None,
+        }
+        results.append(result)
+        if not plan["store"]:
+            queued.append((index, plan))
+            continue
+        try:
+            save_schedule(request_dict, due, plan["series_id"])
+            result.update(status="scheduled", message_id=None, schedule_id=plan["series_id"])
+        except Exception as e:
+            result.update(status="failed", error=str(e))
+
+    sent = send_messages_to_queue([(plan["request"], plan["delay"]) for _, plan in queued])
+    for (index, _), response in zip(queued, sent):
+        if "MessageId" in response:
+            results[index]["message_id"] = response["MessageId"]
+        else:
+            results[index].update(status="failed", error=response["Error"])
+
+    failed = sum(1 for result in results if result["status"] == "failed")
+    total_time = time.time() - request_start
+    logging.info(f"🎯 Batch of {count} processed in {total_time:.3f}s - {failed} failed")
+    return {
+        "status": "processed",
+        "total": count,
+        "queued": sum(1 for result in results if result["status"] == "queued"),
+        "scheduled": sum(1 for result in results if result["status"] == "scheduled"),
+        "failed": failed,
+        "results": results,
+        "processing_time_ms": round(total_time * 1000, 2)
+    }
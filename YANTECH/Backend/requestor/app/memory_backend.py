@@ -0,0 +1,426 @@
+"""In-memory stand-ins for the AWS services used by admin, requestor and worker.
+
+Selected with ``AWS_BACKEND=memory`` (see ``aws_clients``). They implement
+the subset of the boto3 API this code base calls, with the same request and
+response shapes and ``ClientError`` codes, so a whole pipeline can run on a
+laptop or in CI. This module holds the common ``StandIn`` base and the
+DynamoDB resource API (tables with hash/range keys and GSIs, condition and
+update expressions, query, scan and batch reads and writes); the SQS, SES
+and SNS stand-ins live in ``memory_messaging``, which only the requestor and
+worker ship.
+
+Per-service latency (seconds, jittered +/-50%) and failure rate (0..1) come
+from ``MEMORY_<SERVICE>_LATENCY`` and ``MEMORY_<SERVICE>_FAILURE_RATE``.
+State lives in the process. The same module is used by every service; keep
+the copies identical (``check_shared_modules.py``).
+"""
+import copy
+import os
+import random
+import re
+import threading
+import time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from botocore.exceptions import ClientError
+
+REGION = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
+ACCOUNT_ID = "000000000000"
+
+
+def _error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+class StandIn:
+    """Base for stand-ins: adds latency and injected failures to every call."""
+    service = ""
+
+    def __init__(self, latency: Optional[float] = None, failure_rate: Optional[float] = None, error_code: str = "ServiceUnavailable") -> None:
+        prefix = f"MEMORY_{self.service.upper()}_"
+        self.latency = float(os.getenv(prefix + "LATENCY", "0")) if latency is None else latency
+        self.failure_rate = float(os.getenv(prefix + "FAILURE_RATE", "0")) if failure_rate is None else failure_rate
+        self.error_code = error_code
+        self.calls = 0
+
+    def _call(self, operation: str) -> None:
+        self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+        if self._fails():
+            raise _error(self.error_code, "Injected failure", operation)
+
+    def _fails(self) -> bool:
+        return self.failure_rate > 0 and random.random() < self.failure_rate
+
+
+# DynamoDB expressions
+
+_TOKEN = re.compile(r"\s*(?:(<>|<=|>=|=|<|>|\(|\)|,)|(#\w+)|(:\w+)|([A-Za-z_][\w.]*))")
+
+
+def _tokenize(expression: str) -> List[str]:
+    tokens, pos = [], 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = _TOKEN.match(expression, pos)
+        if not match:
+            raise _error("ValidationException", f"Invalid expression near: {expression[pos:]}", "Expression")
+        tokens.append(match.group(match.lastindex))
+        pos = match.end()
+    return tokens
+
+
+_MISSING = object()
+
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    if left is _MISSING or right is _MISSING:
+        return op == "<>" and left is not right
+    if isinstance(left, (int, float, Decimal)) and isinstance(right, (int, float, Decimal)) and not isinstance(left, bool):
+        left, right = Decimal(str(left)), Decimal(str(right))
+    elif type(left) is not type(right):
+        return op == "<>"
+    try:
+        return {
+            "=": left == right, "<>": left != right, "<": left < right,
+            "<=": left <= right, ">": left > right, ">=": left >= right,
+        }[op]
+    except TypeError:
+        return False
+
+
+class _Evaluator:
+    """Recursive-descent evaluator for condition and key-condition expressions."""
+    def __init__(self, expression: str, names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]]) -> None:
+        self.tokens = _tokenize(expression)
+        self.names = names or {}
+        self.values = values or {}
+        self.pos = 0
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _take(self, expected: Optional[str] = None) -> str:
+        token = self._peek()
+        if token is None or (expected is not None and token.upper() != expected):
+            raise _error("ValidationException", f"Expected {expected or 'token'}, got {token}", "Expression")
+        self.pos += 1
+        return token
+
+    def evaluate(self, item: Dict[str, Any]) -> bool:
+        self.pos = 0
+        result = self._or(item)
+        if self._peek() is not None:
+            raise _error("ValidationException", f"Unexpected token {self._peek()}", "Expression")
+        return result
+
+    def _or(self, item: Dict[str, Any]) -> bool:
+        result = self._and(item)
+        while (self._peek() or "").upper() == "OR":
+            self._take()
+            right = self._and(item)
+            result = result or right
+        return result
+
+    def _and(self, item: Dict[str, Any]) -> bool:
+        result = self._not(item)
+        while (self._peek() or "").upper() == "AND":
+            self._take()
+            right = self._not(item)
+            result = result and right
+        return result
+
+    def _not(self, item: Dict[str, Any]) -> bool:
+        if (self._peek() or "").upper() == "NOT":
+            self._take()
+            return not self._not(item)
+        return self._primary(item)
+
+    def path(self, token: str) -> str:
+        return self.names[token] if token.startswith("#") else token
+
+    def _operand(self, item: Dict[str, Any]) -> Any:
+        token = self._take()
+        if token.startswith(":"):
+            return self.values[token]
+        return item.get(self.path(token), _MISSING)
+
+    def _primary(self, item: Dict[str, Any]) -> bool:
+        token = self._peek()
+        if token == "(":
+            self._take()
+            result = self._or(item)
+            self._take(")")
+            return result
+        function = (token or "").lower()
+        if function in ("attribute_exists", "attribute_not_exists", "begins_with", "contains") and self.tokens[self.pos + 1:self.pos + 2] == ["("]:
+            self._take()
+            self._take("(")
+            value = self._operand(item)
+            argument = None
+            if function in ("begins_with", "contains"):
+                self._take(",")
+                argument = self._operand(item)
+            self._take(")")
+            if function == "attribute_exists":
+                return value is not _MISSING
+            if function == "attribute_not_exists":
+                return value is _MISSING
+            if value is _MISSING:
+                return False
+            if function == "begins_with":
+                return isinstance(value, str) and value.startswith(argument)
+            return argument in value
+        left = self._operand(item)
+        op = self._take()
+        if op.upper() == "BETWEEN":
+            low = self._operand(item)
+            self._take("AND")
+            high = self._operand(item)
+            return _compare(">=", left, low) and _compare("<=", left, high)
+        if op not in ("=", "<>", "<", "<=", ">", ">="):
+            raise _error("ValidationException", f"Unsupported operator {op}", "Expression")
+        return _compare(op, left, self._operand(item))
+
+
+def _build(condition: Any, names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]], is_key: bool = False) -> _Evaluator:
+    """Accept an expression string or a ``boto3.dynamodb.conditions`` object."""
+    if isinstance(condition, str):
+        return _Evaluator(condition, names, values)
+    from boto3.dynamodb.conditions import ConditionExpressionBuilder
+    built = ConditionExpressionBuilder().build_expression(condition, is_key_condition=is_key)
+    return _Evaluator(
+        built.condition_expression,
+        dict(names or {}, **built.attribute_name_placeholders),
+        dict(values or {}, **built.attribute_value_placeholders),
+    )
+
+
+def _apply_update(item: Dict[str, Any], expression: str, names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]]) -> None:
+    """Apply ``SET a = :v, ...`` and ``REMOVE a, ...`` clauses (plain assignments only)."""
+    names, values = names or {}, values or {}
+
+    def path(token: str) -> str:
+        return names[token] if token.startswith("#") else token
+
+    for action, body in re.findall(r"(SET|REMOVE)\s+(.*?)(?=\s+(?:SET|REMOVE)\s+|$)", expression.strip(), re.IGNORECASE | re.DOTALL):
+        for clause in (part.strip() for part in body.split(",")):
+            if action.upper() == "REMOVE":
+                item.pop(path(clause), None)
+                continue
+            target, _, source = (part.strip() for part in clause.partition("="))
+            item[path(target)] = copy.deepcopy(values[source])
+
+
+# DynamoDB tables
+
+# Key layouts of this project's tables, used when a table was never created explicitly
+KNOWN_KEYS: List[Tuple[str, ...]] = [
+    ("DueBucket", "ScheduleKey"),
+    ("app_id", "id"),
+    ("IdempotencyKey",),
+    ("RecordID",),
+    ("Application", "TemplateId"),
+    ("Application",),
+    ("id",),
+]
+
+
+class MemoryTable(StandIn):
+    service = "dynamodb"
+
+    def __init__(self, name: str, key_names: Optional[Tuple[str, ...]] = None, indexes: Optional[Dict[str, Tuple[str, ...]]] = None, **kwargs: Any) -> None:
+        super().__init__(error_code=kwargs.pop("error_code", "ProvisionedThroughputExceededException"), **kwargs)
+        self.name = name
+        self.key_names = key_names
+        self.indexes = indexes or {}
+        self._items: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def table_name(self) -> str:
+        return self.name
+
+    def _key_names_for(self, attributes: Dict[str, Any]) -> Tuple[str, ...]:
+        if self.key_names is None:
+            for names in KNOWN_KEYS:
+                if all(name in attributes for name in names):
+                    self.key_names = names
+                    break
+            else:
+                raise _error("ValidationException", f"Cannot infer the key of table {self.name}; create it first", "PutItem")
+        return self.key_names
+
+    def _key(self, attributes: Dict[str, Any], operation: str) -> Tuple[Any, ...]:
+        names = self._key_names_for(attributes)
+        try:
+            return tuple(attributes[name] for name in names)
+        except KeyError:
+            raise _error("ValidationException", f"Missing key attribute for {self.name}", operation)
+
+    def _check(self, operation: str, current: Optional[Dict[str, Any]], condition: Any, names: Any, values: Any) -> None:
+        if condition is not None and not _build(condition, names, values).evaluate(current or {}):
+            raise _error("ConditionalCheckFailedException", "The conditional request failed", operation)
+
+    def put_item(self, Item: Dict[str, Any], ConditionExpression: Any = None, ExpressionAttributeNames: Any = None, ExpressionAttributeValues: Any = None, **kwargs: Any) -> Dict[str, Any]:
+        self._call("PutItem")
+        with self._lock:
+            key = self._key(Item, "PutItem")
+            self._check("PutItem", self._items.get(key), ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            self._items[key] = copy.deepcopy(Item)
+        return {}
+
+    def get_item(self, Key: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        self._call("GetItem")
+        with self._lock:
+            item = self._items.get(self._key(Key, "GetItem"))
+            return {"Item": copy.deepcopy(item)} if item is not None else {}
+
+    def update_item(
+        self,
+        Key: Dict[str, Any],
+        UpdateExpression: str,
+        ConditionExpression: Any = None,
+        ExpressionAttributeNames: Any = None,
+        ExpressionAttributeValues: Any = None,
+        ReturnValues: str = "NONE",
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        self._call("UpdateItem")
+        with self._lock:
+            key = self._key(Key, "UpdateItem")
+            current = self._items.get(key)
+            self._check("UpdateItem", current, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            item = copy.deepcopy(current) if current is not None else dict(Key)
+            _apply_update(item, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            self._items[key] = item
+            return {"Attributes": copy.deepcopy(item)} if ReturnValues == "ALL_NEW" else {}
+
+    def delete_item(self, Key: Dict[str, Any], ConditionExpression: Any = None, ExpressionAttributeNames: Any = None, ExpressionAttributeValues: Any = None, **kwargs: Any) -> Dict[str, Any]:
+        self._call("DeleteItem")
+        with self._lock:
+            key = self._key(Key, "DeleteItem")
+            self._check("DeleteItem", self._items.get(key), ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            self._items.pop(key, None)
+        return {}
+
+    def _select(self, condition: Any, filter_expression: Any, names: Any, values: Any, is_key: bool) -> List[Dict[str, Any]]:
+        key_condition = _build(condition, names, values, is_key=True) if condition is not None else None
+        item_filter = _build(filter_expression, names, values) if filter_expression is not None else None
+        with self._lock:
+            items = [copy.deepcopy(item) for _, item in sorted(self._items.items(), key=lambda entry: [str(part) for part in entry[0]])]
+        if key_condition is not None:
+            items = [item for item in items if key_condition.evaluate(item)]
+        if item_filter is not None:
+            items = [item for item in items if item_filter.evaluate(item)]
+        return items
+
+    def query(
+        self,
+        KeyConditionExpression: Any,
+        FilterExpression: Any = None,
+        ExpressionAttributeNames: Any = None,
+        ExpressionAttributeValues: Any = None,
+        IndexName: Optional[str] = None,
+        ScanIndexForward: bool = True,
+        Limit: Optional[int] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        self._call("Query")
+        items = self._select(KeyConditionExpression, FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues, True)
+        if IndexName:
+            index_keys = self.indexes.get(IndexName)
+            if index_keys:
+                items = [item for item in items if all(name in item for name in index_keys)]
+        if not ScanIndexForward:
+            items.reverse()
+        if Limit:
+            items = items[:Limit]
+        return {"Items": items, "Count": len(items)}
+
+    def scan(self, FilterExpression: Any = None, ExpressionAttributeNames: Any = None, ExpressionAttributeValues: Any = None, **kwargs: Any) -> Dict[str, Any]:
+        self._call("Scan")
+        items = self._select(None, FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues, False)
+        return {"Items": items, "Count": len(items)}
+
+    def wait_until_exists(self) -> None:
+        pass
+
+
+class MemoryDynamoDB(StandIn):
+    """DynamoDB resource API. Tables are created on first use unless created explicitly."""
+    service = "dynamodb"
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(error_code=kwargs.pop("error_code", "ProvisionedThroughputExceededException"), **kwargs)
+        self._kwargs = {"latency": self.latency, "failure_rate": self.failure_rate, "error_code": self.error_code}
+        self._tables: Dict[str, MemoryTable] = {}
+        self._lock = threading.Lock()
+
+    def Table(self, name: str) -> MemoryTable:
+        with self._lock:
+            table = self._tables.get(name)
+            if table is None:
+                table = self._tables[name] = MemoryTable(name, **self._kwargs)
+            return table
+
+    def create_table(self, TableName: str, KeySchema: List[Dict[str, str]], GlobalSecondaryIndexes: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> MemoryTable:
+        self._call("CreateTable")
+
+        def key_names(schema: List[Dict[str, str]]) -> Tuple[str, ...]:
+            ordered = sorted(schema, key=lambda part: part["KeyType"] != "HASH")
+            return tuple(part["AttributeName"] for part in ordered)
+
+        indexes = {index["IndexName"]: key_names(index["KeySchema"]) for index in GlobalSecondaryIndexes or []}
+        with self._lock:
+            if TableName in self._tables:
+                raise _error("ResourceInUseException", f"Table already exists: {TableName}", "CreateTable")
+            table = self._tables[TableName] = MemoryTable(TableName, key_names(KeySchema), indexes, **self._kwargs)
+        return table
+
+    def batch_get_item(self, RequestItems: Dict[str, Dict[str, Any]], **kwargs: Any) -> Dict[str, Any]:
+        self._call("BatchGetItem")
+        if sum(len(request["Keys"]) for request in RequestItems.values()) > 100:
+            raise _error("ValidationException", "Too many items requested for the BatchGetItem call", "BatchGetItem")
+        responses: Dict[str, List[Dict[str, Any]]] = {}
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            with table._lock:
+                items = [table._items.get(table._key(key, "BatchGetItem")) for key in request["Keys"]]
+            responses[name] = [copy.deepcopy(item) for item in items if item is not None]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def batch_write_item(self, RequestItems: Dict[str, List[Dict[str, Any]]], **kwargs: Any) -> Dict[str, Any]:
+        # Failures are injected per item and come back as UnprocessedItems, like throttling
+        self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+        if sum(len(requests) for requests in RequestItems.values()) > 25:
+            raise _error("ValidationException", "Too many items in the BatchWriteItem request", "BatchWriteItem")
+        unprocessed: Dict[str, List[Dict[str, Any]]] = {}
+        for name, requests in RequestItems.items():
+            table = self.Table(name)
+            for request in requests:
+                if self._fails():
+                    unprocessed.setdefault(name, []).append(request)
+                    continue
+                with table._lock:
+                    if "PutRequest" in request:
+                        item = request["PutRequest"]["Item"]
+                        table._items[table._key(item, "BatchWriteItem")] = copy.deepcopy(item)
+                    else:
+                        table._items.pop(table._key(request["DeleteRequest"]["Key"], "BatchWriteItem"), None)
+        return {"UnprocessedItems": unprocessed}
+
+
+def create(service: str) -> Any:
+    """Create a stand-in for ``service``."""
+    if service == "dynamodb":
+        return MemoryDynamoDB()
+    try:
+        from . import memory_messaging
+    except ImportError:
+        # Services that never call SQS, SES or SNS (admin) do not ship the messaging stand-ins
+        raise ValueError(f"No in-memory stand-in for AWS service: {service}") from None
+    return memory_messaging.create(service)
@@ -0,0 +1,379 @@
+"""In-memory SQS, SES and SNS stand-ins for the requestor and worker.
+
+Loaded by ``memory_backend.create`` under ``AWS_BACKEND=memory``:
+
+- SQS: delays, visibility timeouts, long polling, batches and a
+  dead-letter queue after ``MEMORY_SQS_MAX_RECEIVE_COUNT`` receives
+  (``SQS_QUEUE_URL`` is redriven to ``SQS_DLQ_URL`` when both are set)
+- SES / SNS: accept sends, with optional latency and failure injection
+
+The same module is used by the requestor and worker services; keep the
+copies identical (``check_shared_modules.py``).
+"""
+import copy
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from botocore.exceptions import ClientError
+from .memory_backend import ACCOUNT_ID, REGION, StandIn, _error
+
+# Sent SES/SNS messages kept for inspection
+SENT_HISTORY = 10000
+
+
+# SQS
+
+class _Message:
+    __slots__ = ("id", "body", "attributes", "sent_at", "visible_at", "receive_count", "receipt_handle")
+
+    def __init__(self, body: str, attributes: Dict[str, Any], visible_at: float) -> None:
+        self.id = str(uuid.uuid4())
+        self.body = body
+        self.attributes = attributes
+        self.sent_at = time.time()
+        self.visible_at = visible_at
+        self.receive_count = 0
+        self.receipt_handle: Optional[str] = None
+
+
+class _Queue:
+    def __init__(self, url: str, visibility_timeout: float) -> None:
+        self.url = url
+        self.visibility_timeout = visibility_timeout
+        self.messages: Dict[str, _Message] = {}
+        self.handles: Dict[str, str] = {}  # receipt handle -> message id
+        # (visible at, sequence, message id); entries whose visible_at changed are skipped
+        self.heap: List[Tuple[float, int, str]] = []
+        self.dlq_url: Optional[str] = None
+        self.max_receive_count = 0
+
+
+class MemorySQS(StandIn):
+    """SQS queues addressed by URL; any URL names a queue, created on first use."""
+    service = "sqs"
+
+    def __init__(self, visibility_timeout: Optional[float] = None, max_receive_count: Optional[int] = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.visibility_timeout = float(os.getenv("MEMORY_SQS_VISIBILITY_TIMEOUT", "30")) if visibility_timeout is None else visibility_timeout
+        self.max_receive_count = int(os.getenv("MEMORY_SQS_MAX_RECEIVE_COUNT", "5")) if max_receive_count is None else max_receive_count
+        self._queues: Dict[str, _Queue] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        source, dlq = os.getenv("SQS_QUEUE_URL"), os.getenv("SQS_DLQ_URL")
+        if source and dlq and self.max_receive_count > 0:
+            self.set_redrive_policy(source, dlq, self.max_receive_count)
+
+    def set_redrive_policy(self, queue_url: str, dlq_url: str, max_receive_count: int) -> None:
+        """Move messages received ``max_receive_count`` times to ``dlq_url``."""
+        with self._cond:
+            queue = self._queue(queue_url)
+            queue.dlq_url = dlq_url
+            queue.max_receive_count = max_receive_count
+
+    def _queue(self, url: str) -> _Queue:
+        queue = self._queues.get(url)
+        if queue is None:
+            queue = self._queues[url] = _Queue(url, self.visibility_timeout)
+        return queue
+
+    def _push(self, queue: _Queue, msg: _Message) -> None:
+        heapq.heappush(queue.heap, (msg.visible_at, next(self._seq), msg.id))
+
+    def _enqueue(self, queue_url: str, body: str, delay: float, attributes: Optional[Dict[str, Any]]) -> _Message:
+        if not isinstance(body, str) or not body:
+            raise _error("InvalidParameterValue", "MessageBody must be a non-empty string", "SendMessage")
+        if not 0 <= delay <= 900:
+            raise _error("InvalidParameterValue", "DelaySeconds must be between 0 and 900", "SendMessage")
+        queue = self._queue(queue_url)
+        msg = _Message(body, copy.deepcopy(attributes or {}), time.monotonic() + delay)
+        queue.messages[msg.id] = msg
+        self._push(queue, msg)
+        return msg
+
+    def send_message(self, QueueUrl: str, MessageBody: str, DelaySeconds: int = 0, MessageAttributes: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        self._call("SendMessage")
+        with self._cond:
+            msg = self._enqueue(QueueUrl, MessageBody, DelaySeconds, MessageAttributes)
+            self._cond.notify_all()
+        return {"MessageId": msg.id}
+
+    def send_message_batch(self, QueueUrl: str, Entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self._call("SendMessageBatch")
+        if not 1 <= len(Entries) <= 10:
+            raise _error("AWS.SimpleQueueService.TooManyEntriesInBatchRequest", "1 to 10 entries", "SendMessageBatch")
+        successful, failed = [], []
+        with self._cond:
+            for entry in Entries:
+                try:
+                    msg = self._enqueue(QueueUrl, entry.get("MessageBody"), entry.get("DelaySeconds", 0), entry.get("MessageAttributes"))
+                    successful.append({"Id": entry["Id"], "MessageId": msg.id})
+                except ClientError as e:
+                    failed.append({"Id": entry["Id"], "SenderFault": True, "Code": e.response["Error"]["Code"], "Message": e.response["Error"]["Message"]})
+            self._cond.notify_all()
+        return {"Successful": successful, "Failed": failed}
+
+    def _pop_visible(self, queue: _Queue, now: float) -> Optional[_Message]:
+        while queue.heap and queue.heap[0][0] <= now:
+            visible_at, _, message_id = heapq.heappop(queue.heap)
+            msg = queue.messages.get(message_id)
+            if msg is not None and msg.visible_at == visible_at:
+                return msg
+        return None
+
+    def _next_visible(self, queue: _Queue) -> Optional[float]:
+        return queue.heap[0][0] if queue.heap else None
+
+    def receive_message(
+        self,
+        QueueUrl: str,
+        MaxNumberOfMessages: int = 1,
+        WaitTimeSeconds: int = 0,
+        VisibilityTimeout: Optional[int] = None,
+        AttributeNames: Optional[List[str]] = None,
+        MessageAttributeNames: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        self._call("ReceiveMessage")
+        deadline = time.monotonic() + WaitTimeSeconds
+        with self._cond:
+            queue = self._queue(QueueUrl)
+            timeout = queue.visibility_timeout if VisibilityTimeout is None else VisibilityTimeout
+            while True:
+                received = self._receive(queue, max(1, min(MaxNumberOfMessages, 10)), timeout)
+                now = time.monotonic()
+                if received or now >= deadline:
+                    break
+                wait = deadline - now
+                next_visible = self._next_visible(queue)
+                if next_visible is not None:
+                    wait = min(wait, max(next_visible - now, 0.001))
+                self._cond.wait(wait)
+        if not received:
+            return {}
+        return {"Messages": [self._render(msg, AttributeNames, MessageAttributeNames) for msg in received]}
+
+    def _receive(self, queue: _Queue, limit: int, timeout: float) -> List[_Message]:
+        received: List[_Message] = []
+        now = time.monotonic()
+        while len(received) < limit:
+            msg = self._pop_visible(queue, now)
+            if msg is None:
+                break
+            if queue.dlq_url and queue.max_receive_count and msg.receive_count >= queue.max_receive_count:
+                # Same as a redrive policy: the next receive moves it to the DLQ instead
+                del queue.messages[msg.id]
+                queue.handles.pop(msg.receipt_handle or "", None)
+                dlq = self._queue(queue.dlq_url)
+                msg.visible_at = now
+                msg.receive_count = 0
+                msg.receipt_handle = None
+                dlq.messages[msg.id] = msg
+                self._push(dlq, msg)
+                continue
+            if msg.receipt_handle:
+                queue.handles.pop(msg.receipt_handle, None)
+            msg.receive_count += 1
+            msg.receipt_handle = f"{msg.id}#{uuid.uuid4().hex}"
+            queue.handles[msg.receipt_handle] = msg.id
+            msg.visible_at = now + timeout
+            self._push(queue, msg)
+            received.append(msg)
+        return received
+
+    def _render(self, msg: _Message, attribute_names: Optional[List[str]], message_attribute_names: Optional[List[str]]) -> Dict[str, Any]:
+        rendered: Dict[str, Any] = {"MessageId": msg.id, "ReceiptHandle": msg.receipt_handle, "Body": msg.body}
+        if attribute_names:
+            rendered["Attributes"] = {
+                "ApproximateReceiveCount": str(msg.receive_count),
+                "SentTimestamp": str(int(msg.sent_at * 1000)),
+            }
+        if message_attribute_names and msg.attributes:
+            wanted = message_attribute_names
+            rendered["MessageAttributes"] = {
+                name: copy.deepcopy(value) for name, value in msg.attributes.items()
+                if "All" in wanted or ".*" in wanted or name in wanted
+            }
+        return rendered
+
+    def _in_flight(self, queue: _Queue, receipt_handle: str, operation: str) -> _Message:
+        msg = queue.messages.get(queue.handles.get(receipt_handle, ""))
+        if msg is None:
+            raise _error("ReceiptHandleIsInvalid", "The receipt handle is not valid", operation)
+        return msg
+
+    def delete_message(self, QueueUrl: str, ReceiptHandle: str) -> Dict[str, Any]:
+        self._call("DeleteMessage")
+        with self._cond:
+            self._delete(self._queue(QueueUrl), ReceiptHandle)
+        return {}
+
+    def _delete(self, queue: _Queue, receipt_handle: str) -> None:
+        message_id = queue.handles.pop(receipt_handle, None)
+        if message_id is None:
+            # SQS accepts handles of messages that are already gone
+            message_id = receipt_handle.split("#", 1)[0]
+        queue.messages.pop(message_id, None)
+
+    def delete_message_batch(self, QueueUrl: str, Entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self._call("DeleteMessageBatch")
+        with self._cond:
+            queue = self._queue(QueueUrl)
+            for entry in Entries:
+                self._delete(queue, entry["ReceiptHandle"])
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    def _change_visibility(self, queue: _Queue, receipt_handle: str, timeout: int, operation: str) -> None:
+        msg = self._in_flight(queue, receipt_handle, operation)
+        if msg.receipt_handle != receipt_handle or msg.visible_at <= time.monotonic():
+            raise _error("MessageNotInflight", "The message is not in flight", operation)
+        msg.visible_at = time.monotonic() + timeout
+        self._push(queue, msg)
+
+    def change_message_visibility(self, QueueUrl: str, ReceiptHandle: str, VisibilityTimeout: int) -> Dict[str, Any]:
+        self._call("ChangeMessageVisibility")
+        with self._cond:
+            self._change_visibility(self._queue(QueueUrl), ReceiptHandle, VisibilityTimeout, "ChangeMessageVisibility")
+            self._cond.notify_all()
+        return {}
+
+    def change_message_visibility_batch(self, QueueUrl: str, Entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self._call("ChangeMessageVisibilityBatch")
+        successful, failed = [], []
+        with self._cond:
+            queue = self._queue(QueueUrl)
+            for entry in Entries:
+                try:
+                    self._change_visibility(queue, entry["ReceiptHandle"], entry["VisibilityTimeout"], "ChangeMessageVisibilityBatch")
+                    successful.append({"Id": entry["Id"]})
+                except ClientError as e:
+                    failed.append({"Id": entry["Id"], "SenderFault": True, "Code": e.response["Error"]["Code"], "Message": e.response["Error"]["Message"]})
+            self._cond.notify_all()
+        return {"Successful": successful, "Failed": failed}
+
+    def get_queue_attributes(self, QueueUrl: str, AttributeNames: Optional[List[str]] = None) -> Dict[str, Any]:
+        self._call("GetQueueAttributes")
+        with self._cond:
+            queue = self._queue(QueueUrl)
+            now = time.monotonic()
+            visible = delayed = in_flight = 0
+            for msg in queue.messages.values():
+                if msg.visible_at <= now:
+                    visible += 1
+                elif msg.receive_count:
+                    in_flight += 1
+                else:
+                    delayed += 1
+        name = QueueUrl.rstrip("/").rsplit("/", 1)[-1]
+        return {"Attributes": {
+            "QueueArn": f"arn:aws:sqs:{REGION}:{ACCOUNT_ID}:{name}",
+            "ApproximateNumberOfMessages": str(visible),
+            "ApproximateNumberOfMessagesNotVisible": str(in_flight),
+            "ApproximateNumberOfMessagesDelayed": str(delayed),
+            "VisibilityTimeout": str(int(queue.visibility_timeout)),
+        }}
+
+    def purge_queue(self, QueueUrl: str) -> Dict[str, Any]:
+        with self._cond:
+            self._queues.pop(QueueUrl, None)
+        return {}
+
+
+# SES / SNS
+
+class MemorySES(StandIn):
+    """Accepts SES sends and keeps the most recent ones in ``sent``."""
+    service = "ses"
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(error_code=kwargs.pop("error_code", "Throttling"), **kwargs)
+        self.sent: Deque[Dict[str, Any]] = deque(maxlen=SENT_HISTORY)
+        self.sent_count = 0
+
+    def send_email(self, Source: str, Destination: Dict[str, List[str]], Message: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        self._call("SendEmail")
+        recipients = sum(len(Destination.get(field, [])) for field in ("ToAddresses", "CcAddresses", "BccAddresses"))
+        if not 1 <= recipients <= 50:
+            raise _error("InvalidParameterValue", "Between 1 and 50 recipients are allowed", "SendEmail")
+        message_id = str(uuid.uuid4())
+        self.sent.append({"MessageId": message_id, "Source": Source, "Destination": Destination, "Message": Message, **kwargs})
+        self.sent_count += 1
+        return {"MessageId": message_id}
+
+    def verify_domain_identity(self, Domain: str) -> Dict[str, Any]:
+        self._call("VerifyDomainIdentity")
+        return {"VerificationToken": uuid.uuid4().hex}
+
+    def verify_domain_dkim(self, Domain: str) -> Dict[str, Any]:
+        self._call("VerifyDomainDkim")
+        return {"DkimTokens": [uuid.uuid4().hex for _ in range(3)]}
+
+
+class MemorySNS(StandIn):
+    """Accepts SNS publishes; PublishBatch fails entries individually."""
+    service = "sns"
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(error_code=kwargs.pop("error_code", "Throttled"), **kwargs)
+        self.sent: Deque[Dict[str, Any]] = deque(maxlen=SENT_HISTORY)
+        self.sent_count = 0
+        self._endpoints: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, Message: str, TopicArn: Optional[str] = None, TargetArn: Optional[str] = None, PhoneNumber: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+        self._call("Publish")
+        if sum(1 for target in (TopicArn, TargetArn, PhoneNumber) if target) != 1:
+            raise _error("InvalidParameter", "Exactly one of TopicArn, TargetArn or PhoneNumber is required", "Publish")
+        message_id = str(uuid.uuid4())
+        self.sent.append({"MessageId": message_id, "Target": TopicArn or TargetArn or PhoneNumber, "Message": Message})
+        self.sent_count += 1
+        return {"MessageId": message_id}
+
+    def publish_batch(self, TopicArn: str, PublishBatchRequestEntries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Latency applies to the call; injected failures to individual entries
+        self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+        if not 1 <= len(PublishBatchRequestEntries) <= 10:
+            raise _error("TooManyEntriesInBatchRequest", "1 to 10 entries", "PublishBatch")
+        successful, failed = [], []
+        for entry in PublishBatchRequestEntries:
+            if self._fails():
+                failed.append({"Id": entry["Id"], "Code": self.error_code, "Message": "Injected failure", "SenderFault": False})
+                continue
+            message_id = str(uuid.uuid4())
+            self.sent.append({"MessageId": message_id, "Target": TopicArn, "Message": entry["Message"]})
+            self.sent_count += 1
+            successful.append({"Id": entry["Id"], "MessageId": message_id})
+        return {"Successful": successful, "Failed": failed}
+
+    def create_platform_endpoint(self, PlatformApplicationArn: str, Token: str, **kwargs: Any) -> Dict[str, Any]:
+        self._call("CreatePlatformEndpoint")
+        with self._lock:
+            key = (PlatformApplicationArn, Token)
+            if key not in self._endpoints:
+                self._endpoints[key] = f"{PlatformApplicationArn.replace(':app/', ':endpoint/')}/{uuid.uuid4()}"
+            return {"EndpointArn": self._endpoints[key]}
+
+    def create_topic(self, Name: str, **kwargs: Any) -> Dict[str, Any]:
+        self._call("CreateTopic")
+        return {"TopicArn": f"arn:aws:sns:{REGION}:{ACCOUNT_ID}:{Name}"}
+
+_FACTORIES: Dict[str, Callable[[], Any]] = {
+    "sqs": MemorySQS,
+    "ses": MemorySES,
+    "sns": MemorySNS,
+}
+
+
+def create(service: str) -> Any:
+    """Create a stand-in for ``service``."""
+    factory = _FACTORIES.get(service)
+    if factory is None:
+        raise ValueError(f"No in-memory stand-in for AWS service: {service}")
+    return factory()
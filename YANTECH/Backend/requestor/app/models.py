@@ -1,6 +1,6 @@
 """Pydantic models for notification requests."""
 from pydantic import BaseModel, Field, validator, root_validator, EmailStr
-from typing import Optional, List, Any
+from typing import Optional, List, Dict, Any
 
 class IntervalModel(BaseModel):
     """Model for notification scheduling intervals."""
@@ -43,8 +43,12 @@ class NotificationRequest(BaseModel):
     Application: str
     Recipient: str
     Subject: Optional[str]
-    Message: str
+    Message: Optional[str] = None
+    # A template registered through the admin service, rendered by the worker
+    TemplateId: Optional[str] = None
+    Variables: Optional[Dict[str, Any]] = None
     OutputType: str  # SMS, EMAIL, PUSH
+    Priority: Optional[str] = None  # high, normal, bulk
     Date: Optional[str] = None
     Time: Optional[str] = None
     Interval: IntervalModel
@@ -52,6 +56,17 @@ class NotificationRequest(BaseModel):
     PhoneNumber: Optional[str] = None
     EmailAddresses: Optional[List[EmailStr]] = None
     PushToken: Optional[str] = None
+    # Send SMS/PUSH to every subscriber of the application's SNS topic instead of one target
+    Broadcast: Optional[bool] = False
+
+    @validator("Priority")
+    def validate_priority(cls, v: Optional[str]) -> Optional[str]:
+        """Validate the priority tier."""
+        if v is None:
+            return v
+        if v.lower() not in ("high", "normal", "bulk"):
+            raise ValueError("Priority must be one of high, normal, bulk")
+        return v.lower()
 
     @root_validator(skip_on_failure=True)
     def validate_delivery_target(cls, values: dict) -> dict:
@@ -60,13 +75,31 @@ class NotificationRequest(BaseModel):
         phone = values.get("PhoneNumber")
         emails = values.get("EmailAddresses")
         token = values.get("PushToken")
+        broadcast = values.get("Broadcast")
 
-        if output_type == "SMS" and not phone:
-            raise ValueError("PhoneNumber is required for SMS notifications")
+        if output_type == "SMS" and not phone and not broadcast:
+            raise ValueError("PhoneNumber is required for SMS notifications unless Broadcast is set")
         if output_type == "EMAIL" and not emails:
             raise ValueError("EmailAddresses is required for EMAIL notifications")
-        if output_type == "PUSH" and not token:
-            raise ValueError("PushToken is required for PUSH notifications")
+        if output_type == "PUSH" and not token and not broadcast:
+            raise ValueError("PushToken is required for PUSH notifications unless Broadcast is set")
+        if not values.get("Message") and not values.get("TemplateId"):
+            raise ValueError("Message or TemplateId is required")
 
         return values
 
+
+class BatchNotificationRequest(BaseModel):
+    """Model for batch notification requests.
+
+    Items are validated one by one as ``NotificationRequest`` so a bad item
+    is reported in its own result instead of rejecting the whole batch.
+    """
+    Notifications: List[Dict[str, Any]]
+
+    @validator("Notifications")
+    def validate_not_empty(cls, v: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Validate that the batch has at least one notification."""
+        if not v:
+            raise ValueError("Notifications must not be empty")
+        return v
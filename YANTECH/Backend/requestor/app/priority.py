@@ -0,0 +1,50 @@
+"""Priority tier routing for requestor service.
+
+Each tier has its own queue so latency-sensitive notifications are never
+stuck behind a bulk campaign. Must match the worker's ``priority`` module.
+"""
+from typing import Dict, Optional
+from .config import settings
+
+HIGH = "high"
+NORMAL = "normal"
+BULK = "bulk"
+# Highest first
+TIERS = (HIGH, NORMAL, BULK)
+
+
+def parse_policy(value: str) -> Dict[str, str]:
+    policy: Dict[str, str] = {}
+    for item in value.split(","):
+        if "=" in item:
+            application, tier = item.rsplit("=", 1)
+            tier = tier.strip().lower()
+            if tier not in TIERS:
+                raise ValueError(f"Unknown priority tier in APPLICATION_PRIORITIES: {tier}")
+            policy[application.strip()] = tier
+    return policy
+
+
+_policy = parse_policy(settings.APPLICATION_PRIORITIES)
+if settings.DEFAULT_PRIORITY not in TIERS:
+    raise ValueError(f"DEFAULT_PRIORITY must be one of {', '.join(TIERS)}")
+
+
+def resolve(application: str, requested: Optional[str] = None) -> str:
+    """Return the tier for a notification.
+
+    Applications listed in ``APPLICATION_PRIORITIES`` get their tier by
+    default and cannot request a higher one; other applications may request
+    any tier and get ``DEFAULT_PRIORITY`` otherwise.
+    """
+    ceiling = _policy.get(application)
+    tier = requested or ceiling or settings.DEFAULT_PRIORITY
+    if ceiling and TIERS.index(tier) < TIERS.index(ceiling):
+        return ceiling
+    return tier
+
+
+def queue_url_for(tier: Optional[str]) -> str:
+    """Return the queue for ``tier``; tiers without their own queue use ``SQS_QUEUE_URL``."""
+    urls = {HIGH: settings.SQS_HIGH_PRIORITY_QUEUE_URL, BULK: settings.SQS_BULK_QUEUE_URL}
+    return urls.get(str(tier or NORMAL).lower()) or settings.SQS_QUEUE_URL
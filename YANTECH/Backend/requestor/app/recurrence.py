@@ -0,0 +1,90 @@
+"""Recurrence rules for scheduled notifications.
+
+A notification's ``Interval`` is read like a cron rule evaluated at the
+request's ``Time`` (UTC): every non-empty list restricts the matching dates
+(``Days`` = day of month, ``Weeks`` = ISO week, ``Months`` = month,
+``Years`` = year) and empty lists match everything. ``Once`` (or an interval
+with no restrictions) means the notification is sent a single time.
+
+The same module is used by the requestor and worker services; keep the
+copies identical (``check_shared_modules.py``).
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Optional
+
+# Upper bound on candidate dates examined when looking for the next occurrence
+MAX_SEARCH_STEPS = 5000
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """Parse a ``YYYY-MM-DD`` date, or return None if not given."""
+    if not value:
+        return None
+    return date.fromisoformat(value)
+
+
+def parse_time(value: Optional[str]) -> Optional[time]:
+    """Parse a ``HH:MM`` or ``HH:MM:SS`` time of day, or return None if not given."""
+    if not value:
+        return None
+    return time.fromisoformat(value)
+
+
+def is_recurring(interval: Optional[Dict[str, Any]]) -> bool:
+    """Return True if the interval describes a repeating schedule."""
+    if not interval or interval.get("Once"):
+        return False
+    return any(interval.get(field) for field in ("Days", "Weeks", "Months", "Years"))
+
+
+def _matches(interval: Dict[str, Any], day: date) -> bool:
+    return (
+        (not interval.get("Days") or day.day in interval["Days"])
+        and (not interval.get("Weeks") or day.isocalendar()[1] in interval["Weeks"])
+        and (not interval.get("Months") or day.month in interval["Months"])
+        and (not interval.get("Years") or day.year in interval["Years"])
+    )
+
+
+def next_occurrence(interval: Dict[str, Any], time_of_day: Optional[time], after: datetime) -> Optional[datetime]:
+    """Return the first occurrence strictly after ``after``, or None if the rule has ended."""
+    at = time_of_day or time(0, 0)
+    day = after.date()
+    if datetime.combine(day, at, tzinfo=timezone.utc) <= after:
+        day += timedelta(days=1)
+
+    years = interval.get("Years") or []
+    months = interval.get("Months") or []
+    for _ in range(MAX_SEARCH_STEPS):
+        if years and day.year not in years:
+            if day.year > max(years):
+                return None
+            day = date(day.year + 1, 1, 1)
+            continue
+        if months and day.month not in months:
+            day = date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+            continue
+        if _matches(interval, day):
+            return datetime.combine(day, at, tzinfo=timezone.utc)
+        day += timedelta(days=1)
+    return None
+
+
+def first_run(request: Dict[str, Any], now: datetime) -> Optional[datetime]:
+    """Return when a request should first be sent, or None to send it right away.
+
+    ``Date``/``Time`` set the start (``Time`` alone means today); a recurring
+    ``Interval`` picks its first matching occurrence at or after that start.
+    A one-off whose start has already passed is due at once.
+    """
+    start_date = parse_date(request.get("Date"))
+    at = parse_time(request.get("Time"))
+    interval = request.get("Interval") or {}
+
+    if is_recurring(interval):
+        start = datetime.combine(start_date, time(0, 0), tzinfo=timezone.utc) if start_date else now
+        return next_occurrence(interval, at, max(start, now) - timedelta(microseconds=1))
+
+    if start_date or at:
+        return datetime.combine(start_date or now.date(), at or time(0, 0), tzinfo=timezone.utc)
+    return None
@@ -0,0 +1,53 @@
+"""Schedule table operations for requestor service.
+
+Notifications due more than 15 minutes ahead cannot be delayed by SQS, so
+they are stored here and moved onto the queue by the worker's dispatcher.
+The key layout must match the worker's ``scheduler`` module.
+"""
+from datetime import datetime, timezone
+from typing import Dict, Any
+from botocore.exceptions import ClientError
+from . import aws_clients, envelope
+from .config import settings
+
+# SQS cannot delay a message for longer than 15 minutes
+MAX_DELAY_SECONDS = 900
+BUCKET_MINUTES = 15
+STATUS_PENDING = "PENDING"
+
+
+def get_dynamodb_resource() -> Any:
+    """Get the shared DynamoDB resource."""
+    return aws_clients.resource("dynamodb", settings.AWS_REGION)
+
+
+def format_due(due: datetime) -> str:
+    return due.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def due_bucket(due: datetime) -> str:
+    """Return the 15-minute partition a due time belongs to."""
+    due = due.astimezone(timezone.utc)
+    return due.strftime("%Y-%m-%dT%H:") + f"{due.minute // BUCKET_MINUTES * BUCKET_MINUTES:02d}"
+
+
+def save_schedule(request: Dict[str, Any], due: datetime, series_id: str) -> None:
+    """Store a notification to be sent at ``due``."""
+    due_at = format_due(due)
+    body = dict(request, ScheduledFor=due_at, ScheduleSeriesId=series_id)
+    try:
+        get_dynamodb_resource().Table(settings.SCHEDULE_TABLE).put_item(
+            Item={
+                "DueBucket": due_bucket(due),
+                "ScheduleKey": f"{due_at}#{series_id}",
+                "ScheduleID": series_id,
+                "Application": str(request.get("Application", "")),
+                "DueAt": due_at,
+                "Status": STATUS_PENDING,
+                "Priority": str(request.get("Priority") or "normal"),
+                "Request": envelope.encode(body),  # Sent to SQS as-is when due
+            },
+            ConditionExpression="attribute_not_exists(ScheduleKey)",
+        )
+    except ClientError as e:
+        raise RuntimeError(f"Failed to save schedule: {str(e)}")
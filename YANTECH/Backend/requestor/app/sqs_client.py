@@ -1,43 +1,50 @@
 """SQS client operations for requestor service."""
-import boto3
-import json
-from typing import Dict, Any
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from . import aws_clients, envelope, priority
 from .config import settings
 
+# SendMessageBatch accepts at most 10 entries and 256 KB of bodies per call
+SQS_MAX_BATCH_SIZE = 10
+SQS_MAX_BATCH_BYTES = 262144
+
+_batch_executor = ThreadPoolExecutor(max_workers=settings.SQS_BATCH_CONCURRENCY, thread_name_prefix="sqs-batch")
+
 def get_sqs_client() -> Any:
-    """Get SQS client."""
-    return boto3.client(
-        "sqs",
-        region_name=settings.AWS_REGION
-    )
-
-def send_message_to_queue(message: Dict[str, Any]) -> Dict[str, Any]:
-    """Send message to SQS queue."""
+    """Get the shared SQS client."""
+    return aws_clients.client("sqs", settings.AWS_REGION)
+
+def send_message_to_queue(message: Dict[str, Any], delay_seconds: int = 0) -> Dict[str, Any]:
+    """Send message to the queue of its priority tier, optionally delayed by up to 900 seconds.
+
+    With ``SQS_COALESCE_ENABLED`` the message shares a SendMessageBatch call
+    with concurrent sends to the same queue (see ``EnqueueCoalescer``).
+    """
     import logging
-    import time
     
     if not message or not isinstance(message, dict):
         raise ValueError("message must be a non-empty dictionary")
     
     try:
-        # Time SQS client creation
-        client_start = time.time()
+        # Shared client: only the first call pays for construction
         sqs = get_sqs_client()
-        client_time = time.time() - client_start
-        logging.info(f"🔧 SQS client created in {client_time:.3f}s")
         
-        # Time JSON serialization
+        # Time serialization; large bodies are compressed or stored in the payload store
         json_start = time.time()
-        message_body = json.dumps(message)
+        message_body = envelope.encode(message)
         json_time = time.time() - json_start
-        logging.info(f"📝 JSON serialization completed in {json_time:.3f}s")
+        logging.info(f"📝 Message encoded to {len(message_body)} bytes in {json_time:.3f}s")
         
         # Time SQS send operation
         send_start = time.time()
-        response = sqs.send_message(
-            QueueUrl=settings.SQS_QUEUE_URL,
-            MessageBody=message_body
-        )
+        queue_url = priority.queue_url_for(message.get("Priority"))
+        delay_seconds = max(0, min(int(delay_seconds), 900))
+        if settings.SQS_COALESCE_ENABLED:
+            response = enqueue_coalescer.send(queue_url, message_body, delay_seconds).result()
+        else:
+            response = sqs.send_message(QueueUrl=queue_url, MessageBody=message_body, DelaySeconds=delay_seconds)
         send_time = time.time() - send_start
         logging.info(f"📤 SQS send_message completed in {send_time:.3f}s")
         
@@ -45,3 +52,164 @@ def send_message_to_queue(message: Dict[str, Any]) -> Dict[str, Any]:
     except Exception as e:
         logging.error(f"❌ SQS operation failed: {str(e)}")
         raise RuntimeError(f"Failed to send message to SQS: {str(e)}")
+
+def _batch_chunks(entries: List[Tuple[int, str, int]]) -> List[List[Tuple[int, str, int]]]:
+    """Split ``(index, body, delay)`` entries into SendMessageBatch-sized chunks."""
+    chunks: List[List[Tuple[int, str, int]]] = []
+    size = 0
+    for entry in entries:
+        entry_size = len(entry[1].encode("utf-8"))
+        if not chunks or len(chunks[-1]) >= SQS_MAX_BATCH_SIZE or size + entry_size > SQS_MAX_BATCH_BYTES:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(entry)
+        size += entry_size
+    return chunks
+
+def _send_chunk(queue_url: str, chunk: List[Tuple[int, str, int]]) -> Dict[int, Dict[str, Any]]:
+    try:
+        response = get_sqs_client().send_message_batch(
+            QueueUrl=queue_url,
+            Entries=[
+                {"Id": str(index), "MessageBody": body, "DelaySeconds": delay}
+                for index, body, delay in chunk
+            ],
+        )
+    except Exception as e:
+        # The whole call failed: every entry in it failed
+        return {index: {"Error": str(e)} for index, _, _ in chunk}
+    results: Dict[int, Dict[str, Any]] = {}
+    for success in response.get("Successful", []):
+        results[int(success["Id"])] = {"MessageId": success["MessageId"]}
+    for failure in response.get("Failed", []):
+        results[int(failure["Id"])] = {"Error": f"{failure.get('Code')}: {failure.get('Message', '')}"}
+    return results
+
+def send_messages_to_queue(messages: List[Tuple[Dict[str, Any], int]]) -> List[Dict[str, Any]]:
+    """Send ``(message, delay_seconds)`` pairs with SendMessageBatch.
+
+    Messages are grouped by the queue of their priority tier and sent 10 per
+    call, with the calls made concurrently. Returns one result per message,
+    in order: ``{"MessageId": ...}`` or ``{"Error": ...}``. A failed message
+    does not fail the others.
+    """
+    import logging
+    
+    results: List[Dict[str, Any]] = [{} for _ in messages]
+    by_queue: Dict[str, List[Tuple[int, str, int]]] = {}
+    for index, (message, delay_seconds) in enumerate(messages):
+        try:
+            body = envelope.encode(message)
+        except Exception as e:
+            results[index] = {"Error": f"Failed to encode message: {str(e)}"}
+            continue
+        queue_url = priority.queue_url_for(message.get("Priority"))
+        by_queue.setdefault(queue_url, []).append((index, body, max(0, min(int(delay_seconds), 900))))
+    
+    send_start = time.time()
+    futures = [
+        _batch_executor.submit(_send_chunk, queue_url, chunk)
+        for queue_url, entries in by_queue.items()
+        for chunk in _batch_chunks(entries)
+    ]
+    for future in futures:
+        for index, result in future.result().items():
+            results[index] = result
+    for result in results:
+        if not result:
+            result["Error"] = "SQS did not report a result for this message"
+    send_time = time.time() - send_start
+    logging.info(f"📤 SQS send_message_batch: {len(messages)} messages in {len(futures)} calls completed in {send_time:.3f}s")
+    
+    return results
+
+class EnqueueCoalescer:
+    """Coalesces concurrent sends to the same queue into SendMessageBatch calls.
+
+    Each ``send`` returns a Future for its own entry. A queue's pending batch
+    is sent once it holds 10 entries (or 256 KB), ``max_wait`` seconds after
+    its first entry arrived, or as soon as no other send to that queue is in
+    flight. A lone request is therefore sent at once, and requests only wait
+    for each other while SQS is busy answering earlier ones. Entries reported
+    in ``Failed`` fail only their own future.
+    """
+    def __init__(self, max_wait: float = 0.005) -> None:
+        self.max_wait = max_wait
+        self.batches = 0
+        self.messages = 0
+        self._pending: Dict[str, List[Tuple[str, int, Future]]] = {}
+        self._sizes: Dict[str, int] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def send(self, queue_url: str, body: str, delay_seconds: int = 0) -> "Future[Dict[str, Any]]":
+        future: "Future[Dict[str, Any]]" = Future()
+        size = len(body.encode("utf-8"))
+        ready = []
+        with self._cond:
+            self._ensure_started()
+            if self._pending.get(queue_url) and self._sizes[queue_url] + size > SQS_MAX_BATCH_BYTES:
+                ready.append(self._take(queue_url))
+            entries = self._pending.setdefault(queue_url, [])
+            entries.append((body, delay_seconds, future))
+            self._sizes[queue_url] = self._sizes.get(queue_url, 0) + size
+            self._deadlines.setdefault(queue_url, time.monotonic() + self.max_wait)
+            if len(entries) >= SQS_MAX_BATCH_SIZE or not self._in_flight.get(queue_url):
+                ready.append(self._take(queue_url))
+            else:
+                self._cond.notify_all()
+        # Full batches, and sends to an idle queue, go out right away on the caller's thread
+        for batch in ready:
+            self._send(queue_url, batch)
+        return future
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sqs-coalescer", daemon=True)
+            self._thread.start()
+
+    def _take(self, queue_url: str) -> List[Tuple[str, int, Future]]:
+        self._deadlines.pop(queue_url, None)
+        self._sizes.pop(queue_url, None)
+        self._in_flight[queue_url] = self._in_flight.get(queue_url, 0) + 1
+        return self._pending.pop(queue_url, [])
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._deadlines:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                due = [
+                    queue_url for queue_url, deadline in self._deadlines.items()
+                    if deadline <= now or not self._in_flight.get(queue_url)
+                ]
+                if not due:
+                    self._cond.wait(min(self._deadlines.values()) - now)
+                    continue
+                batches = [(queue_url, self._take(queue_url)) for queue_url in due]
+            for queue_url, batch in batches:
+                _batch_executor.submit(self._send, queue_url, batch)
+
+    def _send(self, queue_url: str, batch: List[Tuple[str, int, Future]]) -> None:
+        try:
+            results = _send_chunk(queue_url, [(i, body, delay) for i, (body, delay, _) in enumerate(batch)])
+            for i, (_, _, future) in enumerate(batch):
+                result = results.get(i) or {"Error": "SQS did not report a result for this message"}
+                if "MessageId" in result:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RuntimeError(result["Error"]))
+        finally:
+            with self._cond:
+                self.batches += 1
+                self.messages += len(batch)
+                self._in_flight[queue_url] -= 1
+                # The queue may now be idle: let a waiting batch go
+                self._cond.notify_all()
+
+
+enqueue_coalescer = EnqueueCoalescer(max_wait=settings.SQS_COALESCE_MAX_WAIT)
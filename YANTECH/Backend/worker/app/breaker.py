@@ -0,0 +1,284 @@
+"""Circuit breakers for the worker's downstream dependencies (SES, SNS, DynamoDB).
+
+Each breaker keeps a rolling window of call outcomes in one-second buckets.
+It opens when, over at least ``BREAKER_MIN_CALLS`` calls in the last
+``BREAKER_WINDOW`` seconds, the share of failed calls reaches
+``BREAKER_ERROR_RATE`` or the share of calls slower than
+``BREAKER_SLOW_CALL_SECONDS`` reaches ``BREAKER_SLOW_CALL_RATE``. While open,
+calls fail at once with ``CircuitOpenError`` instead of waiting on timeouts
+and retries. After ``BREAKER_OPEN_SECONDS`` a few half-open probes are let
+through; they close the breaker if they all succeed, or open it again for
+twice as long (up to ``BREAKER_MAX_OPEN_SECONDS``) if any fails.
+
+Only dependency faults count as failures: throttling, 5xx responses,
+timeouts and connection errors. A request the service refuses (a rejected
+address, a failed condition) shows the dependency is up.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+from botocore.exceptions import (
+    BotoCoreError,
+    ClientError,
+    ConnectionClosedError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
+from . import config, logger
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Error codes that mean the service, not the request, is the problem
+_DEPENDENCY_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "Throttled",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "ServiceUnavailable",
+    "InternalError",
+    "InternalFailure",
+    "InternalServerError",
+    "RequestTimeout",
+}
+# Client-side failures that mean the service could not be reached in time
+_DEPENDENCY_EXCEPTIONS = (EndpointConnectionError, ConnectTimeoutError, ReadTimeoutError, ConnectionClosedError)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open."""
+    def __init__(self, dependency: str, retry_after: float) -> None:
+        super().__init__(f"Circuit breaker for {dependency} is open, retry in {retry_after:.1f}s")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+def find_open_error(exc: Optional[BaseException]) -> Optional[CircuitOpenError]:
+    """Return the ``CircuitOpenError`` behind ``exc``, if it was caused by one."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, CircuitOpenError):
+            return exc
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def is_dependency_failure(exc: BaseException) -> bool:
+    """True if ``exc`` says the dependency is unhealthy rather than the request invalid.
+
+    Only throttling, 5xx responses, timeouts and connection errors count.
+    Bad input (``ParamValidationError``, a rejected address) and anything
+    unrecognised do not, so malformed requests from one application cannot
+    open a breaker that every application shares.
+    """
+    seen = set()
+    current: Optional[BaseException] = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, ClientError):
+            code = current.response.get("Error", {}).get("Code", "")
+            status = current.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+            return code in _DEPENDENCY_ERROR_CODES or status >= 500
+        if isinstance(current, _DEPENDENCY_EXCEPTIONS):
+            return True
+        if isinstance(current, BotoCoreError):
+            return False  # e.g. ParamValidationError: the request, not the service
+        current = current.__cause__ or current.__context__
+    return False
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one dependency. Thread-safe."""
+    def __init__(
+        self,
+        name: str,
+        window: float = 30,
+        min_calls: int = 20,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 5,
+        slow_call_rate: float = 0.5,
+        open_seconds: float = 30,
+        max_open_seconds: float = 300,
+        half_open_probes: int = 3,
+        enabled: bool = True,
+    ) -> None:
+        self.name = name
+        self.window = window
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.enabled = enabled
+        self.rejected = 0
+        self.opened = 0
+        self._state = CLOSED
+        self._open_for = open_seconds
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probes_passed = 0
+        # [second, calls, failures, slow calls]
+        self._buckets: Deque[List[int]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance(time.monotonic())
+            return self._state
+
+    def _advance(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self._open_for:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probes_passed = 0
+
+    def _trip(self, now: float, reason: str) -> None:
+        if self._state == HALF_OPEN:
+            # Still failing: back off harder before the next probes
+            self._open_for = min(self.max_open_seconds, self._open_for * 2)
+        else:
+            self._open_for = self.open_seconds
+        self._state = OPEN
+        self._opened_at = now
+        self._buckets.clear()
+        self.opened += 1
+        logger.log(
+            f"Circuit breaker for {self.name} opened for {self._open_for:.0f}s: {reason}",
+            level="WARNING", event="circuit_opened", dependency=self.name,
+        )
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets probes through (0 unless open)."""
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._open_for - now)
+
+    def is_open(self) -> bool:
+        """True while calls are being rejected. Does not use up a half-open probe."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            self._advance(time.monotonic())
+            return self._state == OPEN or (
+                self._state == HALF_OPEN and self._probes_in_flight + self._probes_passed >= self.half_open_probes
+            )
+
+    def allow(self) -> bool:
+        """Decide whether a call may go ahead; in half-open state this takes a probe."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._advance(time.monotonic())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight + self._probes_passed < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, failed: bool, seconds: float) -> None:
+        """Record the outcome of a call that ``allow`` let through."""
+        if not self.enabled:
+            return
+        slow = seconds >= self.slow_call_seconds
+        now = time.monotonic()
+        with self._lock:
+            self._advance(now)
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed or slow:
+                    self._trip(now, "half-open probe " + ("failed" if failed else f"took {seconds:.1f}s"))
+                else:
+                    self._probes_passed += 1
+                    if self._probes_passed >= self.half_open_probes:
+                        self._state = CLOSED
+                        self._open_for = self.open_seconds
+                        logger.log(f"Circuit breaker for {self.name} closed", event="circuit_closed", dependency=self.name)
+                return
+            if self._state == OPEN:
+                return  # A call that started before the breaker opened
+
+            second = int(now)
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0, 0])
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += int(failed)
+            bucket[3] += int(slow)
+            while self._buckets and self._buckets[0][0] <= second - self.window:
+                self._buckets.popleft()
+
+            calls = sum(b[1] for b in self._buckets)
+            if calls < self.min_calls:
+                return
+            failures = sum(b[2] for b in self._buckets)
+            slow_calls = sum(b[3] for b in self._buckets)
+            if failures / calls >= self.error_rate:
+                self._trip(now, f"{failures} of {calls} calls failed")
+            elif slow_calls / calls >= self.slow_call_rate:
+                self._trip(now, f"{slow_calls} of {calls} calls took over {self.slow_call_seconds:g}s")
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Run the enclosed call through the breaker, raising ``CircuitOpenError`` while open."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(is_dependency_failure(e), time.perf_counter() - started)
+            raise
+        self.record(False, time.perf_counter() - started)
+
+
+def _breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        window=config.BREAKER_WINDOW,
+        min_calls=config.BREAKER_MIN_CALLS,
+        error_rate=config.BREAKER_ERROR_RATE,
+        slow_call_seconds=config.BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate=config.BREAKER_SLOW_CALL_RATE,
+        open_seconds=config.BREAKER_OPEN_SECONDS,
+        max_open_seconds=config.BREAKER_MAX_OPEN_SECONDS,
+        half_open_probes=config.BREAKER_HALF_OPEN_PROBES,
+        enabled=config.BREAKER_ENABLED,
+    )
+
+
+ses = _breaker("ses")
+sns = _breaker("sns")
+dynamodb = _breaker("dynamodb")
+breakers: Dict[str, CircuitBreaker] = {"ses": ses, "sns": sns, "dynamodb": dynamodb}
+
+# The sending dependency behind each OutputType
+CHANNELS: Dict[str, CircuitBreaker] = {"EMAIL": ses, "SMS": sns, "PUSH": sns}
+
+
+def blocked(output_type: Optional[str]) -> Optional[CircuitBreaker]:
+    """Return the open breaker that a message of ``output_type`` would run into, if any."""
+    channel = CHANNELS.get(str(output_type))
+    return channel if channel is not None and channel.is_open() else None
+
+
+def receive_pause() -> float:
+    """Seconds to stop receiving: only while every channel's breaker is open."""
+    channels = set(CHANNELS.values())
+    if not all(channel.is_open() for channel in channels):
+        return 0.0
+    return min(channel.retry_after() for channel in channels)
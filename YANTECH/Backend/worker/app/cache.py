@@ -0,0 +1,68 @@
+"""In-process TTL/LRU cache for worker service."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Thread-safe cache with bounded size, TTL expiry and negative caching.
+
+    Entries are evicted least-recently-used once ``max_size`` is reached.
+    Lookups that return ``None`` are cached for ``negative_ttl`` seconds so a
+    burst of traffic for an unknown key does not hit the backend every time.
+    """
+    def __init__(self, max_size: int = 1024, ttl: float = 300, negative_ttl: float = 30) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[Hashable], Optional[Any]]) -> Optional[Any]:
+        """Return the cached value for ``key``, calling ``loader`` on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Load outside the lock so a slow backend call does not block other keys
+        value = loader(key)
+        self.set(key, value)
+        return value
+
+    def contains(self, key: Hashable) -> bool:
+        """Return True if ``key`` holds a fresh, non-negative entry. Does not touch the counters."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.monotonic() and entry[1] is not None
+
+    def set(self, key: Hashable, value: Optional[Any]) -> None:
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one key, or the whole cache when no key is given."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
@@ -10,10 +10,118 @@ AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 SQS_QUEUE_URL = os.getenv("SQS_QUEUE_URL", "https://sqs.us-east-1.amazonaws.com/588082972397/yantech-notification-queue-dev")
 SQS_DLQ_URL = os.getenv("SQS_DLQ_URL", "https://sqs.us-east-1.amazonaws.com/588082972397/yantech-notification-dlq-dev")
 
+# Priority Tiers - Optional extra queues; an empty URL means the tier is not used
+# Messages without a tier go to SQS_QUEUE_URL ("normal")
+SQS_HIGH_PRIORITY_QUEUE_URL = os.getenv("SQS_HIGH_PRIORITY_QUEUE_URL", "")
+SQS_BULK_QUEUE_URL = os.getenv("SQS_BULK_QUEUE_URL", "")
+PRIORITY_WEIGHTS = os.getenv("PRIORITY_WEIGHTS", "high=8,normal=4,bulk=1")  # Share of pipeline slots when every tier is backlogged
+PRIORITY_RESERVED_SLOTS = int(os.getenv("PRIORITY_RESERVED_SLOTS", "2"))  # Pipeline slots only the highest tier may use
+
 # DynamoDB Tables - Match Terraform naming
 APPLICATIONS_TABLE = os.getenv("APPLICATIONS_TABLE", "YANTECH-YNP01-AWS-DYNAMODB-APPLICATIONS-DEV")
 REQUEST_LOG_TABLE = os.getenv("REQUEST_LOG_TABLE", "YANTECH-YNP01-AWS-DYNAMODB-REQUESTS-DEV")
+SCHEDULE_TABLE = os.getenv("SCHEDULE_TABLE", "YANTECH-YNP01-AWS-DYNAMODB-SCHEDULES-DEV")
+TEMPLATES_TABLE = os.getenv("TEMPLATES_TABLE", "YANTECH-YNP01-AWS-DYNAMODB-TEMPLATES-DEV")
+IDEMPOTENCY_TABLE = os.getenv("IDEMPOTENCY_TABLE", "")  # Empty: in-process only; set to share claims across workers
 
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_STREAM = os.getenv("LOG_STREAM", "stdout")  # stdout or stderr
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # Records buffered before new ones are dropped
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")  # e.g. "message_received=0.01,message_processed=0.1"
+LOG_MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", "256"))  # Characters of message text kept in logs
+
+# Worker Concurrency
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "10"))  # Max messages processed in parallel
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "0"))  # 0 means one per CPU the container may use (affinity and cgroup quota)
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "25"))  # Seconds to finish in-flight messages on SIGTERM
+SHUTDOWN_FLUSH_TIMEOUT = float(os.getenv("SHUTDOWN_FLUSH_TIMEOUT", "10"))  # Seconds to write pending deletes and request logs
+
+# Polling - Pollers per worker process and tier scale with that queue's backlog
+POLL_WAIT_TIME = int(os.getenv("POLL_WAIT_TIME", "10"))  # Long poll seconds (max 20)
+MIN_POLLERS = int(os.getenv("MIN_POLLERS", "1"))
+MAX_POLLERS = int(os.getenv("MAX_POLLERS", "4"))
+MESSAGES_PER_POLLER = int(os.getenv("MESSAGES_PER_POLLER", "100"))  # Backlog that justifies one more poller
+QUEUE_DEPTH_CHECK_INTERVAL = float(os.getenv("QUEUE_DEPTH_CHECK_INTERVAL", "15"))  # Seconds
+
+# Longest a worker takes to stop after SIGTERM: finish a long poll, drain, flush.
+# Container stop grace periods (docker-compose stop_grace_period, ECS stopTimeout) must exceed it
+STOP_TIMEOUT = POLL_WAIT_TIME + SHUTDOWN_TIMEOUT + SHUTDOWN_FLUSH_TIMEOUT
+
+# Visibility Heartbeats - Keep slow messages invisible while they are processed
+VISIBILITY_TIMEOUT = float(os.getenv("VISIBILITY_TIMEOUT", "30"))  # Must match the queue's visibility timeout
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "5"))  # Seconds between checks
+HEARTBEAT_MARGIN = float(os.getenv("HEARTBEAT_MARGIN", "10"))  # Extend messages that expire within this many seconds
+VISIBILITY_EXTENSION = int(os.getenv("VISIBILITY_EXTENSION", "30"))  # Seconds added per extension
+MAX_VISIBILITY_EXTENSION = float(os.getenv("MAX_VISIBILITY_EXTENSION", "3600"))  # Total seconds before giving up
+
+# Failure Handling - Permanent failures go straight to SQS_DLQ_URL, transient ones back off
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0")) or VISIBILITY_TIMEOUT  # Seconds before the first retry, doubled per receive; 0 means VISIBILITY_TIMEOUT
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "900"))  # Cap on the retry delay in seconds
+
+# Circuit Breakers - Per dependency (SES, SNS, DynamoDB), over a rolling window
+BREAKER_ENABLED = os.getenv("BREAKER_ENABLED", "true").lower() == "true"
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "30"))  # Seconds of call outcomes considered
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "20"))  # Calls in the window before the breaker can open
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))  # Share of failed calls that opens it
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "5"))  # Calls slower than this count as slow
+BREAKER_SLOW_CALL_RATE = float(os.getenv("BREAKER_SLOW_CALL_RATE", "0.5"))  # Share of slow calls that opens it
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))  # Seconds open before half-open probes
+BREAKER_MAX_OPEN_SECONDS = float(os.getenv("BREAKER_MAX_OPEN_SECONDS", "300"))  # Cap after repeated failed probes
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "3"))  # Successful probes needed to close
+
+# Application Config Cache
+APP_CONFIG_CACHE_SIZE = int(os.getenv("APP_CONFIG_CACHE_SIZE", "1024"))
+APP_CONFIG_CACHE_TTL = float(os.getenv("APP_CONFIG_CACHE_TTL", "300"))  # Seconds
+APP_CONFIG_NEGATIVE_TTL = float(os.getenv("APP_CONFIG_NEGATIVE_TTL", "30"))  # Seconds to remember unknown apps
+APP_CONFIG_MISS_RETRIES = int(os.getenv("APP_CONFIG_MISS_RETRIES", "3"))  # Receives of a message for an unknown app before it is dead-lettered
+
+# Message Template Cache (compiled templates)
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "1024"))
+TEMPLATE_CACHE_TTL = float(os.getenv("TEMPLATE_CACHE_TTL", "300"))  # Seconds before an edited template is picked up
+TEMPLATE_NEGATIVE_TTL = float(os.getenv("TEMPLATE_NEGATIVE_TTL", "30"))  # Seconds to remember unknown templates
+
+# Request Log Writer
+REQUEST_LOG_QUEUE_SIZE = int(os.getenv("REQUEST_LOG_QUEUE_SIZE", "10000"))
+REQUEST_LOG_FLUSH_INTERVAL = float(os.getenv("REQUEST_LOG_FLUSH_INTERVAL", "1.0"))  # Seconds
+REQUEST_LOG_MAX_PAYLOAD = int(os.getenv("REQUEST_LOG_MAX_PAYLOAD", "4096"))  # Characters of request JSON kept per record
+
+# Send Rate Limits - Account quota for this container, in sends per second (0 disables pacing)
+# The supervisor divides them across its WORKER_PROCESSES; lower them when several containers run
+SES_MAX_SEND_RATE = float(os.getenv("SES_MAX_SEND_RATE", "14"))
+SNS_SMS_MAX_SEND_RATE = float(os.getenv("SNS_SMS_MAX_SEND_RATE", "20"))
+SNS_PUSH_MAX_SEND_RATE = float(os.getenv("SNS_PUSH_MAX_SEND_RATE", "0"))
+SEND_RATE_ACTIVE_WINDOW = float(os.getenv("SEND_RATE_ACTIVE_WINDOW", "10"))  # Seconds an app counts towards the fair share
+
+# Email Fan-out
+EMAIL_FANOUT_CONCURRENCY = int(os.getenv("EMAIL_FANOUT_CONCURRENCY", "8"))  # Parallel SES calls per worker process
+
+# SNS Delivery
+SNS_BATCH_LINGER = float(os.getenv("SNS_BATCH_LINGER", "0.05"))  # Seconds to wait for a topic PublishBatch to fill
+PUSH_ENDPOINT_CACHE_SIZE = int(os.getenv("PUSH_ENDPOINT_CACHE_SIZE", "10000"))
+
+# Scheduled Notifications
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULE_POLL_INTERVAL = float(os.getenv("SCHEDULE_POLL_INTERVAL", "60"))  # Seconds between schedule table reads
+SCHEDULE_DISPATCH_LEAD = float(os.getenv("SCHEDULE_DISPATCH_LEAD", "300"))  # Seconds before due time to hand to SQS (max 900)
+SCHEDULE_CATCHUP = float(os.getenv("SCHEDULE_CATCHUP", "86400"))  # Seconds of overdue entries picked up on start-up
+
+# Duplicate Suppression
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))  # Seconds a delivered message is remembered
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "100000"))
+IDEMPOTENCY_CLAIM_TIMEOUT = float(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT", "300"))  # Seconds before an unfinished claim can be taken over
+
+# Metrics
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))  # Worker process N listens on METRICS_PORT + N; 0 disables
+METRICS_MAX_APPLICATIONS = int(os.getenv("METRICS_MAX_APPLICATIONS", "100"))  # Applications with their own series
+
+# DLQ Redrive (python -m app.redrive)
+REDRIVE_RECEIVERS = int(os.getenv("REDRIVE_RECEIVERS", "4"))  # Concurrent DLQ receivers
+REDRIVE_MAX_RATE = float(os.getenv("REDRIVE_MAX_RATE", "100"))  # Messages per second sent back to the main queue
+REDRIVE_VISIBILITY_TIMEOUT = int(os.getenv("REDRIVE_VISIBILITY_TIMEOUT", "900"))  # Seconds messages stay hidden during a run
 
+# AWS Clients - One pooled client per service, shared by all threads
+# 0 sizes the pool to the threads that call AWS: pipeline, fan-out, pollers (per tier) and background flushers
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "0")) or (
+    WORKER_CONCURRENCY + EMAIL_FANOUT_CONCURRENCY + MAX_POLLERS * 3 + 4
+)
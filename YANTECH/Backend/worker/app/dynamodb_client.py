@@ -1,44 +1,97 @@
 """DynamoDB client operations for worker service."""
-import boto3
+import json
 from datetime import datetime, timezone
 import uuid
-from typing import Dict, Any, Optional
-from . import config
+from typing import Dict, Any, Optional, Tuple
+from . import aws_clients, breaker, config
+from .cache import TTLCache
+from .templates import MessageTemplate
+from .log_sink import RequestLogSink
 
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name=config.AWS_REGION
+def get_dynamodb_resource() -> Any:
+    """Get the shared DynamoDB resource."""
+    return aws_clients.resource("dynamodb", config.AWS_REGION)
+
+app_config_cache = TTLCache(
+    max_size=config.APP_CONFIG_CACHE_SIZE,
+    ttl=config.APP_CONFIG_CACHE_TTL,
+    negative_ttl=config.APP_CONFIG_NEGATIVE_TTL,
 )
 
+def _load_application_config(app_id: str) -> Optional[Dict[str, Any]]:
+    with breaker.dynamodb.guard():
+        try:
+            table = get_dynamodb_resource().Table(config.APPLICATIONS_TABLE)
+            response = table.get_item(Key={"Application": str(app_id)})
+            return response.get("Item")
+        except Exception as e:
+            raise RuntimeError(f"Failed to get application config: {str(e)}")
+
 def get_application_config(app_id: str) -> Optional[Dict[str, Any]]:
-    """Get application configuration from DynamoDB."""
+    """Get application configuration, served from the in-process cache when fresh."""
+    if not app_id or not isinstance(app_id, str):
+        raise ValueError("app_id must be a non-empty string")
+    
+    return app_config_cache.get(app_id, _load_application_config)
+
+def invalidate_application_config(app_id: Optional[str] = None) -> None:
+    """Drop a cached application config, or all of them when no app_id is given."""
+    app_config_cache.invalidate(app_id)
+
+template_cache = TTLCache(
+    max_size=config.TEMPLATE_CACHE_SIZE,
+    ttl=config.TEMPLATE_CACHE_TTL,
+    negative_ttl=config.TEMPLATE_NEGATIVE_TTL,
+)
+
+def _load_template(key: Tuple[str, str]) -> Optional[MessageTemplate]:
+    app_id, template_id = key
+    with breaker.dynamodb.guard():
+        try:
+            table = get_dynamodb_resource().Table(config.TEMPLATES_TABLE)
+            item = table.get_item(Key={"Application": app_id, "TemplateId": template_id}).get("Item")
+        except Exception as e:
+            raise RuntimeError(f"Failed to get template: {str(e)}")
+    # Compiled once here; every message using the template renders from the cached copy
+    return MessageTemplate.from_item(item) if item else None
+
+def get_template(app_id: str, template_id: str) -> Optional[MessageTemplate]:
+    """Get an application's compiled message template, served from the in-process cache when fresh."""
     if not app_id or not isinstance(app_id, str):
         raise ValueError("app_id must be a non-empty string")
+    if not template_id or not isinstance(template_id, str):
+        raise ValueError("template_id must be a non-empty string")
     
-    try:
-        table = dynamodb.Table(config.APPLICATIONS_TABLE)
-        response = table.get_item(Key={"Application": str(app_id)})
-        return response.get("Item")
-    except Exception as e:
-        raise RuntimeError(f"Failed to get application config: {str(e)}")
+    return template_cache.get((app_id, template_id), _load_template)
+
+request_log_sink = RequestLogSink(
+    get_dynamodb_resource,
+    config.REQUEST_LOG_TABLE,
+    max_queue_size=config.REQUEST_LOG_QUEUE_SIZE,
+    flush_interval=config.REQUEST_LOG_FLUSH_INTERVAL,
+)
+
+def _serialize_payload(request_data: Any) -> str:
+    """Serialize request data as compact JSON, truncated to REQUEST_LOG_MAX_PAYLOAD characters."""
+    if not request_data:
+        return ""
+    payload = json.dumps(request_data, separators=(",", ":"), ensure_ascii=False, default=str)
+    if len(payload) > config.REQUEST_LOG_MAX_PAYLOAD:
+        payload = payload[:config.REQUEST_LOG_MAX_PAYLOAD] + "...[truncated]"
+    return payload
 
 def log_request(application_id: str, request_data: Any, status: str, error: Optional[str] = None) -> None:
-    """Log request details to DynamoDB."""
+    """Queue request details for a batched write to DynamoDB."""
     if not application_id or not isinstance(application_id, str):
         raise ValueError("application_id must be a non-empty string")
     if not status or not isinstance(status, str):
         raise ValueError("status must be a non-empty string")
     
-    try:
-        table = dynamodb.Table(config.REQUEST_LOG_TABLE)
-        table.put_item(Item={
-            "RecordID": str(uuid.uuid4()),
-            "Application": str(application_id),
-            "Timestamp": datetime.now(timezone.utc).isoformat(),
-            "Status": str(status),
-            "Error": str(error) if error else "None",
-            "Request": str(request_data) if request_data else "",
-        })
-    except Exception as e:
-        raise RuntimeError(f"Failed to log request: {str(e)}")
-
+    request_log_sink.put({
+        "RecordID": str(uuid.uuid4()),
+        "Application": str(application_id),
+        "Timestamp": datetime.now(timezone.utc).isoformat(),
+        "Status": str(status),
+        "Error": str(error) if error else "None",
+        "Request": _serialize_payload(request_data),
+    })
@@ -0,0 +1,112 @@
+"""Failure classification and disposal for worker service.
+
+A message that can never succeed (malformed body, unknown application,
+unsupported OutputType, an address SES rejects) is moved to the DLQ on its
+first failure, tagged with a ``FailureReason`` attribute, instead of being
+received, looked up and logged until the queue's maxReceiveCount runs out.
+Anything else is treated as transient and retried after a jittered
+exponential backoff, set per message with ChangeMessageVisibility.
+"""
+import json
+import random
+from typing import Any, Dict, Optional
+from botocore.exceptions import ClientError
+from . import config, sqs_client, logger
+from .redrive import FAILURE_DETAIL_ATTRIBUTE, FAILURE_REASON_ATTRIBUTE
+
+MAX_DETAIL_LENGTH = 512
+# SQS caps a message's visibility timeout at 12 hours
+MAX_VISIBILITY_TIMEOUT = 43200
+
+# AWS error codes that mean this message, as sent, will always be refused
+PERMANENT_AWS_ERRORS = {
+    "MessageRejected",
+    "InvalidParameter",
+    "InvalidParameterValue",
+    "InvalidParameterException",
+    "ValidationError",
+    "EndpointDisabled",
+    "NotFound",
+    "NotFoundException",
+    "NoSuchKey",
+}
+
+
+class PermanentError(Exception):
+    """A failure that retrying the same message cannot fix."""
+    def __init__(self, reason: str, message: str = "") -> None:
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+def _aws_error_code(exc: BaseException) -> Optional[str]:
+    # Service errors are usually re-raised as RuntimeError; the ClientError is in the chain
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, ClientError):
+            return exc.response.get("Error", {}).get("Code")
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def classify(exc: BaseException) -> Optional[str]:
+    """Return the failure reason if ``exc`` is permanent, or None if it is worth retrying."""
+    if isinstance(exc, PermanentError):
+        return exc.reason
+    if isinstance(exc, json.JSONDecodeError):
+        return "MalformedBody"
+    if isinstance(exc, KeyError):
+        return "MissingField"
+    code = _aws_error_code(exc)
+    if code is not None:
+        return code if code in PERMANENT_AWS_ERRORS else None
+    if isinstance(exc, (ValueError, TypeError)):
+        # Raised by our own validation of the message, never by a flaky dependency
+        return "InvalidMessage"
+    return None
+
+
+def receive_count(msg: Dict[str, Any]) -> int:
+    """How many times SQS has delivered ``msg``, this delivery included."""
+    return int((msg.get("Attributes") or {}).get("ApproximateReceiveCount", 1))
+
+
+def retry_delay(receive_count: int) -> int:
+    """Seconds to keep a failed message hidden: exponential in its receive count, with jitter."""
+    ceiling = min(config.RETRY_MAX_DELAY, config.RETRY_BASE_DELAY * 2 ** max(0, receive_count - 1))
+    # Equal jitter: never less than half the backoff, so retries of one burst spread out.
+    # At least a second: a zero visibility timeout would redeliver the message at once
+    return max(1, int(min(MAX_VISIBILITY_TIMEOUT, ceiling / 2 + random.uniform(0, ceiling / 2))))
+
+
+def dead_letter(msg: Dict[str, Any], reason: str, detail: str) -> bool:
+    """Copy a message to the DLQ with its failure reason. Returns False if it could not be sent."""
+    if not config.SQS_DLQ_URL:
+        return False
+    attributes = dict(msg.get("MessageAttributes") or {})
+    attributes[FAILURE_REASON_ATTRIBUTE] = {"DataType": "String", "StringValue": reason}
+    attributes[FAILURE_DETAIL_ATTRIBUTE] = {"DataType": "String", "StringValue": logger.truncate(detail or reason, MAX_DETAIL_LENGTH)}
+    try:
+        sqs_client.get_sqs_client().send_message(
+            QueueUrl=config.SQS_DLQ_URL, MessageBody=msg["Body"], MessageAttributes=attributes
+        )
+        return True
+    except Exception as e:
+        logger.log(f"Failed to move message to the DLQ, it will be retried instead: {e}", level="ERROR", message_id=msg.get("MessageId"))
+        return False
+
+
+def retry_later(msg: Dict[str, Any], min_delay: float = 0) -> int:
+    """Hide a failed message for its backoff delay, and at least ``min_delay`` seconds.
+
+    Messages held back together for ``min_delay`` (e.g. until a circuit
+    breaker's probes) are spread over another half of it so they do not all
+    return at once. Returns the delay in seconds.
+    """
+    delay = retry_delay(receive_count(msg))
+    if min_delay > 0:
+        delay = int(min(MAX_VISIBILITY_TIMEOUT, max(delay, min_delay + random.uniform(0, min_delay / 2) + 1)))
+    failed = sqs_client.change_visibility_batch([(msg["ReceiptHandle"], delay)], msg.get("QueueUrl"))
+    # If the change failed the message reappears after the queue's own visibility timeout
+    return 0 if failed else delay
@@ -0,0 +1,93 @@
+"""Recipient chunking and parallel fan-out for EMAIL notifications."""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from . import breaker, config, failures, idempotency, notifier, logger
+from .rate_limiter import send_scheduler
+
+# SES SendEmail accepts at most 50 destinations per call
+SES_MAX_RECIPIENTS = 50
+
+_executor = ThreadPoolExecutor(max_workers=config.EMAIL_FANOUT_CONCURRENCY, thread_name_prefix="email-fanout")
+
+
+def chunk_recipients(recipients: List[str], size: int = SES_MAX_RECIPIENTS) -> List[List[str]]:
+    """Split a recipient list into SES-sized chunks, dropping duplicate addresses."""
+    unique = list(dict.fromkeys(recipients))
+    return [unique[i:i + size] for i in range(0, len(unique), size)]
+
+
+def _chunk_key(delivery_key: str, chunk: List[str]) -> str:
+    digest = hashlib.sha1("\n".join(chunk).encode("utf-8")).hexdigest()
+    return f"{delivery_key}:chunk:{digest}"
+
+
+def _send_chunk(app_id: str, domain_arn: str, chunk: List[str], subject: str, body: Optional[str], html: Optional[str]) -> Dict[str, Any]:
+    waited = send_scheduler.acquire("EMAIL", app_id, len(chunk))
+    if waited >= 0.01:
+        logger.log(
+            "Delayed send to stay within send rate", event="send_delayed",
+            application=app_id, output_type="EMAIL", waited_seconds=round(waited, 3),
+        )
+    return notifier.send_email(domain_arn, chunk, subject, body, html)
+
+
+def send_email_fanout(
+    delivery_key: str,
+    app_id: str,
+    domain_arn: str,
+    recipients: List[str],
+    subject: str,
+    body: Optional[str],
+    html: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Send an email to any number of recipients in parallel SES-sized chunks.
+
+    ``delivery_key`` is the message's idempotency key. Each delivered chunk
+    of a multi-chunk email is recorded under it, and chunks already recorded
+    (by any worker) are skipped. Raises RuntimeError if any chunk fails,
+    after recording the ones that succeeded, or ``PermanentError`` if every
+    failed chunk was refused for good.
+    """
+    if not recipients or not isinstance(recipients, list):
+        raise ValueError("recipients must be a non-empty list")
+
+    chunks = chunk_recipients(recipients)
+    keys = [_chunk_key(delivery_key, chunk) for chunk in chunks]
+    # A single chunk is the whole message, which the message-level claim already covers
+    track = len(chunks) > 1
+    done = idempotency.delivered(keys) if track else set()
+    pending = [
+        (key, chunk, _executor.submit(_send_chunk, app_id, domain_arn, chunk, subject, body, html))
+        for key, chunk in zip(keys, chunks)
+        if key not in done
+    ]
+
+    errors = []
+    reasons = []
+    rejected = []
+    for key, chunk, future in pending:
+        try:
+            future.result()
+            if track:
+                idempotency.mark_delivered(key)
+        except Exception as e:
+            errors.append(f"{len(chunk)} recipients: {e}")
+            reasons.append(failures.classify(e))
+            rejected.append(breaker.find_open_error(e))
+
+    result = {
+        "chunks": len(chunks),
+        "sent": len(pending) - len(errors),
+        "skipped": len(chunks) - len(pending),
+        "failed": len(errors),
+    }
+    if errors and all(rejected):
+        # Nothing failed on SES's side: the breaker turned the chunks away
+        raise rejected[0]
+    if errors and all(reasons):
+        # Retrying would only resend the chunks that can never be delivered
+        raise failures.PermanentError(reasons[0], f"Failed to send {len(errors)} of {len(chunks)} email chunks: {'; '.join(errors)}")
+    if errors:
+        raise RuntimeError(f"Failed to send {len(errors)} of {len(chunks)} email chunks: {'; '.join(errors)}")
+    return result
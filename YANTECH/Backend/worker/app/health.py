@@ -1,4 +1,5 @@
 """Simple health check for worker service."""
+import threading
 from datetime import datetime, timezone
 from typing import Dict, Any, Optional
 
@@ -10,16 +11,30 @@ class HealthChecker:
         self.messages_processed = 0
         self.errors_count = 0
         self.dlq_messages_count = 0
+        self.duplicates_count = 0
+        self.retries_count = 0
+        self._lock = threading.Lock()  # Counters are updated from pipeline threads
     
     def record_message_processed(self) -> None:
-        self.last_message_processed = datetime.now(timezone.utc)
-        self.messages_processed += 1
+        with self._lock:
+            self.last_message_processed = datetime.now(timezone.utc)
+            self.messages_processed += 1
     
     def record_error(self) -> None:
-        self.errors_count += 1
+        with self._lock:
+            self.errors_count += 1
+    
+    def record_duplicate(self) -> None:
+        with self._lock:
+            self.duplicates_count += 1
+    
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries_count += 1
     
     def record_dlq_message(self) -> None:
-        self.dlq_messages_count += 1
+        with self._lock:
+            self.dlq_messages_count += 1
     
     def get_status(self) -> Dict[str, Any]:
         uptime = (datetime.now(timezone.utc) - self.start_time).total_seconds()
@@ -29,6 +44,8 @@ class HealthChecker:
             "messages_processed": self.messages_processed,
             "errors_count": self.errors_count,
             "dlq_messages_count": self.dlq_messages_count,
+            "duplicates_count": self.duplicates_count,
+            "retries_count": self.retries_count,
             "last_message_processed": self.last_message_processed.isoformat() if self.last_message_processed else None,
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
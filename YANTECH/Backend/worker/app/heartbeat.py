@@ -0,0 +1,128 @@
+"""Visibility-timeout heartbeats for in-flight SQS messages."""
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from . import config, sqs_client, logger
+
+
+class VisibilityHeartbeat:
+    """Keeps in-flight messages invisible while they are still being processed.
+
+    Every ``interval`` seconds the messages whose visibility expires within
+    ``margin`` seconds are extended by ``extension`` seconds with
+    ChangeMessageVisibilityBatch. A message stops being extended once it is
+    untracked (acknowledged or abandoned), when an extension fails, or after
+    ``max_extension`` seconds in total so a stuck message is redelivered.
+    ``untrack(handle, wait=True)`` also waits out an extension of that
+    message already in flight, so a visibility timeout set afterwards (a
+    retry backoff) is not overwritten by it.
+    """
+    def __init__(
+        self,
+        visibility_timeout: float,
+        interval: float = 5,
+        margin: float = 10,
+        extension: int = 30,
+        max_extension: float = 3600,
+    ) -> None:
+        self.visibility_timeout = visibility_timeout
+        self.interval = interval
+        self.margin = margin
+        self.extension = extension
+        self.max_extension = max_extension
+        self.extended = 0
+        # receipt handle -> (received at, visible again at, queue URL)
+        self._tracked: Dict[str, Tuple[float, float, Optional[str]]] = {}
+        self._lock = threading.Lock()
+        # Handles in the ChangeMessageVisibilityBatch call being made; notified when it returns
+        self._extending: Set[str] = set()
+        self._extended = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="visibility-heartbeat", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def track(self, receipt_handles: List[str], queue_url: Optional[str] = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for handle in receipt_handles:
+                self._tracked[handle] = (now, now + self.visibility_timeout, queue_url)
+
+    def untrack(self, receipt_handle: str, wait: bool = False) -> None:
+        """Stop extending a message; with ``wait``, return only once no extension of it is in flight."""
+        with self._lock:
+            self._tracked.pop(receipt_handle, None)
+            while wait and receipt_handle in self._extending:
+                self._extended.wait()
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._tracked)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.beat()
+            except Exception as e:
+                logger.log(f"Visibility heartbeat failed: {e}", level="ERROR")
+
+    def beat(self) -> None:
+        """Extend every tracked message that is about to become visible again."""
+        now = time.monotonic()
+        due: Dict[Optional[str], List[str]] = {}
+        with self._lock:
+            for handle, (received, visible_at, queue_url) in list(self._tracked.items()):
+                if visible_at - now > self.margin:
+                    continue
+                if now - received >= self.max_extension:
+                    logger.log("Message exceeded the maximum processing time, letting SQS redeliver it", level="WARNING")
+                    del self._tracked[handle]
+                    continue
+                due.setdefault(queue_url, []).append(handle)
+                self._extending.add(handle)
+        if not due:
+            return
+
+        # Measured before the call so the estimate is never later than SQS's own deadline
+        visible_at = time.monotonic() + self.extension
+        failed = set()
+        try:
+            for queue_url, handles in due.items():
+                failed.update(sqs_client.change_visibility_batch([(handle, self.extension) for handle in handles], queue_url))
+        finally:
+            with self._lock:
+                self._extending.clear()
+                self._extended.notify_all()
+        count = sum(len(handles) for handles in due.values())
+        with self._lock:
+            for handle in (h for handles in due.values() for h in handles):
+                if handle not in self._tracked:
+                    continue  # Finished while the batch call was running
+                if handle in failed:
+                    del self._tracked[handle]
+                else:
+                    received, _, queue_url = self._tracked[handle]
+                    self._tracked[handle] = (received, visible_at, queue_url)
+        self.extended += count - len(failed)
+        logger.log(
+            f"Extended visibility of {count - len(failed)} in-flight messages ({len(failed)} failed)",
+            event="visibility_extended",
+        )
+
+
+heartbeat = VisibilityHeartbeat(
+    visibility_timeout=config.VISIBILITY_TIMEOUT,
+    interval=config.HEARTBEAT_INTERVAL,
+    margin=config.HEARTBEAT_MARGIN,
+    extension=config.VISIBILITY_EXTENSION,
+    max_extension=config.MAX_VISIBILITY_EXTENSION,
+)
@@ -0,0 +1,205 @@
+"""Duplicate-delivery suppression for worker service.
+
+SQS standard queues deliver at least once, so a message that was sent but not
+deleted comes back. Before sending, the worker claims the message's key:
+first in a bounded in-process TTL set, then with a conditional write to the
+idempotency table so the claim holds across workers. Keys that are already
+marked delivered are acknowledged without sending again.
+
+Parts of a message (the recipient chunks of an EMAIL fan-out) are recorded
+with ``mark_delivered`` under their own keys, so a retry that lands on
+another process or container only sends the parts that are still missing.
+"""
+import hashlib
+import time
+from typing import Any, Dict, List, Set
+from botocore.exceptions import ClientError
+from . import aws_clients, breaker, config, logger
+from .cache import TTLCache
+
+NEW = "new"    # Claimed by this worker: go ahead and send
+DONE = "done"  # Already delivered: acknowledge without sending
+BUSY = "busy"  # Another worker is sending it right now: leave it for a retry
+
+STATUS_IN_PROGRESS = "IN_PROGRESS"
+STATUS_DELIVERED = "DELIVERED"
+
+# Keys this process has delivered recently; avoids a table read for local redeliveries
+delivered_keys = TTLCache(max_size=config.IDEMPOTENCY_CACHE_SIZE, ttl=config.IDEMPOTENCY_TTL, negative_ttl=0)
+
+
+def message_key(msg: Dict[str, Any], body: Dict[str, Any]) -> str:
+    """Return the idempotency key for an SQS message.
+
+    Scheduled occurrences are keyed by series and due time, because a
+    re-dispatched occurrence arrives with a new MessageId. Everything else is
+    keyed by MessageId plus a hash of the body.
+    """
+    if body.get("ScheduleSeriesId") and body.get("ScheduledFor"):
+        return f"schedule:{body['ScheduleSeriesId']}:{body['ScheduledFor']}"
+    digest = hashlib.sha256(msg["Body"].encode("utf-8")).hexdigest()[:32]
+    return f"{msg['MessageId']}:{digest}"
+
+
+def _table() -> Any:
+    return aws_clients.resource("dynamodb", config.AWS_REGION).Table(config.IDEMPOTENCY_TABLE)
+
+
+# Set when the configured table turns out not to exist, so it is not tried for every message
+_table_missing = False
+
+
+def _table_available() -> bool:
+    # While DynamoDB's breaker is open, fail open without waiting on the table
+    return bool(config.IDEMPOTENCY_TABLE) and not _table_missing and not breaker.dynamodb.is_open()
+
+
+def _table_failed(e: Exception, message: str) -> None:
+    """Log a failed table call; a missing table disables the durable layer with one warning."""
+    global _table_missing
+    if isinstance(e, ClientError) and e.response.get("Error", {}).get("Code") == "ResourceNotFoundException":
+        if not _table_missing:
+            _table_missing = True
+            logger.log(
+                f"Idempotency table {config.IDEMPOTENCY_TABLE} does not exist; "
+                "suppressing duplicates within this process only", level="WARNING",
+            )
+        return
+    logger.log(f"{message}: {e}", level="WARNING")
+
+
+def begin(key: str) -> str:
+    """Claim ``key`` before sending. Returns NEW, DONE or BUSY.
+
+    If the idempotency table is unreachable the claim fails open (NEW): a rare
+    duplicate is preferred over holding up delivery.
+    """
+    if delivered_keys.contains(key):
+        return DONE
+    if not _table_available():
+        return NEW
+
+    now = int(time.time())
+    try:
+        with breaker.dynamodb.guard():
+            _table().put_item(
+                Item={
+                    "IdempotencyKey": key,
+                    "Status": STATUS_IN_PROGRESS,
+                    "ClaimedAt": now,
+                    "ExpiresAt": now + int(config.IDEMPOTENCY_TTL),
+                },
+                ConditionExpression="attribute_not_exists(IdempotencyKey) OR (#s = :in_progress AND ClaimedAt < :stale)",
+                ExpressionAttributeNames={"#s": "Status"},
+                ExpressionAttributeValues={
+                    ":in_progress": STATUS_IN_PROGRESS,
+                    ":stale": now - int(config.IDEMPOTENCY_CLAIM_TIMEOUT),
+                },
+            )
+        return NEW
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            _table_failed(e, "Idempotency claim failed, sending anyway")
+            return NEW
+    except Exception as e:
+        _table_failed(e, "Idempotency claim failed, sending anyway")
+        return NEW
+
+    try:
+        with breaker.dynamodb.guard():
+            item = _table().get_item(Key={"IdempotencyKey": key}, ConsistentRead=True).get("Item") or {}
+    except Exception as e:
+        _table_failed(e, "Idempotency lookup failed")
+        return BUSY
+    if item.get("Status") == STATUS_DELIVERED:
+        delivered_keys.set(key, True)
+        return DONE
+    return BUSY
+
+
+def complete(key: str) -> None:
+    """Mark ``key`` as delivered."""
+    delivered_keys.set(key, True)
+    if not _table_available():
+        return
+    try:
+        with breaker.dynamodb.guard():
+            _table().update_item(
+                Key={"IdempotencyKey": key},
+                UpdateExpression="SET #s = :delivered",
+                ExpressionAttributeNames={"#s": "Status"},
+                ExpressionAttributeValues={":delivered": STATUS_DELIVERED},
+            )
+    except Exception as e:
+        _table_failed(e, "Failed to mark message delivered")
+
+
+def abandon(key: str) -> None:
+    """Release the claim on ``key`` after a failed send so a retry can claim it."""
+    if not _table_available():
+        return
+    try:
+        with breaker.dynamodb.guard():
+            _table().delete_item(
+                Key={"IdempotencyKey": key},
+                ConditionExpression="#s = :in_progress",
+                ExpressionAttributeNames={"#s": "Status"},
+                ExpressionAttributeValues={":in_progress": STATUS_IN_PROGRESS},
+            )
+    except Exception as e:
+        _table_failed(e, "Failed to release idempotency claim")
+
+
+def delivered(keys: List[str]) -> Set[str]:
+    """Return the subset of ``keys`` already marked delivered, here or in the idempotency table.
+
+    Keys the table cannot confirm (unreachable, throttled) count as not
+    delivered, failing open like ``begin``.
+    """
+    found = {key for key in keys if delivered_keys.contains(key)}
+    remaining = [key for key in keys if key not in found]
+    if not remaining or not _table_available():
+        return found
+    resource = aws_clients.resource("dynamodb", config.AWS_REGION)
+    try:
+        # BatchGetItem reads at most 100 keys per call
+        for start in range(0, len(remaining), 100):
+            request = {
+                config.IDEMPOTENCY_TABLE: {
+                    "Keys": [{"IdempotencyKey": key} for key in remaining[start:start + 100]],
+                    "ConsistentRead": True,
+                }
+            }
+            for _ in range(3):
+                with breaker.dynamodb.guard():
+                    response = resource.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(config.IDEMPOTENCY_TABLE, []):
+                    if item.get("Status") == STATUS_DELIVERED:
+                        found.add(item["IdempotencyKey"])
+                        delivered_keys.set(item["IdempotencyKey"], True)
+                request = response.get("UnprocessedKeys")
+                if not request:
+                    break
+    except Exception as e:
+        _table_failed(e, "Delivered-parts lookup failed, sending them anyway")
+    return found
+
+
+def mark_delivered(key: str) -> None:
+    """Record ``key`` as delivered without a claim, e.g. for one part of a message."""
+    delivered_keys.set(key, True)
+    if not _table_available():
+        return
+    now = int(time.time())
+    try:
+        with breaker.dynamodb.guard():
+            _table().put_item(
+                Item={
+                    "IdempotencyKey": key,
+                    "Status": STATUS_DELIVERED,
+                    "ClaimedAt": now,
+                    "ExpiresAt": now + int(config.IDEMPOTENCY_TTL),
+                }
+            )
+    except Exception as e:
+        _table_failed(e, "Failed to record delivered part")
@@ -0,0 +1,130 @@
+"""Background, batched request-log writer for worker service."""
+import atexit
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from . import logger
+from .metrics import stage_latency
+
+# DynamoDB caps BatchWriteItem at 25 put requests per call
+MAX_BATCH_SIZE = 25
+
+
+class RequestLogSink:
+    """Buffers request-log items and writes them with BatchWriteItem off the hot path.
+
+    Items are queued without blocking; a background thread writes them in
+    batches of up to 25 once a batch is full or ``flush_interval`` seconds
+    have passed. Unprocessed items are retried with exponential backoff. When
+    the queue is full new items are dropped and counted instead of slowing
+    down message delivery.
+    """
+    def __init__(
+        self,
+        get_dynamodb: Callable[[], Any],
+        table_name: str,
+        max_queue_size: int = 10000,
+        flush_interval: float = 1.0,
+        max_retries: int = 5,
+    ) -> None:
+        self.get_dynamodb = get_dynamodb
+        self.table_name = table_name
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def put(self, item: Dict[str, Any]) -> None:
+        """Queue an item for writing. Never blocks."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.log(f"Request log queue full, dropped {self.dropped} items so far", level="WARNING")
+
+    def close(self, timeout: Optional[float] = 10) -> None:
+        """Stop the writer thread after flushing everything that is queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Write anything queued after the thread stopped (or if it never started)
+        self._write_batches(self._drain(), final=True)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-log-sink", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _drain(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        while limit is None or len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch: List[Dict[str, Any]] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < MAX_BATCH_SIZE and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write_batches(batch)
+
+    def _write_batches(self, items: List[Dict[str, Any]], final: bool = False) -> None:
+        for start in range(0, len(items), MAX_BATCH_SIZE):
+            self._write(items[start:start + MAX_BATCH_SIZE])
+        if final and items:
+            logger.log(f"Flushed {len(items)} pending request log items")
+
+    def _write(self, items: List[Dict[str, Any]]) -> None:
+        if not items:
+            return
+        request_items = {self.table_name: [{"PutRequest": {"Item": item}} for item in items]}
+        delay = 0.05
+        for attempt in range(self.max_retries + 1):
+            try:
+                with stage_latency.time("log_write"):
+                    response = self.get_dynamodb().batch_write_item(RequestItems=request_items)
+            except Exception as e:
+                logger.log(f"Failed to write request log batch (attempt {attempt + 1}): {e}", level="WARNING")
+            else:
+                request_items = response.get("UnprocessedItems") or {}
+                if not request_items:
+                    self.written += len(items)
+                    return
+            if attempt < self.max_retries:
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+
+        unprocessed = sum(len(v) for v in request_items.values())
+        self.written += len(items) - unprocessed
+        self.failed += unprocessed
+        logger.log(f"Gave up writing {unprocessed} request log items after {self.max_retries} retries", level="ERROR")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
@@ -1,19 +1,158 @@
-"""Simple logging utility for worker service."""
-import sys
+"""Non-blocking structured logging for worker service.
+
+Records are put on a bounded queue and written as JSON lines to stdout by a
+background thread, so callers never wait on stdout. When the queue is full
+new records are dropped and counted. Chatty per-message events can be
+sampled with ``LOG_SAMPLE_RATES`` (e.g. ``message_processed=0.01``); warnings
+and errors are never sampled.
+"""
+import atexit
+import json
 import logging
-from typing import Any
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+from . import config
+
+# Fields in a notification body that identify a person
+_REDACTED_FIELDS = ("PhoneNumber", "PushToken")
+_TRUNCATED_FIELDS = ("Message", "Subject")
+
+_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
+
+def _parse_sample_rates(value: str) -> Dict[str, float]:
+    rates: Dict[str, float] = {}
+    for item in value.split(","):
+        if "=" in item:
+            event, rate = item.split("=", 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+_sample_rates = _parse_sample_rates(config.LOG_SAMPLE_RATES)
+
+
+def mask(value: Any, keep: int = 4) -> str:
+    """Hide all but the last ``keep`` characters of an identifier."""
+    text = str(value)
+    return "***" + text[-keep:] if len(text) > keep else "***"
+
+
+def truncate(value: Any, limit: Optional[int] = None) -> str:
+    limit = config.LOG_MAX_FIELD_LENGTH if limit is None else limit
+    text = str(value)
+    return text if len(text) <= limit else text[:limit] + "...[truncated]"
+
+
+def redact(body: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Return a copy of a notification body that is safe to log.
+
+    Recipients are reduced to a count or masked, and free text is truncated.
+    """
+    if not isinstance(body, dict):
+        return body
+    safe = dict(body)
+    if "EmailAddresses" in safe:
+        addresses = safe.pop("EmailAddresses")
+        safe["EmailCount"] = len(addresses) if isinstance(addresses, list) else 1
+    for field in _REDACTED_FIELDS:
+        if safe.get(field):
+            safe[field] = mask(safe[field])
+    for field in _TRUNCATED_FIELDS:
+        if field in safe:
+            safe[field] = truncate(safe[field])
+    return safe
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.process,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        event = getattr(record, "event", None)
+        if event:
+            entry["event"] = event
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Queue handler that never blocks and leaves formatting to the listener thread."""
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record  # Same process: no need to pre-format for pickling
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+_handler = _DroppingQueueHandler(_queue)
+_stream = logging.StreamHandler(sys.stderr if config.LOG_STREAM.lower() == "stderr" else sys.stdout)
+_stream.setFormatter(JsonFormatter())
+_listener = QueueListener(_queue, _stream)
+
+# Route everything (including boto3's warnings) through the queue
+_root = logging.getLogger()
+_root.handlers = [_handler]
+_root.setLevel(_LEVELS.get(config.LOG_LEVEL.upper(), logging.INFO))
 logger = logging.getLogger(__name__)
+_listener.start()
+
+
+def _stop() -> None:
+    # Let the listener write what is queued before the process exits
+    for _ in range(50):
+        try:
+            _listener.stop()
+            return
+        except queue.Full:
+            time.sleep(0.01)
+
+
+atexit.register(_stop)
+
+
+def dropped() -> int:
+    """Number of records dropped because the log queue was full."""
+    return _handler.dropped
+
 
-def log(msg: Any) -> None:
-    """Log message to stdout and logger."""
-    message = f"[✓] {msg}"
-    sys.stdout.write(f"{message}\n")
-    sys.stdout.flush()
-    logger.info(msg)
+def log(msg: Any, level: str = "INFO", event: Optional[str] = None, **fields: Any) -> None:
+    """Log a message without blocking.
 
+    ``event`` names the kind of record for sampling and filtering; extra
+    keyword arguments are added to the JSON line as fields.
+    """
+    levelno = _LEVELS.get(level, logging.INFO)
+    if not logger.isEnabledFor(levelno):
+        return
+    if event is not None and levelno < logging.WARNING:
+        rate = _sample_rates.get(event)
+        if rate is not None and random.random() >= rate:
+            return
+    logger.log(levelno, msg, extra={"event": event, "fields": fields})
@@ -1,76 +1,308 @@
 """Main worker process for handling SQS messages."""
-import json
+import signal
+import threading
 import time
-from typing import Dict, Any, List
-from . import sqs_client, dynamodb_client, notifier, logger
+from typing import Dict, Any, List, Optional
+from . import aws_clients, breaker, config, envelope, failures, priority, sqs_client, dynamodb_client, notifier, fanout, scheduler, idempotency, logger
+from .breaker import CircuitOpenError
 from .health import health_checker
+from .heartbeat import heartbeat
+from .metrics import MetricsServer, register_counter, register_gauge, stage_latency
+from .pipeline import MessagePipeline
+from .poller import PollController
+from .rate_limiter import send_scheduler
+from .templates import TemplateError
+
+
+def _message_content(app_id: str, body: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """Return the ``Subject``, ``Html`` and ``Text`` to send: rendered from ``TemplateId`` or taken from the body."""
+    template_id = body.get("TemplateId")
+    if not template_id:
+        return {"Subject": body.get("Subject"), "Html": None, "Text": body["Message"]}
+    template = dynamodb_client.get_template(app_id, str(template_id))
+    if template is None:
+        raise failures.PermanentError("TemplateNotFound", f"Template not found: {template_id}")
+    try:
+        return template.render(body.get("Variables"))
+    except TemplateError as e:
+        raise failures.PermanentError("TemplateRenderFailed", str(e))
 
 
 def _process_message(msg: Dict[str, Any]) -> bool:
-    """Process a single SQS message. Returns True if successful, False otherwise."""
+    """Process a single SQS message.
+
+    Returns True if the message should be deleted: it was delivered, or it
+    can never be and was moved to the DLQ. Returns False to retry it later.
+    """
     body = None
+    claim = None
     try:
-        body = json.loads(msg["Body"])
+        # Compressed and stored payloads are resolved here
+        body = envelope.decode(msg["Body"])
         app_id = body["Application"]
-        logger.log(f"Processing message for application: {app_id}")
-        cfg = dynamodb_client.get_application_config(app_id)
-        if not cfg:
-            raise ValueError("App config not found")
+
+        # Hand the message straight back while its channel's dependency is known to be down
+        open_breaker = breaker.blocked(body.get("OutputType"))
+        if open_breaker is not None:
+            raise CircuitOpenError(open_breaker.name, open_breaker.retry_after())
+
+        # SQS may deliver a message more than once; never send it twice
+        claim = idempotency.message_key(msg, body)
+        state = idempotency.begin(claim)
+        if state == idempotency.DONE:
+            claim = None
+            logger.log(
+                "Message was already delivered, acknowledging without resending",
+                event="duplicate_delivery", message_id=msg["MessageId"], application=app_id,
+            )
+            health_checker.record_duplicate()
+            return True
+        if state == idempotency.BUSY:
+            claim = None
+            logger.log(
+                "Message is being delivered by another worker, leaving it for retry",
+                event="delivery_in_progress", message_id=msg["MessageId"], application=app_id,
+            )
+            return False
 
         output = body.get("OutputType")
+        logger.log(
+            "Processing message", level="DEBUG", event="message_received",
+            message_id=msg["MessageId"], application=app_id, output_type=output,
+        )
+        with stage_latency.time("config_lookup", output, app_id):
+            cfg = dynamodb_client.get_application_config(app_id)
+            if not cfg and failures.receive_count(msg) > 1:
+                # The app may have been registered since the miss was cached
+                dynamodb_client.invalidate_application_config(app_id)
+                cfg = dynamodb_client.get_application_config(app_id)
+        if not cfg:
+            # Messages sent just after an app is registered can beat its config; retry them a few times first
+            if failures.receive_count(msg) < config.APP_CONFIG_MISS_RETRIES:
+                raise RuntimeError(f"App config not found: {app_id}")
+            raise failures.PermanentError("AppConfigNotFound", "App config not found")
+
+        with stage_latency.time("render", output, app_id):
+            content = _message_content(app_id, body)
+
+        send_started = time.perf_counter()
         if output == "EMAIL":
-            notifier.send_email(cfg["SES-Domain-ARN"], body["EmailAddresses"], body["Subject"], body["Message"])
-            logger.log(f"Email sent to {body['EmailAddresses']}")
+            # Large recipient lists are split into SES-sized chunks and sent in parallel
+            result = fanout.send_email_fanout(
+                idempotency.message_key(msg, body), app_id, cfg["SES-Domain-ARN"],
+                body["EmailAddresses"], content["Subject"] or body["Subject"], content["Text"], content["Html"],
+            )
+            logger.log(
+                "Email sent", event="notification_sent", message_id=msg["MessageId"], application=app_id,
+                output_type=output, recipients=len(body["EmailAddresses"]), chunks=result["chunks"],
+            )
         elif output in ["SMS", "PUSH"]:
-            notifier.send_sns(cfg["SNS-Topic-ARN"], body["Message"])
-            logger.log(f"Notification sent via {output} to {body['PhoneNumber'] or body['PushToken']}")
+            if not content["Text"]:
+                raise failures.PermanentError("TemplateHasNoText", f"{output} needs a template with a Text part")
+            waited = send_scheduler.acquire(output, app_id)
+            stage_latency.observe("rate_limit_wait", waited, output, app_id)
+            if waited >= 0.01:
+                logger.log(
+                    "Delayed send to stay within send rate", event="send_delayed",
+                    application=app_id, output_type=output, waited_seconds=round(waited, 3),
+                )
+            broadcast = bool(body.get("Broadcast"))
+            if output == "SMS" and body.get("PhoneNumber") and not broadcast:
+                notifier.send_sms(body["PhoneNumber"], content["Text"])
+                target = logger.mask(body["PhoneNumber"])
+            elif output == "PUSH" and notifier.can_push_directly(cfg, body.get("PushToken")) and not broadcast:
+                target = notifier.resolve_push_endpoint(cfg.get("SNS-Platform-Application-ARN"), body["PushToken"])
+                notifier.send_push(target, content["Text"])
+            else:
+                # Broadcast, or no direct target (e.g. the app has no platform application): send to the topic
+                notifier.send_sns(cfg["SNS-Topic-ARN"], content["Text"])
+                target = cfg["SNS-Topic-ARN"]
+            logger.log(
+                "Notification sent", event="notification_sent", message_id=msg["MessageId"],
+                application=app_id, output_type=output, target=target,
+            )
         else:
-            raise ValueError("Unsupported OutputType")
+            raise failures.PermanentError("UnsupportedOutputType", f"Unsupported OutputType: {output}")
+        stage_latency.observe("send", time.perf_counter() - send_started, output, app_id)
+
+        idempotency.complete(claim)
+        claim = None
+
+        try:
+            # Recurring notifications are expanded one occurrence at a time
+            scheduler.schedule_next(body)
+        except Exception as e:
+            logger.log(f"Failed to schedule next occurrence: {e}", level="ERROR", message_id=msg["MessageId"])
 
         dynamodb_client.log_request(app_id, body, "delivered")
-        logger.log(f"Message processed successfully: {body}")
+        logger.log(
+            "Message processed successfully", level="DEBUG", event="message_processed",
+            message_id=msg["MessageId"], application=app_id, output_type=output,
+        )
         health_checker.record_message_processed()
         return True
     except Exception as e:
-        # Log the error
-        dynamodb_client.log_request(body.get("Application", "unknown") if body else "unknown", body, "failed", str(e))
-        logger.log(f"Error processing message: {e}")
+        if claim:
+            # Let the retry claim it again
+            idempotency.abandon(claim)
+        application = str(body.get("Application", "unknown")) if isinstance(body, dict) else "unknown"
+        # Stop extending its visibility before choosing when it comes back; an extension
+        # still in flight would otherwise overwrite the retry delay
+        heartbeat.untrack(msg["ReceiptHandle"], wait=True)
+        tripped = breaker.find_open_error(e)
+        if tripped is not None:
+            # Not the message's fault: bring it back once the breaker probes again, without logging a failure
+            delay = failures.retry_later(msg, min_delay=tripped.retry_after)
+            logger.log(
+                f"Released message while {tripped.dependency} is unavailable, retrying in {delay}s",
+                level="DEBUG", event="circuit_open_release", message_id=msg.get("MessageId"), dependency=tripped.dependency,
+            )
+            return False
         health_checker.record_error()
-        # Don't delete the message - let it retry or go to DLQ
-        logger.log(f"Message will be retried or sent to DLQ after max attempts")
+        reason = failures.classify(e)
+        if reason and failures.dead_letter(msg, reason, str(e)):
+            dynamodb_client.log_request(application, body, "failed", f"{reason}: {e}")
+            logger.log(
+                f"Message can never be delivered, moved to DLQ: {e}", level="ERROR", event="message_dead_lettered",
+                message_id=msg.get("MessageId"), reason=reason, request=logger.redact(body),
+            )
+            health_checker.record_dlq_message()
+            # Deleted from the source queue like a delivered message
+            return True
+        # Transient: retry after a backoff, or reach the DLQ through the queue's redrive policy
+        channel = breaker.blocked(body.get("OutputType") if isinstance(body, dict) else None)
+        delay = failures.retry_later(msg, min_delay=channel.retry_after() if channel else 0)
+        dynamodb_client.log_request(application, body, "retrying", str(e))
+        logger.log(
+            f"Error processing message, retrying in {delay}s: {e}",
+            level="ERROR", event="message_failed", message_id=msg.get("MessageId"),
+            retry_in_seconds=delay, request=logger.redact(body),
+        )
+        health_checker.record_retry()
         return False
 
 
-def run_worker() -> None:
-    """Main worker loop for processing SQS messages."""
-    logger.log("Worker started polling SQS...")
-    backoff_delay = 1  # Initial backoff delay in seconds
-    max_backoff = 60   # Maximum backoff delay in seconds
-    
-    while True:
+def _register_gauges(pipeline: MessagePipeline, poll_controller: PollController) -> None:
+    register_gauge("worker_in_flight_messages", "Messages currently being processed.", lambda: pipeline.in_flight)
+    register_gauge("worker_pipeline_capacity", "Maximum messages processed in parallel.", lambda: pipeline.max_in_flight)
+    register_gauge("worker_pollers", "Active SQS pollers.", lambda: poll_controller.poller_count)
+    register_gauge("worker_visibility_tracked_messages", "Messages kept invisible by heartbeats.", lambda: heartbeat.in_flight)
+    register_counter("worker_visibility_extensions_total", "Visibility extensions made so far.", lambda: heartbeat.extended)
+    register_gauge(
+        "worker_request_log_queued", "Request-log items waiting to be written.",
+        lambda: dynamodb_client.request_log_sink.stats()["queued"],
+    )
+    register_counter(
+        "worker_request_log_dropped_total", "Request-log items dropped because the queue was full.",
+        lambda: dynamodb_client.request_log_sink.stats()["dropped"],
+    )
+    register_gauge("worker_app_config_cache_size", "Cached application configs.", lambda: dynamodb_client.app_config_cache.stats()["size"])
+    register_counter("worker_app_config_cache_hits_total", "Application config cache hits.", lambda: dynamodb_client.app_config_cache.stats()["hits"])
+    register_counter("worker_app_config_cache_misses_total", "Application config cache misses.", lambda: dynamodb_client.app_config_cache.stats()["misses"])
+    register_gauge("worker_template_cache_size", "Cached compiled message templates.", lambda: dynamodb_client.template_cache.stats()["size"])
+    register_counter("worker_template_cache_hits_total", "Message template cache hits.", lambda: dynamodb_client.template_cache.stats()["hits"])
+    register_counter("worker_template_cache_misses_total", "Message template cache misses.", lambda: dynamodb_client.template_cache.stats()["misses"])
+    register_counter("worker_log_records_dropped_total", "Log records dropped because the log queue was full.", logger.dropped)
+    register_gauge("worker_payload_cache_bytes", "Bytes of stored payloads cached in memory.", lambda: envelope.payload_cache.stats()["bytes"])
+    register_counter("worker_payload_cache_hits_total", "Stored payload cache hits.", lambda: envelope.payload_cache.stats()["hits"])
+    register_counter("worker_payload_cache_misses_total", "Stored payload cache misses.", lambda: envelope.payload_cache.stats()["misses"])
+    for name, dependency in breaker.breakers.items():
+        register_gauge(
+            f"worker_circuit_{name}_open", f"1 while the {name} circuit breaker rejects calls.",
+            lambda dependency=dependency: int(dependency.is_open()),
+        )
+        register_counter(f"worker_circuit_{name}_rejected_total", f"Calls to {name} rejected by its circuit breaker.", lambda dependency=dependency: dependency.rejected)
+        register_counter(f"worker_circuit_{name}_opened_total", f"Times the {name} circuit breaker opened.", lambda dependency=dependency: dependency.opened)
+    register_counter("worker_scheduled_dispatched_total", "Scheduled notifications moved onto the queue.", lambda: scheduler.dispatcher.dispatched)
+
+
+def run_worker(stop_event: Optional[threading.Event] = None, metrics_port: int = 0) -> None:
+    """Main worker loop for processing SQS messages.
+
+    When ``stop_event`` is set the worker stops receiving, finishes the
+    messages already in flight, deletes the successful ones and flushes the
+    pending request logs before returning. A non-zero ``metrics_port``
+    serves ``/metrics`` and ``/health`` on that port.
+    """
+    stop_event = stop_event or threading.Event()
+    aws_clients.configure(max_pool_connections=config.AWS_MAX_POOL_CONNECTIONS)
+    queues = priority.queues()
+    logger.log(
+        f"Worker started polling SQS with concurrency {config.WORKER_CONCURRENCY} "
+        f"across tiers {', '.join(tier for tier, _ in queues)}..."
+    )
+    acknowledger = sqs_client.BatchAcknowledger()
+
+    def handle(msg: Dict[str, Any]) -> bool:
         try:
-            messages = sqs_client.poll_messages()
-            # Reset backoff delay after successful API call
-            backoff_delay = 1
-        except Exception as e:
-            logger.log(f"Error polling SQS: {e}")
-            logger.log(f"Backing off for {backoff_delay} seconds")
-            health_checker.record_error()
-            time.sleep(backoff_delay)
-            # Double the backoff delay for next attempt, up to maximum
-            backoff_delay = min(backoff_delay * 2, max_backoff)
-            continue
-        
-        if not messages:
-            time.sleep(1)  # Short sleep when no messages
-            continue
-            
-        for msg in messages:
-            if _process_message(msg):
-                # Only delete message if processing was successful
-                sqs_client.delete_message(msg["ReceiptHandle"])
-                logger.log("Message deleted from SQS")
+            with stage_latency.time("process"):
+                return _process_message(msg)
+        finally:
+            # Acknowledged or abandoned: either way stop extending its visibility
+            heartbeat.untrack(msg["ReceiptHandle"])
 
-if __name__ == "__main__":
-    run_worker()
+    # Only the highest configured tier may use the last few slots
+    headroom = {tier: config.PRIORITY_RESERVED_SLOTS for tier, _ in queues[1:]}
+    pipeline = MessagePipeline(
+        handle,
+        lambda msg: acknowledger.add(msg["ReceiptHandle"], msg.get("QueueUrl")),
+        config.WORKER_CONCURRENCY,
+        weights=priority.weights,
+        headroom=headroom,
+    )
+    # Pollers feed the pipeline until the stop event is set; one receive is always from a single queue
+    poll_controller = PollController(
+        pipeline,
+        stop_event,
+        on_receive=lambda messages: heartbeat.track([m["ReceiptHandle"] for m in messages], messages[0].get("QueueUrl")),
+        queues=queues,
+    )
+    metrics_server = None
+    if metrics_port:
+        _register_gauges(pipeline, poll_controller)
+        metrics_server = MetricsServer(metrics_port)
+        try:
+            metrics_server.start()
+        except OSError as e:
+            logger.log(f"Metrics endpoint disabled, cannot listen on port {metrics_port}: {e}", level="WARNING")
+            metrics_server = None
+    heartbeat.start()
+    if config.SCHEDULER_ENABLED:
+        threading.Thread(
+            target=scheduler.dispatcher.run, args=(stop_event,), name="schedule-dispatcher", daemon=True
+        ).start()
+    poll_controller.run()
+
+    logger.log(f"Worker stopping: draining {pipeline.in_flight} in-flight messages...")
+    if not pipeline.drain(timeout=config.SHUTDOWN_TIMEOUT):
+        logger.log(f"Shutdown timeout reached with {pipeline.in_flight} messages still in flight", level="WARNING")
+    pipeline.shutdown(wait=False)
+    heartbeat.stop()
+    # Both flushes share one budget so the process exits within config.STOP_TIMEOUT
+    flush_deadline = time.monotonic() + config.SHUTDOWN_FLUSH_TIMEOUT
+    acknowledger.close(timeout=config.SHUTDOWN_FLUSH_TIMEOUT)
+    dynamodb_client.request_log_sink.close(timeout=max(0.0, flush_deadline - time.monotonic()))
+    if metrics_server is not None:
+        metrics_server.stop()
+    logger.log("Worker stopped")
 
+
+def main(slot: int = 0) -> None:
+    """Run a single worker process until SIGTERM or SIGINT.
+
+    ``slot`` is the process's index under the supervisor; it offsets the
+    metrics port so every process can be scraped.
+    """
+    stop_event = threading.Event()
+
+    def handle_signal(signum: int, frame: Any) -> None:
+        logger.log(f"Received signal {signum}, stopping worker...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    run_worker(stop_event, config.METRICS_PORT + slot if config.METRICS_PORT else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Stage latency histograms and Prometheus metrics endpoint for worker service."""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from . import config, logger
+from .health import health_checker
+
+# Upper bounds in seconds; covers cache hits (sub-millisecond) up to throttled sends
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Label value used for applications beyond the cardinality limit
+OTHER_APPLICATION = "other"
+
+LabelKey = Tuple[str, str, str]  # (stage, output_type, application)
+
+
+class StageHistograms:
+    """Cumulative latency histograms per (stage, OutputType, application).
+
+    Observing costs a bisect and a few additions under one lock. Batch stages
+    (receive, delete, log write) are not tied to a single message and are
+    recorded with empty OutputType and application labels. At most
+    ``max_applications`` distinct applications get their own series; the rest
+    are folded into ``other`` so a flood of app ids cannot grow memory.
+    """
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, max_applications: int = 100) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.max_applications = max_applications
+        # label key -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = {}
+        self._applications: set = set()
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, output_type: str = "", application: str = "") -> None:
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            if application and application not in self._applications:
+                if len(self._applications) >= self.max_applications:
+                    application = OTHER_APPLICATION
+                else:
+                    self._applications.add(application)
+            key = (stage, output_type or "", application or "")
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += seconds
+
+    @contextmanager
+    def time(self, stage: str, output_type: str = "", application: str = "") -> Iterator[None]:
+        """Record how long the ``with`` block took, whether or not it raised."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, output_type, application)
+
+    def snapshot(self) -> Dict[LabelKey, Tuple[List[int], float]]:
+        with self._lock:
+            return {key: (list(counts), self._sums[key]) for key, counts in self._counts.items()}
+
+
+stage_latency = StageHistograms(max_applications=config.METRICS_MAX_APPLICATIONS)
+
+# name -> (help text, callable returning the current value)
+_gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+_counters: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+
+def register_gauge(name: str, help_text: str, read: Callable[[], float]) -> None:
+    """Expose ``read()`` as a gauge on the metrics endpoint."""
+    _gauges[name] = (help_text, read)
+
+
+def register_counter(name: str, help_text: str, read: Callable[[], float]) -> None:
+    """Expose ``read()``, a count that only goes up, as a counter. ``name`` must end in ``_total``."""
+    if not name.endswith("_total"):
+        raise ValueError("counter names must end in _total")
+    _counters[name] = (help_text, read)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+def render() -> str:
+    """Return every metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+
+    status = health_checker.get_status()
+    counters = [
+        ("worker_messages_processed_total", "Messages delivered successfully.", status["messages_processed"]),
+        ("worker_errors_total", "Message processing and polling errors.", status["errors_count"]),
+        ("worker_dlq_messages_total", "Messages moved to the dead-letter queue.", status["dlq_messages_count"]),
+        ("worker_duplicates_total", "Redelivered messages acknowledged without resending.", status["duplicates_count"]),
+        ("worker_retries_total", "Failed messages scheduled for a delayed retry.", status["retries_count"]),
+    ]
+    for name, help_text, value in counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {value}"]
+    lines += [
+        "# HELP worker_uptime_seconds Seconds since the worker process started.",
+        "# TYPE worker_uptime_seconds gauge",
+        f"worker_uptime_seconds {status['uptime_seconds']:.3f}",
+    ]
+
+    for kind, registered in (("counter", _counters), ("gauge", _gauges)):
+        for name, (help_text, read) in sorted(registered.items()):
+            try:
+                value = float(read())
+            except Exception as e:
+                logger.log(f"Failed to read {kind} {name}: {e}", level="WARNING")
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value:g}"]
+
+    name = "worker_stage_duration_seconds"
+    lines += [f"# HELP {name} Time spent in each processing stage.", f"# TYPE {name} histogram"]
+    for (stage, output_type, application), (counts, total) in sorted(stage_latency.snapshot().items()):
+        labels = f'stage="{_escape(stage)}",output_type="{_escape(output_type)}",application="{_escape(application)}"'
+        cumulative = 0
+        for bound, count in zip(stage_latency.buckets, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = render().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/health":
+            body = json.dumps(health_checker.get_status()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass  # Scrapes would otherwise flood the worker log
+
+
+class MetricsServer:
+    """Serves ``/metrics`` and ``/health`` from a background thread."""
+    def __init__(self, port: int, host: str = "0.0.0.0") -> None:
+        self.port = port
+        self.host = host
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> None:
+        self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.log(f"Metrics endpoint listening on port {self.port}")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -1,41 +1,195 @@
-import boto3
-from typing import List, Dict, Any
-from . import config
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Any, Tuple, Optional
+from . import aws_clients, breaker, config
+from .breaker import CircuitOpenError
+from .cache import TTLCache
+from .failures import PermanentError
 
-ses = boto3.client("ses", region_name=config.AWS_REGION)
-sns = boto3.client("sns", region_name=config.AWS_REGION)
+# SNS PublishBatch accepts at most 10 entries per call
+SNS_MAX_BATCH_SIZE = 10
 
-def send_email(domain_arn: str, to_addresses: List[str], subject: str, body: str) -> Dict[str, Any]:
-    """Send email notification via Amazon SES."""
+def get_ses_client() -> Any:
+    """Get the shared SES client."""
+    return aws_clients.client("ses", config.AWS_REGION)
+
+def get_sns_client() -> Any:
+    """Get the shared SNS client."""
+    return aws_clients.client("sns", config.AWS_REGION)
+
+def send_email(domain_arn: str, to_addresses: List[str], subject: str, body: Optional[str], html: Optional[str] = None) -> Dict[str, Any]:
+    """Send email notification via Amazon SES, with a text part, an HTML part or both."""
     if not to_addresses or not isinstance(to_addresses, list):
         raise ValueError("to_addresses must be a non-empty list")
     if not subject or not isinstance(subject, str):
         raise ValueError("subject must be a non-empty string")
-    if not body or not isinstance(body, str):
-        raise ValueError("body must be a non-empty string")
+    if not (body and isinstance(body, str)) and not (html and isinstance(html, str)):
+        raise ValueError("body or html must be a non-empty string")
     
-    try:
-        sender_email = "notifications@project-dolphin.com"
-        return ses.send_email(
-            Source=sender_email,
-            Destination={"ToAddresses": to_addresses},
-            Message={
-                "Subject": {"Data": subject},
-                "Body": {"Text": {"Data": body}}
-            }
-        )
-    except Exception as e:
-        raise RuntimeError(f"Failed to send email: {str(e)}")
+    parts = {}
+    if body:
+        parts["Text"] = {"Data": body, "Charset": "UTF-8"}
+    if html:
+        parts["Html"] = {"Data": html, "Charset": "UTF-8"}
+    with breaker.ses.guard():
+        try:
+            sender_email = "notifications@project-dolphin.com"
+            return get_ses_client().send_email(
+                Source=sender_email,
+                Destination={"ToAddresses": to_addresses},
+                Message={
+                    "Subject": {"Data": subject, "Charset": "UTF-8"},
+                    "Body": parts
+                }
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to send email: {str(e)}")
+
+class TopicBatchPublisher:
+    """Coalesces publishes to the same topic into PublishBatch calls.
+
+    Each ``publish`` returns a Future for its own entry. A topic's batch is
+    sent once it holds 10 entries or ``linger`` seconds after its first entry
+    arrived. Entries reported in ``Failed`` fail only their own future.
+    """
+    def __init__(self, linger: float = 0.05) -> None:
+        self.linger = linger
+        self._batches: Dict[str, List[Tuple[str, Future]]] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, topic_arn: str, message: str) -> "Future[Dict[str, Any]]":
+        future: "Future[Dict[str, Any]]" = Future()
+        batch = None
+        with self._cond:
+            self._ensure_started()
+            entries = self._batches.setdefault(topic_arn, [])
+            entries.append((message, future))
+            self._deadlines.setdefault(topic_arn, time.monotonic() + self.linger)
+            if len(entries) >= SNS_MAX_BATCH_SIZE:
+                batch = self._take(topic_arn)
+            else:
+                self._cond.notify_all()
+        if batch:
+            # A full batch is sent right away on the caller's thread
+            self._send(topic_arn, batch)
+        return future
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sns-batcher", daemon=True)
+            self._thread.start()
+
+    def _take(self, topic_arn: str) -> List[Tuple[str, Future]]:
+        self._deadlines.pop(topic_arn, None)
+        return self._batches.pop(topic_arn, [])
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._deadlines:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                due = [topic for topic, deadline in self._deadlines.items() if deadline <= now]
+                if not due:
+                    self._cond.wait(min(self._deadlines.values()) - now)
+                    continue
+                batches = [(topic, self._take(topic)) for topic in due]
+            for topic, batch in batches:
+                self._send(topic, batch)
+
+    def _send(self, topic_arn: str, batch: List[Tuple[str, Future]]) -> None:
+        entries = [{"Id": str(i), "Message": message} for i, (message, _) in enumerate(batch)]
+        try:
+            with breaker.sns.guard():
+                response = get_sns_client().publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=entries)
+        except CircuitOpenError as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(RuntimeError(f"Failed to send SNS message: {str(e)}"))
+            return
+
+        for result in response.get("Successful", []):
+            batch[int(result["Id"])][1].set_result(result)
+        for failure in response.get("Failed", []):
+            error = f"Failed to send SNS message: {failure.get('Code')} {failure.get('Message', '')}"
+            # Sender faults are about the entry itself and will fail the same way again
+            batch[int(failure["Id"])][1].set_exception(
+                PermanentError(failure.get("Code") or "SenderFault", error) if failure.get("SenderFault") else RuntimeError(error)
+            )
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(RuntimeError("Failed to send SNS message: missing PublishBatch result"))
+
+
+topic_publisher = TopicBatchPublisher(linger=config.SNS_BATCH_LINGER)
+
+# Platform endpoint ARNs created for raw device tokens
+push_endpoints = TTLCache(max_size=config.PUSH_ENDPOINT_CACHE_SIZE, ttl=86400, negative_ttl=0)
 
 def send_sns(topic_arn: str, message: str) -> Dict[str, Any]:
-    """Send SNS notification to topic."""
+    """Send SNS notification to topic, batched with other publishes to the same topic."""
     if not topic_arn or not isinstance(topic_arn, str):
         raise ValueError("topic_arn must be a non-empty string")
     if not message or not isinstance(message, str):
         raise ValueError("message must be a non-empty string")
     
-    try:
-        return sns.publish(TopicArn=topic_arn, Message=message)
-    except Exception as e:
-        raise RuntimeError(f"Failed to send SNS message: {str(e)}")
+    return topic_publisher.publish(topic_arn, message).result()
+
+def send_sms(phone_number: str, message: str) -> Dict[str, Any]:
+    """Send SMS directly to a single phone number via Amazon SNS."""
+    if not phone_number or not isinstance(phone_number, str):
+        raise ValueError("phone_number must be a non-empty string")
+    if not message or not isinstance(message, str):
+        raise ValueError("message must be a non-empty string")
+    
+    with breaker.sns.guard():
+        try:
+            return get_sns_client().publish(PhoneNumber=phone_number, Message=message)
+        except Exception as e:
+            raise RuntimeError(f"Failed to send SMS: {str(e)}")
+
+def can_push_directly(app_config: Dict[str, Any], push_token: Optional[str]) -> bool:
+    """True if ``push_token`` can be reached without the app's topic: an endpoint ARN, or a raw token the app can register."""
+    if not push_token or not isinstance(push_token, str):
+        return False
+    return push_token.startswith("arn:aws:sns:") or bool(app_config.get("SNS-Platform-Application-ARN"))
 
+def resolve_push_endpoint(platform_application_arn: Optional[str], push_token: str) -> str:
+    """Return the SNS endpoint ARN for a push token, creating the platform endpoint if needed."""
+    if not push_token or not isinstance(push_token, str):
+        raise ValueError("push_token must be a non-empty string")
+    if push_token.startswith("arn:aws:sns:"):
+        return push_token
+    if not platform_application_arn:
+        raise ValueError("SNS-Platform-Application-ARN is required to send to raw push tokens")
+
+    def create(key: Tuple[str, str]) -> str:
+        with breaker.sns.guard():
+            try:
+                # CreatePlatformEndpoint is idempotent for the same token and attributes
+                response = get_sns_client().create_platform_endpoint(PlatformApplicationArn=key[0], Token=key[1])
+                return response["EndpointArn"]
+            except Exception as e:
+                raise RuntimeError(f"Failed to create push endpoint: {str(e)}")
+
+    return push_endpoints.get((platform_application_arn, push_token), create)
+
+def send_push(endpoint_arn: str, message: str) -> Dict[str, Any]:
+    """Send push notification directly to a single SNS platform endpoint."""
+    if not endpoint_arn or not isinstance(endpoint_arn, str):
+        raise ValueError("endpoint_arn must be a non-empty string")
+    if not message or not isinstance(message, str):
+        raise ValueError("message must be a non-empty string")
+    
+    with breaker.sns.guard():
+        try:
+            return get_sns_client().publish(TargetArn=endpoint_arn, Message=message)
+        except Exception as e:
+            raise RuntimeError(f"Failed to send push notification: {str(e)}")
@@ -0,0 +1,132 @@
+"""Concurrent message processing pipeline for worker service."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+from . import logger
+
+
+class MessagePipeline:
+    """Bounded thread pool that processes SQS messages concurrently.
+
+    The number of in-flight messages never exceeds ``max_in_flight``; pollers
+    use ``reserve`` to only receive as many messages as the pipeline can start
+    right away. Each message is acknowledged as soon
+    as its own handler succeeds, independently of the rest of the batch.
+
+    Pollers of different priority tiers share the slots by weighted fair
+    queuing: among the tiers waiting for slots, the one that has received the
+    least in proportion to its weight goes next (ties go to the higher tier),
+    so a backlogged tier gets ``weight / sum of backlogged weights`` of the
+    pipeline and an idle tier gives its share to the others. ``headroom[tier]``
+    slots must stay free after a tier reserves, which keeps capacity ready
+    for the highest tier however much bulk traffic is queued.
+    """
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], bool],
+        on_success: Callable[[Dict[str, Any]], None],
+        max_in_flight: int,
+        weights: Optional[Dict[str, float]] = None,
+        headroom: Optional[Dict[str, int]] = None,
+    ) -> None:
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.handler = handler
+        self.on_success = on_success
+        self.max_in_flight = max_in_flight
+        self.weights = weights or {}
+        self.headroom = {tier: max(0, min(slots, max_in_flight - 1)) for tier, slots in (headroom or {}).items()}
+        # Tier order for ties: highest weight first
+        self._rank = {tier: i for i, tier in enumerate(sorted(self.weights, key=lambda t: -self.weights[t]))}
+        self._in_flight = 0
+        self._waiting: Dict[Optional[str], int] = {}
+        self._virtual_time: Dict[Optional[str], float] = {}
+        self._clock = 0.0
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="worker")
+
+    @property
+    def in_flight(self) -> int:
+        with self._cond:
+            return self._in_flight
+
+    def available(self) -> int:
+        """Number of messages that can be started without blocking."""
+        with self._cond:
+            return self.max_in_flight - self._in_flight
+
+    def _free_for(self, tier: Optional[str]) -> int:
+        return self.max_in_flight - self._in_flight - self.headroom.get(tier, 0)
+
+    def _has_turn(self, tier: Optional[str], minimum: int) -> bool:
+        if self._free_for(tier) < minimum:
+            return False
+        mine = (self._virtual_time.get(tier, 0.0), self._rank.get(tier, 0))
+        # A waiting tier that is further behind its share, and could use a free slot, goes first
+        return not any(
+            (self._virtual_time.get(other, 0.0), self._rank.get(other, 0)) < mine and self._free_for(other) > 0
+            for other, count in self._waiting.items() if count and other != tier
+        )
+
+    def reserve(self, slots: int, minimum: int = 1, timeout: Optional[float] = None, tier: Optional[str] = None) -> int:
+        """Reserve up to ``slots`` slots once at least ``minimum`` are free.
+
+        Lets several pollers share the pipeline without over-receiving. Returns
+        the number of slots reserved (0 on timeout); each one must be used with
+        ``submit(msg, reserved=True)`` or given back with ``release``.
+        ``tier`` names the priority tier the slots are for.
+        """
+        minimum = max(1, min(minimum, slots, self.max_in_flight - self.headroom.get(tier, 0)))
+        with self._cond:
+            if not self._waiting.get(tier):
+                # A tier that was idle starts from now instead of spending credit saved while idle
+                self._virtual_time[tier] = max(self._virtual_time.get(tier, 0.0), self._clock)
+            self._waiting[tier] = self._waiting.get(tier, 0) + 1
+            try:
+                if not self._cond.wait_for(lambda: self._has_turn(tier, minimum), timeout):
+                    return 0
+                reserved = min(slots, self._free_for(tier))
+                self._in_flight += reserved
+                self._clock = self._virtual_time[tier]
+                self._virtual_time[tier] += reserved / self.weights.get(tier, 1.0)
+                return reserved
+            finally:
+                self._waiting[tier] -= 1
+                # Another tier may have its turn now
+                self._cond.notify_all()
+
+    def release(self, slots: int) -> None:
+        """Give back reserved slots that were not used."""
+        with self._cond:
+            self._in_flight -= slots
+            self._cond.notify_all()
+
+    def submit(self, msg: Dict[str, Any], reserved: bool = False) -> None:
+        """Start processing a message, blocking while the pipeline is full."""
+        if not reserved:
+            with self._cond:
+                self._cond.wait_for(lambda: self._in_flight < self.max_in_flight)
+                self._in_flight += 1
+        try:
+            self._executor.submit(self._run, msg)
+        except Exception:
+            self.release(1)
+            raise
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait for all in-flight messages to finish. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._in_flight == 0, timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and optionally wait for in-flight messages."""
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, msg: Dict[str, Any]) -> None:
+        try:
+            if self.handler(msg):
+                self.on_success(msg)
+        except Exception as e:
+            logger.log(f"Unhandled error in message pipeline: {e}")
+        finally:
+            self.release(1)
@@ -0,0 +1,138 @@
+"""Adaptive SQS polling for worker service."""
+import math
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from . import breaker, config, priority, sqs_client, logger
+from .health import health_checker
+from .metrics import stage_latency
+from .pipeline import MessagePipeline
+
+
+class PollController:
+    """Runs a variable number of pollers per priority tier that feed the message pipeline.
+
+    Every ``QUEUE_DEPTH_CHECK_INTERVAL`` seconds the controller reads each
+    tier's ``ApproximateNumberOfMessages`` and scales that tier's pollers
+    between ``MIN_POLLERS`` and ``MAX_POLLERS`` (one per
+    ``MESSAGES_PER_POLLER`` backlog, never more than the pipeline can keep
+    busy). Each poller reserves pipeline slots for its tier before receiving,
+    so pollers never over-receive and the pipeline decides which tier goes
+    next. An empty long poll is followed by the next receive right away,
+    without extra sleep.
+
+    Receiving pauses while the circuit breakers of every channel are open.
+
+    With several tiers a poller only reserves as many slots as its last
+    receive could fill, so pollers idling on an empty queue do not hold
+    capacity the busy tiers could use.
+    """
+    def __init__(
+        self,
+        pipeline: MessagePipeline,
+        stop_event: threading.Event,
+        on_receive: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        queues: Optional[List[Tuple[str, str]]] = None,
+    ) -> None:
+        self.pipeline = pipeline
+        self.stop_event = stop_event
+        self.on_receive = on_receive
+        self.queues = queues or priority.queues()
+        self.adaptive = len(self.queues) > 1
+        # More pollers than full receive batches in the pipeline would only wait for capacity
+        pipeline_batches = math.ceil(pipeline.max_in_flight / sqs_client.MAX_BATCH_SIZE)
+        self.max_pollers = max(1, min(config.MAX_POLLERS, pipeline_batches))
+        self.min_pollers = max(1, min(config.MIN_POLLERS, self.max_pollers))
+        # tier -> running pollers
+        self._pollers: Dict[str, List[Tuple[threading.Thread, threading.Event]]] = {tier: [] for tier, _ in self.queues}
+        self._retired: List[threading.Thread] = []
+        # Receive once half a batch of slots is free: fewer idle slots than waiting for a full batch
+        self.min_receive = max(1, min(sqs_client.MAX_BATCH_SIZE, pipeline.max_in_flight) // 2)
+
+    @property
+    def poller_count(self) -> int:
+        return sum(len(pollers) for pollers in self._pollers.values())
+
+    def desired_pollers(self, depth: int) -> int:
+        wanted = math.ceil(depth / max(config.MESSAGES_PER_POLLER, 1))
+        return max(self.min_pollers, min(self.max_pollers, wanted))
+
+    def run(self) -> None:
+        """Manage pollers until the stop event is set, then wait for them to exit."""
+        for tier, queue_url in self.queues:
+            self._scale_to(tier, queue_url, self.min_pollers)
+        while not self.stop_event.wait(config.QUEUE_DEPTH_CHECK_INTERVAL):
+            for tier, queue_url in self.queues:
+                try:
+                    depth = sqs_client.get_queue_depth(queue_url)
+                except Exception as e:
+                    logger.log(f"Error reading queue depth: {e}", level="WARNING", tier=tier)
+                    continue
+                desired = self.desired_pollers(depth)
+                if desired != len(self._pollers[tier]):
+                    logger.log(f"Queue depth {depth}: scaling {tier} pollers {len(self._pollers[tier])} -> {desired}")
+                    self._scale_to(tier, queue_url, desired)
+
+        running = [poller for pollers in self._pollers.values() for poller in pollers]
+        for _, poller_stop in running:
+            poller_stop.set()
+        for thread in [t for t, _ in running] + self._retired:
+            thread.join()
+
+    def _scale_to(self, tier: str, queue_url: str, count: int) -> None:
+        pollers = self._pollers[tier]
+        while len(pollers) < count:
+            poller_stop = threading.Event()
+            thread = threading.Thread(
+                target=self._poll_loop,
+                args=(tier, queue_url, poller_stop),
+                name=f"poller-{tier}-{len(pollers)}",
+                daemon=True,
+            )
+            thread.start()
+            pollers.append((thread, poller_stop))
+        while len(pollers) > count:
+            # The poller exits after its current receive; its messages are still processed
+            thread, poller_stop = pollers.pop()
+            poller_stop.set()
+            self._retired.append(thread)
+        self._retired = [t for t in self._retired if t.is_alive()]
+
+    def _poll_loop(self, tier: str, queue_url: str, poller_stop: threading.Event) -> None:
+        backoff_delay = 1  # Initial backoff delay in seconds
+        max_backoff = 60   # Maximum backoff delay in seconds
+        wanted = sqs_client.MAX_BATCH_SIZE
+
+        while not (self.stop_event.is_set() or poller_stop.is_set()):
+            pause = breaker.receive_pause()
+            if pause > 0:
+                # Every channel is down: leave messages in the queue instead of cycling them
+                self.stop_event.wait(min(pause, 1.0))
+                continue
+            slots = self.pipeline.reserve(wanted, min(self.min_receive, wanted), timeout=1, tier=tier)
+            if not slots:
+                continue
+            try:
+                with stage_latency.time("receive"):
+                    messages = sqs_client.poll_messages(max_messages=slots, wait_time=config.POLL_WAIT_TIME, queue_url=queue_url)
+                # Reset backoff delay after successful API call
+                backoff_delay = 1
+            except Exception as e:
+                self.pipeline.release(slots)
+                logger.log(f"Error polling SQS, backing off for {backoff_delay} seconds: {e}", level="ERROR")
+                health_checker.record_error()
+                self.stop_event.wait(backoff_delay)
+                # Double the backoff delay for next attempt, up to maximum
+                backoff_delay = min(backoff_delay * 2, max_backoff)
+                continue
+
+            self.pipeline.release(slots - len(messages))
+            if self.adaptive:
+                # A full receive means more is waiting; otherwise hold no more than was used
+                wanted = sqs_client.MAX_BATCH_SIZE if len(messages) == slots else max(1, len(messages))
+            if messages and self.on_receive:
+                self.on_receive(messages)
+            # An empty long poll has already waited, so poll again right away.
+            # Messages already received are processed even if a stop was requested meanwhile.
+            for msg in messages:
+                # Successful messages are deleted in batches by the acknowledger
+                self.pipeline.submit(msg, reserved=True)
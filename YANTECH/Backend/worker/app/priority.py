@@ -0,0 +1,47 @@
+"""Priority tiers for worker service.
+
+Each tier has its own SQS queue: ``high`` for latency-sensitive traffic such
+as password resets, ``normal`` (``SQS_QUEUE_URL``) and ``bulk`` for
+campaigns. The requestor picks the tier; the worker polls every configured
+queue and shares its pipeline between them by ``PRIORITY_WEIGHTS``.
+"""
+from typing import Dict, List, Optional, Tuple
+from . import config
+
+HIGH = "high"
+NORMAL = "normal"
+BULK = "bulk"
+# Highest first
+TIERS = (HIGH, NORMAL, BULK)
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    weights = {tier: 1.0 for tier in TIERS}
+    for item in value.split(","):
+        if "=" in item:
+            tier, weight = item.split("=", 1)
+            tier = tier.strip().lower()
+            if tier not in TIERS:
+                raise ValueError(f"Unknown priority tier in PRIORITY_WEIGHTS: {tier}")
+            if float(weight) <= 0:
+                raise ValueError(f"Priority weight for {tier} must be positive")
+            weights[tier] = float(weight)
+    return weights
+
+
+def queues() -> List[Tuple[str, str]]:
+    """Return ``(tier, queue URL)`` for every configured tier, highest first."""
+    urls = {
+        HIGH: config.SQS_HIGH_PRIORITY_QUEUE_URL,
+        NORMAL: config.SQS_QUEUE_URL,
+        BULK: config.SQS_BULK_QUEUE_URL,
+    }
+    return [(tier, urls[tier]) for tier in TIERS if urls[tier]]
+
+
+def queue_url_for(tier: Optional[str]) -> str:
+    """Return the queue for ``tier``; unknown or unconfigured tiers use ``SQS_QUEUE_URL``."""
+    return dict(queues()).get(str(tier or NORMAL).lower(), config.SQS_QUEUE_URL)
+
+
+weights = parse_weights(config.PRIORITY_WEIGHTS)
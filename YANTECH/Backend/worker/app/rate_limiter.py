@@ -0,0 +1,101 @@
+"""Token-bucket send-rate scheduler for worker service."""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from . import config
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate`` tokens per second up to ``capacity``.
+
+    Requests larger than the capacity are allowed once the bucket is full and
+    leave it in debt, so a big send is paced rather than rejected forever.
+    Not thread-safe on its own; ``SendScheduler`` serializes access.
+    """
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, tokens: float, now: float) -> float:
+        """Seconds until ``tokens`` can be taken (0 if available now)."""
+        self._refill(now)
+        needed = min(tokens, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def consume(self, tokens: float) -> None:
+        self.tokens -= tokens
+
+
+class SendScheduler:
+    """Paces sends per channel with a global rate and a fair share per application.
+
+    Each channel (EMAIL, SMS, PUSH) has a global bucket sized to the account
+    quota. Every application that sent on the channel within ``active_window``
+    seconds gets an equal share of that rate, so a burst from one application
+    cannot starve the others. Callers that are over their rate are delayed
+    locally instead of being throttled by SES/SNS.
+    """
+    def __init__(self, channel_rates: Dict[str, float], active_window: float = 10.0) -> None:
+        self.channel_rates = {channel: rate for channel, rate in channel_rates.items() if rate > 0}
+        self.active_window = active_window
+        self._channels = {channel: TokenBucket(rate) for channel, rate in self.channel_rates.items()}
+        self._apps: Dict[Tuple[str, str], TokenBucket] = {}
+        self._last_seen: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def _app_bucket(self, channel: str, app_id: str, now: float) -> TokenBucket:
+        key = (channel, app_id)
+        self._last_seen[key] = now
+        # Forget applications that have gone quiet so the share goes back to active ones
+        for other, seen in list(self._last_seen.items()):
+            if now - seen > self.active_window:
+                del self._last_seen[other]
+                self._apps.pop(other, None)
+        active = sum(1 for ch, _ in self._last_seen if ch == channel)
+        share = self.channel_rates[channel] / max(active, 1)
+        bucket = self._apps.get(key)
+        if bucket is None:
+            bucket = self._apps[key] = TokenBucket(share)
+        else:
+            bucket._refill(now)
+            bucket.rate = share
+            bucket.capacity = max(share, 1.0)
+        return bucket
+
+    def acquire(self, channel: str, app_id: str, tokens: float = 1) -> float:
+        """Block until ``tokens`` sends are allowed. Returns the seconds spent waiting."""
+        if channel not in self._channels:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                global_bucket = self._channels[channel]
+                app_bucket = self._app_bucket(channel, app_id, now)
+                delay = max(global_bucket.wait_time(tokens, now), app_bucket.wait_time(tokens, now))
+                if delay <= 0:
+                    global_bucket.consume(tokens)
+                    app_bucket.consume(tokens)
+                    return waited
+            # Sleep in short steps so a freed-up share is picked up quickly
+            step = min(delay, 0.5)
+            time.sleep(step)
+            waited += step
+
+
+send_scheduler = SendScheduler(
+    {
+        "EMAIL": config.SES_MAX_SEND_RATE,
+        "SMS": config.SNS_SMS_MAX_SEND_RATE,
+        "PUSH": config.SNS_PUSH_MAX_SEND_RATE,
+    },
+    active_window=config.SEND_RATE_ACTIVE_WINDOW,
+)
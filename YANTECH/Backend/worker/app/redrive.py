@@ -0,0 +1,306 @@
+"""Dead-letter queue inspection and redrive for worker service.
+
+Usage::
+
+    python -m app.redrive --dry-run
+    python -m app.redrive --reason Throttling --application my-app --rate 200
+
+Several receivers read ``SQS_DLQ_URL`` in parallel and group the messages by
+failure reason (the ``FailureReason`` message attribute, ``unknown`` when the
+message was moved by the queue's redrive policy), application and OutputType.
+Messages matching the filters are sent back to the queue of their priority
+tier (or ``--target-url``) with SendMessageBatch, no faster than ``--rate`` per second, and then deleted from
+the DLQ. Everything else stays hidden until the run ends and is then made
+visible again, so a run never sees the same message twice. ``--dry-run`` only
+prints the summary.
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from . import config, priority, sqs_client, logger
+from .rate_limiter import TokenBucket
+
+# Message attribute carrying why a message was dead-lettered
+FAILURE_REASON_ATTRIBUTE = "FailureReason"
+# Set by the worker next to the reason; also belongs to the previous attempt
+FAILURE_DETAIL_ATTRIBUTE = "FailureDetail"
+UNKNOWN_REASON = "unknown"
+# Consecutive empty receives after which a receiver decides the DLQ is drained
+EMPTY_RECEIVES_TO_STOP = 3
+# Attempts to delete redriven messages from the DLQ before reporting them
+DELETE_ATTEMPTS = 3
+
+
+def failure_reason(msg: Dict[str, Any]) -> str:
+    attribute = (msg.get("MessageAttributes") or {}).get(FAILURE_REASON_ATTRIBUTE) or {}
+    return attribute.get("StringValue") or UNKNOWN_REASON
+
+
+def _body(msg: Dict[str, Any]) -> Dict[str, Any]:
+    # Envelopes carry the same top-level fields, so they need not be resolved
+    try:
+        body = json.loads(msg["Body"])
+    except (ValueError, TypeError):
+        body = {}
+    return body if isinstance(body, dict) else {}
+
+
+def describe(msg: Dict[str, Any]) -> Tuple[str, str, str]:
+    """Return ``(reason, application, output type)`` for a dead-lettered message."""
+    body = _body(msg)
+    return failure_reason(msg), str(body.get("Application", "unknown")), str(body.get("OutputType", "unknown"))
+
+
+class DLQRedrive:
+    """Reads the DLQ with concurrent receivers and replays selected messages."""
+    def __init__(
+        self,
+        dlq_url: str,
+        target_url: Optional[str] = None,
+        receivers: int = 4,
+        rate: float = 100,
+        visibility_timeout: int = 900,
+        max_messages: int = 0,
+        reasons: Optional[List[str]] = None,
+        applications: Optional[List[str]] = None,
+        output_types: Optional[List[str]] = None,
+        dry_run: bool = False,
+    ) -> None:
+        if not dlq_url:
+            raise ValueError("dlq_url must be a non-empty string")
+        if receivers < 1:
+            raise ValueError("receivers must be at least 1")
+        self.dlq_url = dlq_url
+        self.target_url = target_url
+        self.receivers = receivers
+        self.visibility_timeout = visibility_timeout
+        self.max_messages = max_messages
+        self.reasons = set(reasons or [])
+        self.applications = set(applications or [])
+        self.output_types = set(output_types or [])
+        self.dry_run = dry_run
+        self._bucket = TokenBucket(rate) if rate > 0 else None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._seen: set = set()
+        self._held: List[str] = []  # Receipt handles to make visible again at the end
+        self._undeleted: List[str] = []  # Redriven but still in the DLQ: retried before the run ends
+        self.groups: Counter = Counter()
+        self.received = 0
+        self.claimed = 0  # Budget held by receivers: received plus outstanding receive calls
+        self.matched = 0
+        self.redriven = 0
+        self.failed = 0
+        self.not_deleted = 0
+
+    def matches(self, reason: str, application: str, output_type: str) -> bool:
+        return (
+            (not self.reasons or reason in self.reasons)
+            and (not self.applications or application in self.applications)
+            and (not self.output_types or output_type in self.output_types)
+        )
+
+    def _acquire(self, tokens: int) -> None:
+        if self._bucket is None:
+            return
+        while True:
+            with self._lock:
+                wait = self._bucket.wait_time(tokens, time.monotonic())
+                if wait <= 0:
+                    self._bucket.consume(tokens)
+                    return
+            time.sleep(wait)
+
+    def _claim_budget(self, count: int) -> int:
+        """Reserve up to ``count`` messages of the ``max_messages`` budget."""
+        with self._lock:
+            if not self.max_messages:
+                return count
+            claimed = max(0, min(count, self.max_messages - self.claimed))
+            self.claimed += claimed
+            return claimed
+
+    def _release_budget(self, count: int) -> None:
+        """Give back the part of a claim that did not turn into new messages."""
+        if count > 0 and self.max_messages:
+            with self._lock:
+                self.claimed -= count
+
+    def _budget_spent(self) -> bool:
+        with self._lock:
+            return bool(self.max_messages) and self.received >= self.max_messages
+
+    def _receive_loop(self) -> None:
+        empty = 0
+        while not self._stop.is_set() and empty < EMPTY_RECEIVES_TO_STOP:
+            wanted = self._claim_budget(sqs_client.MAX_BATCH_SIZE)
+            if not wanted:
+                if self._budget_spent():
+                    self._stop.set()
+                    return
+                # Other receivers hold the rest of the budget; wait for what they give back
+                self._stop.wait(0.1)
+                continue
+            counted = 0
+            try:
+                response = sqs_client.get_sqs_client().receive_message(
+                    QueueUrl=self.dlq_url,
+                    MaxNumberOfMessages=wanted,
+                    WaitTimeSeconds=1,
+                    VisibilityTimeout=self.visibility_timeout,
+                    MessageAttributeNames=["All"],
+                )
+                messages = response.get("Messages", [])
+                empty = 0 if messages else empty + 1
+                if messages:
+                    counted = self._handle(messages)
+            finally:
+                self._release_budget(wanted - counted)
+
+    def _handle(self, messages: List[Dict[str, Any]]) -> int:
+        """Count and sort received messages. Returns how many were new to this run."""
+        selected: List[Dict[str, Any]] = []
+        counted = 0
+        with self._lock:
+            for msg in messages:
+                if msg["MessageId"] in self._seen:
+                    # Visibility ran out mid-run; it is already counted
+                    self._held.append(msg["ReceiptHandle"])
+                    continue
+                self._seen.add(msg["MessageId"])
+                self.received += 1
+                counted += 1
+                reason, application, output_type = describe(msg)
+                self.groups[(reason, application, output_type)] += 1
+                if self.matches(reason, application, output_type):
+                    self.matched += 1
+                    if not self.dry_run:
+                        selected.append(msg)
+                        continue
+                self._held.append(msg["ReceiptHandle"])
+        if selected:
+            self._redrive(selected)
+        return counted
+
+    def _redrive(self, messages: List[Dict[str, Any]]) -> None:
+        by_queue: Dict[str, List[Dict[str, Any]]] = {}
+        for msg in messages:
+            queue_url = self.target_url or priority.queue_url_for(_body(msg).get("Priority"))
+            by_queue.setdefault(queue_url, []).append(msg)
+        for queue_url, batch in by_queue.items():
+            self._send(batch, queue_url)
+
+    def _send(self, messages: List[Dict[str, Any]], queue_url: str) -> None:
+        self._acquire(len(messages))
+        entries = []
+        for msg in messages:
+            entry: Dict[str, Any] = {"MessageBody": msg["Body"]}
+            # The failure reason belongs to the previous attempt
+            attributes = {
+                name: value for name, value in (msg.get("MessageAttributes") or {}).items()
+                if name not in (FAILURE_REASON_ATTRIBUTE, FAILURE_DETAIL_ATTRIBUTE)
+            }
+            if attributes:
+                entry["MessageAttributes"] = attributes
+            entries.append(entry)
+        failed = set(sqs_client.send_message_batch(entries, queue_url))
+        sent = [msg["ReceiptHandle"] for i, msg in enumerate(messages) if i not in failed]
+        not_deleted = sqs_client.delete_messages(sent, self.dlq_url) if sent else []
+        with self._lock:
+            self.redriven += len(sent)
+            self.failed += len(failed)
+            self._held.extend(msg["ReceiptHandle"] for i, msg in enumerate(messages) if i in failed)
+            # Never made visible again: the copy in the main queue has a new MessageId, so a
+            # second redrive of the same message would be delivered twice
+            self._undeleted.extend(not_deleted)
+
+    def _retry_deletes(self) -> None:
+        handles = self._undeleted
+        for attempt in range(1, DELETE_ATTEMPTS):
+            if not handles:
+                break
+            time.sleep(attempt)
+            handles = sqs_client.delete_messages(handles, self.dlq_url)
+        self.not_deleted = len(handles)
+        if handles:
+            logger.log(
+                f"{len(handles)} redriven messages could not be deleted from the DLQ and will be delivered "
+                "twice if redriven again; they reappear once their visibility timeout ends",
+                level="WARNING",
+            )
+
+    def run(self) -> Dict[str, Any]:
+        """Read the DLQ until it is drained (or ``max_messages`` is reached) and return a summary."""
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.receivers, thread_name_prefix="dlq-receiver") as pool:
+            for future in [pool.submit(self._receive_loop) for _ in range(self.receivers)]:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.log(f"DLQ receiver failed: {e}", level="ERROR")
+                    self._stop.set()
+        # Give back everything that was only inspected or could not be sent
+        sqs_client.change_visibility_batch([(handle, 0) for handle in self._held], self.dlq_url)
+        self._retry_deletes()
+        return self.summary(time.monotonic() - started)
+
+    def summary(self, elapsed: float = 0.0) -> Dict[str, Any]:
+        groups = [
+            {"reason": reason, "application": application, "output_type": output_type, "count": count}
+            for (reason, application, output_type), count in self.groups.most_common()
+        ]
+        by_reason: Counter = Counter()
+        for (reason, _, _), count in self.groups.items():
+            by_reason[reason] += count
+        return {
+            "dry_run": self.dry_run,
+            "received": self.received,
+            "matched": self.matched,
+            "redriven": self.redriven,
+            "failed": self.failed,
+            # Sent back but still in the DLQ: redriving them again would duplicate them
+            "not_deleted": self.not_deleted,
+            "elapsed_seconds": round(elapsed, 3),
+            "by_reason": dict(by_reason.most_common()),
+            "groups": groups,
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect the dead-letter queue and send messages back to the main queue.")
+    parser.add_argument("--dry-run", action="store_true", help="Only summarize; do not send or delete anything")
+    parser.add_argument("--reason", action="append", help="Only redrive messages with this failure reason (repeatable)")
+    parser.add_argument("--application", action="append", help="Only redrive this application (repeatable)")
+    parser.add_argument("--output-type", action="append", help="Only redrive this OutputType (repeatable)")
+    parser.add_argument("--receivers", type=int, default=config.REDRIVE_RECEIVERS, help="Concurrent DLQ receivers")
+    parser.add_argument("--rate", type=float, default=config.REDRIVE_MAX_RATE, help="Max messages per second sent back (0 = unlimited)")
+    parser.add_argument("--max-messages", type=int, default=0, help="Stop after reading this many messages (0 = all)")
+    parser.add_argument(
+        "--visibility-timeout", type=int, default=config.REDRIVE_VISIBILITY_TIMEOUT,
+        help="Seconds messages stay hidden during the run; must exceed the run time",
+    )
+    parser.add_argument("--dlq-url", default=config.SQS_DLQ_URL)
+    parser.add_argument("--target-url", help="Send everything to this queue instead of each message's priority tier")
+    args = parser.parse_args(argv)
+
+    redrive = DLQRedrive(
+        dlq_url=args.dlq_url,
+        target_url=args.target_url,
+        receivers=args.receivers,
+        rate=args.rate,
+        visibility_timeout=args.visibility_timeout,
+        max_messages=args.max_messages,
+        reasons=args.reason,
+        applications=args.application,
+        output_types=args.output_type,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(redrive.run(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Deferred and recurring notification dispatch for worker service.
+
+Notifications due more than 15 minutes ahead (the SQS ``DelaySeconds`` limit)
+are kept in the schedule table, partitioned into 15-minute ``DueBucket``s and
+sorted by ``ScheduleKey`` (``<due time>#<series id>``). The dispatcher loads
+the buckets that are about to become due into a heap, claims each entry with a
+conditional update and hands it to SQS with the remaining delay, so the exact
+send time is left to SQS. Recurring notifications only ever have their next
+occurrence stored: it is written after the current one is delivered.
+"""
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from . import aws_clients, config, envelope, priority, sqs_client, logger
+from .recurrence import is_recurring, next_occurrence, parse_time
+
+# SQS cannot delay a message for longer than 15 minutes
+MAX_DELAY_SECONDS = 900
+BUCKET_MINUTES = 15
+# Dispatched entries are kept this long so a duplicate "schedule next" is rejected
+DISPATCHED_RETENTION = timedelta(days=7)
+
+STATUS_PENDING = "PENDING"
+STATUS_CLAIMED = "CLAIMED"
+STATUS_DISPATCHED = "DISPATCHED"
+
+
+def _schedule_table() -> Any:
+    return aws_clients.resource("dynamodb", config.AWS_REGION).Table(config.SCHEDULE_TABLE)
+
+
+def format_due(due: datetime) -> str:
+    return due.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_due(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+
+def due_bucket(due: datetime) -> str:
+    """Return the 15-minute partition a due time belongs to."""
+    due = due.astimezone(timezone.utc)
+    return due.strftime("%Y-%m-%dT%H:") + f"{due.minute // BUCKET_MINUTES * BUCKET_MINUTES:02d}"
+
+
+def save_schedule(request: Dict[str, Any], due: datetime, series_id: str) -> bool:
+    """Store one occurrence in the schedule table. Returns False if it already exists."""
+    due_at = format_due(due)
+    body = dict(request, ScheduledFor=due_at, ScheduleSeriesId=series_id)
+    try:
+        _schedule_table().put_item(
+            Item={
+                "DueBucket": due_bucket(due),
+                "ScheduleKey": f"{due_at}#{series_id}",
+                "ScheduleID": series_id,
+                "Application": str(request.get("Application", "")),
+                "DueAt": due_at,
+                "Status": STATUS_PENDING,
+                "Priority": str(request.get("Priority") or "normal"),
+                "Request": envelope.encode(body),  # Sent to SQS as-is when due
+            },
+            ConditionExpression="attribute_not_exists(ScheduleKey)",
+        )
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise RuntimeError(f"Failed to save schedule: {str(e)}")
+
+
+def schedule_next(body: Dict[str, Any]) -> Optional[datetime]:
+    """Store the next occurrence of a delivered recurring notification, if any.
+
+    Safe to call more than once for the same delivery: the occurrence key is
+    derived from the series id and due time, so duplicates are rejected.
+    """
+    interval = body.get("Interval")
+    series_id = body.get("ScheduleSeriesId")
+    if not is_recurring(interval) or not series_id or not body.get("ScheduledFor"):
+        return None
+
+    current = parse_due(body["ScheduledFor"])
+    # Never schedule in the past, e.g. when a delivery was delayed past the next slot
+    after = max(current, datetime.now(timezone.utc))
+    upcoming = next_occurrence(interval, parse_time(body.get("Time")), after)
+    if upcoming is None:
+        logger.log(f"Recurring schedule {series_id} has no further occurrences")
+        return None
+    request = {k: v for k, v in body.items() if k not in ("ScheduledFor", "ScheduleSeriesId")}
+    if save_schedule(request, upcoming, series_id):
+        logger.log(f"Scheduled next occurrence of {series_id} for {format_due(upcoming)}")
+    return upcoming
+
+
+class ScheduleDispatcher:
+    """Moves schedule-table entries onto the SQS queue as they become due.
+
+    Entries due within ``poll_interval + dispatch_lead`` seconds are loaded
+    into a heap ordered by due time. Each one is released ``dispatch_lead``
+    seconds before it is due, with ``DelaySeconds`` covering the rest. On
+    start-up, buckets up to ``catchup`` seconds in the past are also read so
+    entries missed during an outage are still sent.
+    """
+    def __init__(
+        self,
+        poll_interval: float = 60,
+        dispatch_lead: float = 300,
+        catchup: float = 86400,
+        claim_timeout: float = 300,
+    ) -> None:
+        self.poll_interval = poll_interval
+        self.dispatch_lead = min(dispatch_lead, MAX_DELAY_SECONDS)
+        self.catchup = catchup
+        self.claim_timeout = claim_timeout
+        self.dispatched = 0
+        self._heap: List[Tuple[float, str, str]] = []
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    @property
+    def table(self) -> Any:
+        return _schedule_table()
+
+    def run(self, stop_event: threading.Event) -> None:
+        logger.log(f"Schedule dispatcher started on {config.SCHEDULE_TABLE}")
+        loaded_until = datetime.now(timezone.utc) - timedelta(seconds=self.catchup)
+        next_load = 0.0
+        while not stop_event.is_set():
+            try:
+                if time.monotonic() >= next_load:
+                    loaded_until = self._load(loaded_until)
+                    next_load = time.monotonic() + self.poll_interval
+                self._dispatch_due()
+            except Exception as e:
+                logger.log(f"Schedule dispatcher error: {e}", level="ERROR")
+            wait = next_load - time.monotonic()
+            if self._heap:
+                wait = min(wait, self._heap[0][0] - self.dispatch_lead - time.time())
+            stop_event.wait(max(wait, 0.1))
+
+    def _load(self, since: datetime) -> datetime:
+        """Queue every pending entry due between ``since``'s bucket and the end of the load window."""
+        now = datetime.now(timezone.utc)
+        until = now + timedelta(seconds=self.poll_interval + self.dispatch_lead)
+        # Re-read the current bucket too: entries can be added to it at any time
+        start = min(since, now - timedelta(minutes=BUCKET_MINUTES))
+        buckets = []
+        cursor = start
+        while cursor <= until:
+            buckets.append(due_bucket(cursor))
+            cursor += timedelta(minutes=BUCKET_MINUTES)
+        if due_bucket(until) not in buckets:
+            buckets.append(due_bucket(until))
+
+        last_key = f"{format_due(until)}~"
+        for bucket in buckets:
+            for item in self._query(bucket, last_key):
+                key = (item["DueBucket"], item["ScheduleKey"])
+                if key in self._entries or not self._claimable(item, now):
+                    continue
+                self._entries[key] = item
+                heapq.heappush(self._heap, (parse_due(item["DueAt"]).timestamp(), key[0], key[1]))
+        return until
+
+    def _query(self, bucket: str, last_key: str) -> List[Dict[str, Any]]:
+        kwargs = {"KeyConditionExpression": Key("DueBucket").eq(bucket) & Key("ScheduleKey").lte(last_key)}
+        items: List[Dict[str, Any]] = []
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return items
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def _claimable(self, item: Dict[str, Any], now: datetime) -> bool:
+        if item.get("Status") == STATUS_PENDING:
+            return True
+        # A claim older than claim_timeout belongs to a dispatcher that died before sending
+        return item.get("Status") == STATUS_CLAIMED and item.get("ClaimedAt", "") < format_due(
+            now - timedelta(seconds=self.claim_timeout)
+        )
+
+    def _claim(self, key: Tuple[str, str]) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            self.table.update_item(
+                Key={"DueBucket": key[0], "ScheduleKey": key[1]},
+                UpdateExpression="SET #s = :claimed, ClaimedAt = :now",
+                ConditionExpression="#s = :pending OR (#s = :claimed AND ClaimedAt < :stale)",
+                ExpressionAttributeNames={"#s": "Status"},
+                ExpressionAttributeValues={
+                    ":claimed": STATUS_CLAIMED,
+                    ":pending": STATUS_PENDING,
+                    ":now": format_due(now),
+                    ":stale": format_due(now - timedelta(seconds=self.claim_timeout)),
+                },
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False  # Claimed by another worker
+            raise
+
+    def _set_status(self, key: Tuple[str, str], status: str) -> None:
+        values: Dict[str, Any] = {":s": status}
+        update = "SET #s = :s"
+        if status == STATUS_DISPATCHED:
+            update += ", ExpiresAt = :exp"
+            values[":exp"] = int((datetime.now(timezone.utc) + DISPATCHED_RETENTION).timestamp())
+        self.table.update_item(
+            Key={"DueBucket": key[0], "ScheduleKey": key[1]},
+            UpdateExpression=update,
+            ExpressionAttributeNames={"#s": "Status"},
+            ExpressionAttributeValues=values,
+        )
+
+    def _dispatch_due(self) -> None:
+        release_before = time.time() + self.dispatch_lead
+        claimed: List[Tuple[float, Tuple[str, str], Dict[str, Any]]] = []
+        while self._heap and self._heap[0][0] <= release_before:
+            due_ts, bucket, sort_key = heapq.heappop(self._heap)
+            key = (bucket, sort_key)
+            item = self._entries.pop(key, None)
+            if item is not None and self._claim(key):
+                claimed.append((due_ts, key, item))
+        if not claimed:
+            return
+
+        # Entries keep the priority tier they were requested with
+        by_queue: Dict[str, List[int]] = {}
+        for index, (_, _, item) in enumerate(claimed):
+            by_queue.setdefault(priority.queue_url_for(item.get("Priority")), []).append(index)
+        failed = set()
+        for queue_url, indexes in by_queue.items():
+            messages = [
+                {
+                    "MessageBody": claimed[i][2]["Request"],
+                    "DelaySeconds": int(max(0, min(MAX_DELAY_SECONDS, claimed[i][0] - time.time()))),
+                }
+                for i in indexes
+            ]
+            failed.update(indexes[i] for i in sqs_client.send_message_batch(messages, queue_url))
+        for index, (due_ts, key, item) in enumerate(claimed):
+            if index in failed:
+                # Put it back so the next pass retries it
+                self._set_status(key, STATUS_PENDING)
+                self._entries[key] = item
+                heapq.heappush(self._heap, (due_ts, key[0], key[1]))
+            else:
+                self._set_status(key, STATUS_DISPATCHED)
+        self.dispatched += len(claimed) - len(failed)
+        logger.log(f"Dispatched {len(claimed) - len(failed)} scheduled notifications ({len(failed)} failed)")
+
+
+dispatcher = ScheduleDispatcher(
+    poll_interval=config.SCHEDULE_POLL_INTERVAL,
+    dispatch_lead=config.SCHEDULE_DISPATCH_LEAD,
+    catchup=config.SCHEDULE_CATCHUP,
+)
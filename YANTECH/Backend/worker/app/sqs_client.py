@@ -1,25 +1,207 @@
-import boto3
-import json
-from . import config , logger
-
-sqs = boto3.client(
-    "sqs",
-    region_name=config.AWS_REGION
-)
-
-def poll_messages(max_messages=1):
-    logger.log(f"Polling messages from QueueUrl: {config.SQS_QUEUE_URL}")
-    response = sqs.receive_message(
-        QueueUrl=config.SQS_QUEUE_URL,
-        MaxNumberOfMessages=max_messages,
-        WaitTimeSeconds=10
+"""SQS client operations for worker service."""
+import threading
+import time
+from typing import List, Dict, Any, Tuple, Optional
+from . import aws_clients, config, logger
+from .metrics import stage_latency
+
+# SQS caps ReceiveMessage, DeleteMessageBatch and ChangeMessageVisibilityBatch at 10 entries
+MAX_BATCH_SIZE = 10
+
+def get_sqs_client() -> Any:
+    """Get the shared SQS client."""
+    return aws_clients.client("sqs", config.AWS_REGION)
+
+
+def _chunks(items: List[Any], size: int = MAX_BATCH_SIZE) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def poll_messages(max_messages: int = MAX_BATCH_SIZE, wait_time: int = 10, queue_url: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Receive up to ``max_messages`` (at most 10) messages with long polling.
+
+    Each message gets a ``QueueUrl`` key: its receipt handle is only valid
+    for the queue it came from.
+    """
+    queue_url = queue_url or config.SQS_QUEUE_URL
+    logger.log(f"Polling messages from QueueUrl: {queue_url}", level="DEBUG", event="poll")
+    response = get_sqs_client().receive_message(
+        QueueUrl=queue_url,
+        MaxNumberOfMessages=max(1, min(max_messages, MAX_BATCH_SIZE)),
+        WaitTimeSeconds=wait_time,
+        # The receive count drives retry backoff; attributes are kept if the message is dead-lettered
+        AttributeNames=["ApproximateReceiveCount"],
+        MessageAttributeNames=["All"],
     )
-    return response.get("Messages", [])
+    messages = response.get("Messages", [])
+    for msg in messages:
+        msg["QueueUrl"] = queue_url
+    return messages
 
-def delete_message(receipt_handle):
-    logger.log(f"Deleting message with ReceiptHandle: {receipt_handle}")
-    sqs.delete_message(
+
+def get_queue_depth(queue_url: Optional[str] = None) -> int:
+    """Return the approximate number of visible messages in the queue."""
+    response = get_sqs_client().get_queue_attributes(
+        QueueUrl=queue_url or config.SQS_QUEUE_URL,
+        AttributeNames=["ApproximateNumberOfMessages"]
+    )
+    return int(response.get("Attributes", {}).get("ApproximateNumberOfMessages", 0))
+
+
+def delete_message(receipt_handle: str) -> None:
+    """Delete a single message from SQS queue."""
+    logger.log("Deleting message", level="DEBUG", event="delete")
+    get_sqs_client().delete_message(
         QueueUrl=config.SQS_QUEUE_URL,
         ReceiptHandle=receipt_handle
     )
 
+
+def _run_batch(
+    operation: Any,
+    entries: List[Dict[str, Any]],
+    action: str,
+    queue_url: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Send one batch call and retry entries that failed on the SQS side once.
+
+    Returns the entries that still failed. Sender faults (e.g. an expired
+    receipt handle) are not retried because they can never succeed.
+    """
+    failed: List[Dict[str, Any]] = []
+    pending = entries
+    for attempt in range(2):
+        response = operation(QueueUrl=queue_url or config.SQS_QUEUE_URL, Entries=pending)
+        by_id = {entry["Id"]: entry for entry in pending}
+        retry = []
+        for failure in response.get("Failed", []):
+            entry = by_id.get(failure["Id"])
+            if entry is None:
+                continue
+            if failure.get("SenderFault") or attempt == 1:
+                logger.log(f"Failed to {action} message {failure['Id']}: {failure.get('Code')} {failure.get('Message', '')}", level="WARNING")
+                failed.append(entry)
+            else:
+                retry.append(entry)
+        if not retry:
+            break
+        pending = retry
+    return failed
+
+
+def delete_messages(receipt_handles: List[str], queue_url: Optional[str] = None) -> List[str]:
+    """Delete messages with DeleteMessageBatch. Returns receipt handles that could not be deleted."""
+    failed: List[str] = []
+    for chunk in _chunks(receipt_handles):
+        entries = [{"Id": str(i), "ReceiptHandle": handle} for i, handle in enumerate(chunk)]
+        try:
+            failed.extend(e["ReceiptHandle"] for e in _run_batch(get_sqs_client().delete_message_batch, entries, "delete", queue_url))
+        except Exception as e:
+            logger.log(f"DeleteMessageBatch failed: {e}", level="ERROR")
+            failed.extend(chunk)
+    return failed
+
+
+def change_visibility_batch(changes: List[Tuple[str, int]], queue_url: Optional[str] = None) -> List[str]:
+    """Change visibility timeouts with ChangeMessageVisibilityBatch.
+
+    ``changes`` is a list of ``(receipt_handle, visibility_timeout_seconds)``.
+    Returns receipt handles whose visibility could not be changed.
+    """
+    failed: List[str] = []
+    for chunk in _chunks(changes):
+        entries = [
+            {"Id": str(i), "ReceiptHandle": handle, "VisibilityTimeout": int(timeout)}
+            for i, (handle, timeout) in enumerate(chunk)
+        ]
+        try:
+            failed.extend(e["ReceiptHandle"] for e in _run_batch(get_sqs_client().change_message_visibility_batch, entries, "change visibility of", queue_url))
+        except Exception as e:
+            logger.log(f"ChangeMessageVisibilityBatch failed: {e}", level="ERROR")
+            failed.extend(handle for handle, _ in chunk)
+    return failed
+
+
+def send_message_batch(messages: List[Dict[str, Any]], queue_url: Optional[str] = None) -> List[int]:
+    """Send messages with SendMessageBatch. Returns the indexes of messages that could not be sent.
+
+    Each message is a dict of SendMessageBatch entry fields without ``Id``
+    (``MessageBody`` plus optional ``DelaySeconds``/``MessageAttributes``).
+    """
+    failed: List[int] = []
+    for offset in range(0, len(messages), MAX_BATCH_SIZE):
+        chunk = messages[offset:offset + MAX_BATCH_SIZE]
+        entries = [dict(message, Id=str(offset + i)) for i, message in enumerate(chunk)]
+        try:
+            failed.extend(int(e["Id"]) for e in _run_batch(get_sqs_client().send_message_batch, entries, "send", queue_url))
+        except Exception as e:
+            logger.log(f"SendMessageBatch failed: {e}", level="ERROR")
+            failed.extend(range(offset, offset + len(chunk)))
+    return failed
+
+
+class BatchAcknowledger:
+    """Collects processed messages and deletes them with DeleteMessageBatch.
+
+    A batch is flushed as soon as it holds 10 receipt handles, or after
+    ``max_delay`` seconds, whichever comes first.
+    """
+    def __init__(self, max_delay: float = 0.2) -> None:
+        self.max_delay = max_delay
+        self._pending: List[Tuple[str, Optional[str]]] = []  # (receipt handle, queue URL)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sqs-acker", daemon=True)
+        self._thread.start()
+
+    def add(self, receipt_handle: str, queue_url: Optional[str] = None) -> None:
+        with self._cond:
+            self._pending.append((receipt_handle, queue_url))
+            self._cond.notify_all()
+
+    def flush(self) -> None:
+        """Delete everything that is currently buffered."""
+        with self._cond:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._delete(batch)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop the background thread after deleting all buffered messages."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._pending and not self._closed:
+                    self._cond.wait()
+                # Give the batch a short window to fill up
+                deadline = time.monotonic() + self.max_delay
+                while len(self._pending) < MAX_BATCH_SIZE and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:MAX_BATCH_SIZE], self._pending[MAX_BATCH_SIZE:]
+                closed = self._closed
+            if batch:
+                self._delete(batch)
+            if closed:
+                return
+
+    def _delete(self, batch: List[Tuple[str, Optional[str]]]) -> None:
+        by_queue: Dict[Optional[str], List[str]] = {}
+        for handle, queue_url in batch:
+            by_queue.setdefault(queue_url, []).append(handle)
+        failed: List[str] = []
+        with stage_latency.time("delete"):
+            for queue_url, handles in by_queue.items():
+                failed.extend(delete_messages(handles, queue_url))
+        logger.log(
+            f"Deleted {len(batch) - len(failed)} messages from SQS ({len(failed)} failed)",
+            level="WARNING" if failed else "DEBUG", event="delete_batch",
+        )
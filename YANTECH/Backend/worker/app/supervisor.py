@@ -0,0 +1,139 @@
+"""Multi-process supervisor for worker service."""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Any, Dict
+from . import config, logger
+
+# Children are spawned rather than forked so none of them inherit boto3 clients or threads
+_context = multiprocessing.get_context("spawn")
+
+# Minimum seconds between restarts of the same slot, to avoid a tight crash loop
+RESTART_BACKOFF = 5
+
+# cgroup CPU limits: v2 "<quota> <period>" ("max" when unlimited), v1 quota and period files
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CPU_QUOTA = ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+
+# Account-level send quotas, shared by all worker processes
+SEND_RATE_SETTINGS = ("SES_MAX_SEND_RATE", "SNS_SMS_MAX_SEND_RATE", "SNS_PUSH_MAX_SEND_RATE")
+
+
+def _cpu_quota() -> float:
+    """CPUs allowed by the container's cgroup quota, or 0 if there is none."""
+    try:
+        with open(CGROUP_V2_CPU_MAX) as f:
+            quota, period = f.read().split()[:2]
+        return 0 if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(CGROUP_V1_CPU_QUOTA[0]) as f_quota, open(CGROUP_V1_CPU_QUOTA[1]) as f_period:
+            quota, period = int(f_quota.read()), int(f_period.read())
+        return 0 if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return 0
+
+
+def available_cpus() -> int:
+    """CPUs this container may use: the scheduler affinity, capped by the cgroup quota.
+
+    ``os.cpu_count()`` reports the host, so a 0.5 vCPU task on a large
+    instance would otherwise start one process per host CPU.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cpu_quota()
+    if quota:
+        cpus = min(cpus, int(quota))
+    return max(1, cpus)
+
+
+def split_send_rates(processes: int) -> Dict[str, str]:
+    """Return each process's share of the configured send rates, as environment values."""
+    return {name: repr(getattr(config, name) / processes) for name in SEND_RATE_SETTINGS}
+
+
+def _watch_parent() -> None:
+    """Drain this worker if the supervisor dies without stopping it."""
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        parent.join()
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+def _worker_process(slot: int) -> None:
+    from .main import main
+    threading.Thread(target=_watch_parent, name="parent-watch", daemon=True).start()
+    main(slot)
+
+
+class Supervisor:
+    """Runs N worker processes, restarts crashed ones and drains them on SIGTERM."""
+    def __init__(self, processes: int) -> None:
+        if processes < 1:
+            raise ValueError("processes must be at least 1")
+        self.processes = processes
+        self.stopping = False
+        self._workers: Dict[int, Any] = {}
+        self._started_at: Dict[int, float] = {}
+
+    def _start(self, slot: int) -> None:
+        process = _context.Process(target=_worker_process, args=(slot,), name=f"worker-{slot}")
+        process.start()
+        self._workers[slot] = process
+        self._started_at[slot] = time.monotonic()
+        logger.log(f"Started worker-{slot} (pid {process.pid})")
+
+    def _handle_signal(self, signum: int, frame: Any) -> None:
+        if not self.stopping:
+            logger.log(f"Supervisor received signal {signum}, draining workers...")
+        self.stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        # Spawned children read their settings from the environment they inherit
+        shares = split_send_rates(self.processes)
+        os.environ.update(shares)
+        logger.log(
+            f"Supervisor starting {self.processes} worker processes",
+            **{name.lower(): float(value) for name, value in shares.items()},
+        )
+        for slot in range(self.processes):
+            self._start(slot)
+
+        while not self.stopping:
+            for slot, process in list(self._workers.items()):
+                if process.is_alive():
+                    continue
+                if time.monotonic() - self._started_at[slot] < RESTART_BACKOFF:
+                    continue
+                logger.log(f"worker-{slot} (pid {process.pid}) exited with code {process.exitcode}, restarting", level="WARNING")
+                self._start(slot)
+            time.sleep(0.5)
+
+        self._shutdown()
+
+    def _shutdown(self) -> None:
+        # Ask every worker to stop polling and finish its in-flight messages
+        for process in self._workers.values():
+            if process.is_alive():
+                process.terminate()
+        # A worker may first wait out a long poll, then drain and flush; allow a little for process exit
+        deadline = time.monotonic() + config.STOP_TIMEOUT + 5
+        for slot, process in self._workers.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.log(f"worker-{slot} (pid {process.pid}) did not stop in time, killing it", level="WARNING")
+                process.kill()
+                process.join()
+        logger.log("Supervisor stopped")
+
+
+if __name__ == "__main__":
+    Supervisor(config.WORKER_PROCESSES or available_cpus()).run()
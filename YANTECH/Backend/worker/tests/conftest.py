@@ -0,0 +1,13 @@
+"""Shared test setup: run every test against the in-memory AWS stand-ins.
+
+Settings are read when ``app`` modules are imported, so they are set here,
+before any test module imports them.
+"""
+import os
+
+os.environ["AWS_BACKEND"] = "memory"
+os.environ.setdefault("SQS_QUEUE_URL", "https://sqs.us-east-1.amazonaws.com/000000000000/test-queue")
+os.environ.setdefault("SQS_DLQ_URL", "https://sqs.us-east-1.amazonaws.com/000000000000/test-dlq")
+os.environ.setdefault("IDEMPOTENCY_TABLE", "")
+os.environ.setdefault("METRICS_PORT", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
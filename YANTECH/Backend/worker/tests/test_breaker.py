@@ -0,0 +1,136 @@
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError, ParamValidationError
+
+from app import breaker
+from app.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(breaker, "time", fake)
+    return fake
+
+
+def make_breaker(**kwargs) -> CircuitBreaker:
+    settings = dict(window=30, min_calls=4, error_rate=0.5, slow_call_seconds=5, open_seconds=10, max_open_seconds=40, half_open_probes=2)
+    settings.update(kwargs)
+    return CircuitBreaker("ses", **settings)
+
+
+def client_error(code: str, status: int = 400) -> ClientError:
+    return ClientError({"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, "SendEmail")
+
+
+def trip(cb: CircuitBreaker) -> None:
+    for _ in range(cb.min_calls):
+        assert cb.allow()
+        cb.record(True, 0.1)
+
+
+def test_stays_closed_below_min_calls(clock):
+    cb = make_breaker()
+    for _ in range(3):
+        cb.record(True, 0.1)
+    assert cb.state == CLOSED
+
+
+def test_opens_on_error_rate_and_rejects(clock):
+    cb = make_breaker()
+    trip(cb)
+    assert cb.state == OPEN
+    assert cb.is_open()
+    assert not cb.allow()
+    assert cb.rejected == 1
+    assert cb.retry_after() == pytest.approx(10)
+
+
+def test_opens_on_slow_calls(clock):
+    cb = make_breaker(slow_call_rate=0.5)
+    for _ in range(4):
+        cb.record(False, 6)
+    assert cb.state == OPEN
+
+
+def test_old_failures_leave_the_window(clock):
+    cb = make_breaker()
+    for _ in range(3):
+        cb.record(True, 0.1)
+    clock.now += 31
+    cb.record(True, 0.1)
+    assert cb.state == CLOSED
+
+
+def test_half_open_probes_close_it(clock):
+    cb = make_breaker()
+    trip(cb)
+    clock.now += 10
+    assert cb.state == HALF_OPEN
+    assert cb.allow() and cb.allow()
+    # Only half_open_probes calls go through while probing
+    assert not cb.allow()
+    cb.record(False, 0.1)
+    cb.record(False, 0.1)
+    assert cb.state == CLOSED
+
+
+def test_failed_probe_reopens_for_longer(clock):
+    cb = make_breaker()
+    trip(cb)
+    for open_for in (20, 40, 40):
+        clock.now += cb.retry_after()
+        assert cb.allow()
+        cb.record(True, 0.1)
+        assert cb.state == OPEN
+        assert cb.retry_after() == pytest.approx(open_for)
+
+
+def test_guard_raises_while_open(clock):
+    cb = make_breaker()
+    trip(cb)
+    with pytest.raises(CircuitOpenError) as raised:
+        with cb.guard():
+            pass
+    assert raised.value.dependency == "ses"
+
+
+def test_disabled_breaker_never_opens(clock):
+    cb = make_breaker(enabled=False)
+    trip(cb)
+    assert cb.state == CLOSED and cb.allow()
+
+
+@pytest.mark.parametrize(
+    "exc, expected",
+    [
+        (client_error("Throttling"), True),
+        (client_error("SomethingNew", 503), True),
+        (client_error("MessageRejected"), False),
+        (EndpointConnectionError(endpoint_url="https://email.us-east-1.amazonaws.com"), True),
+        (ParamValidationError(report="bad"), False),
+        (ValueError("bad address"), False),
+    ],
+)
+def test_is_dependency_failure(exc, expected):
+    assert breaker.is_dependency_failure(exc) is expected
+
+
+def test_is_dependency_failure_follows_the_chain():
+    try:
+        try:
+            raise client_error("ServiceUnavailable", 503)
+        except ClientError as e:
+            raise RuntimeError("Failed to send email") from e
+    except RuntimeError as wrapped:
+        assert breaker.is_dependency_failure(wrapped)
@@ -0,0 +1,91 @@
+import base64
+import json
+import os
+
+import pytest
+
+from app import envelope
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    url = f"file://{tmp_path}"
+    monkeypatch.setattr(envelope, "COMPRESS_THRESHOLD", 1024)
+    monkeypatch.setattr(envelope, "MAX_INLINE", 4096)
+    monkeypatch.setattr(envelope, "STORE_URL", url)
+    monkeypatch.setattr(envelope, "payload_cache", envelope._PayloadCache(1024 * 1024))
+    return url
+
+
+def request(message: str) -> dict:
+    return {"Application": "app-1", "OutputType": "EMAIL", "Priority": "bulk", "Recipient": "a@example.com", "Message": message}
+
+
+def test_small_messages_stay_plain_json(store):
+    message = request("hello")
+    body = envelope.encode(message)
+    assert json.loads(body) == message
+    assert envelope.decode(body) == message
+
+
+def test_large_messages_are_compressed(store):
+    message = request("lorem ipsum " * 200)
+    body = envelope.encode(message)
+    wrapped = json.loads(body)
+    assert wrapped[envelope.ENVELOPE_KEY] == envelope.GZIP
+    # Routing fields stay readable without decoding
+    assert (wrapped["Application"], wrapped["OutputType"], wrapped["Priority"]) == ("app-1", "EMAIL", "bulk")
+    assert len(body) < len(json.dumps(message))
+    assert envelope.decode(body) == message
+
+
+def test_incompressible_messages_are_sent_as_they_are(store):
+    # Random base85 text: gzip plus base64 would make it larger
+    message = request(base64.b85encode(os.urandom(1500)).decode("ascii"))
+    body = envelope.encode(message)
+    assert json.loads(body) == message
+
+
+def test_oversized_messages_are_stored_by_reference(store):
+    message = request(os.urandom(4000).hex())
+    body = envelope.encode(message)
+    reference = json.loads(body)
+    assert reference[envelope.ENVELOPE_KEY] == envelope.REFERENCE
+    assert reference["Location"].startswith(store + "/")
+    assert len(body) <= envelope.MAX_INLINE
+    assert envelope.decode(body) == message
+    # The second read is served from the cache
+    assert envelope.decode(body) == message
+    assert envelope.payload_cache.stats()["hits"] == 1
+
+
+def test_stored_payload_is_checked(store):
+    body = json.loads(envelope.encode(request(os.urandom(4000).hex())))
+    body["Sha256"] = "0" * 64
+    with pytest.raises(ValueError, match="checksum"):
+        envelope.decode(json.dumps(body))
+
+
+def test_references_outside_the_store_are_refused(store, tmp_path):
+    body = {envelope.ENVELOPE_KEY: envelope.REFERENCE, "Location": f"{store}/../secret.json.gz"}
+    with pytest.raises(ValueError, match="outside"):
+        envelope.decode(json.dumps(body))
+    body["Location"] = "file:///etc/passwd"
+    with pytest.raises(ValueError, match="outside"):
+        envelope.decode(json.dumps(body))
+
+
+def test_oversized_message_without_a_store_is_an_error(store, monkeypatch):
+    monkeypatch.setattr(envelope, "STORE_URL", "")
+    with pytest.raises(ValueError, match="PAYLOAD_STORE_URL"):
+        envelope.encode(request(os.urandom(4000).hex()))
+
+
+def test_unknown_envelope_is_an_error():
+    with pytest.raises(ValueError, match="Unknown message envelope"):
+        envelope.decode(json.dumps({envelope.ENVELOPE_KEY: "zstd"}))
+
+
+def test_empty_message_is_refused():
+    with pytest.raises(ValueError):
+        envelope.encode({})
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from app import config, failures
+
+
+def client_error(code: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": code}}, "SendEmail")
+
+
+def test_classify_permanent_errors():
+    assert failures.classify(failures.PermanentError("AppConfigNotFound")) == "AppConfigNotFound"
+    with pytest.raises(json.JSONDecodeError) as malformed:
+        json.loads("{")
+    assert failures.classify(malformed.value) == "MalformedBody"
+    assert failures.classify(KeyError("Recipient")) == "MissingField"
+    assert failures.classify(ValueError("Unsupported OutputType")) == "InvalidMessage"
+    assert failures.classify(client_error("MessageRejected")) == "MessageRejected"
+
+
+def test_classify_transient_errors():
+    assert failures.classify(client_error("Throttling")) is None
+    assert failures.classify(RuntimeError("connection reset")) is None
+
+
+def test_classify_finds_client_error_in_chain():
+    # Service calls re-raise as RuntimeError; the AWS error code decides
+    for code, expected in (("InvalidParameter", "InvalidParameter"), ("ServiceUnavailable", None)):
+        try:
+            try:
+                raise client_error(code)
+            except ClientError as e:
+                raise RuntimeError(f"Failed to send: {e}") from e
+        except RuntimeError as wrapped:
+            assert failures.classify(wrapped) == expected
+
+
+def test_receive_count():
+    assert failures.receive_count({}) == 1
+    assert failures.receive_count({"Attributes": {"ApproximateReceiveCount": "4"}}) == 4
+
+
+@pytest.mark.parametrize("receive_count", [1, 2, 3, 6])
+def test_retry_delay_doubles_with_equal_jitter(monkeypatch, receive_count):
+    monkeypatch.setattr(config, "RETRY_BASE_DELAY", 30.0)
+    monkeypatch.setattr(config, "RETRY_MAX_DELAY", 900.0)
+    ceiling = min(900.0, 30.0 * 2 ** (receive_count - 1))
+    for _ in range(50):
+        assert int(ceiling / 2) <= failures.retry_delay(receive_count) <= ceiling
+
+
+def test_retry_delay_is_never_zero(monkeypatch):
+    monkeypatch.setattr(config, "RETRY_BASE_DELAY", 0.2)
+    assert all(failures.retry_delay(1) == 1 for _ in range(50))
+
+
+def test_retry_delay_stays_under_the_sqs_limit(monkeypatch):
+    monkeypatch.setattr(config, "RETRY_BASE_DELAY", 30.0)
+    monkeypatch.setattr(config, "RETRY_MAX_DELAY", 10 ** 6)
+    assert failures.retry_delay(30) <= failures.MAX_VISIBILITY_TIMEOUT
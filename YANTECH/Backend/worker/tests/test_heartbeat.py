@@ -0,0 +1,59 @@
+import threading
+import time
+
+from app import heartbeat, sqs_client
+
+
+def test_beat_extends_only_messages_about_to_expire(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sqs_client, "change_visibility_batch", lambda changes, queue_url=None: calls.append(changes) or [])
+    hb = heartbeat.VisibilityHeartbeat(visibility_timeout=30, margin=10, extension=30)
+    hb.track(["soon"])
+    hb.beat()
+    assert calls == []
+    hb._tracked["soon"] = (time.monotonic(), time.monotonic() + 5, None)
+    hb.beat()
+    assert calls == [[("soon", 30)]]
+    assert hb.extended == 1
+
+
+def test_failed_extension_stops_tracking(monkeypatch):
+    monkeypatch.setattr(sqs_client, "change_visibility_batch", lambda changes, queue_url=None: [h for h, _ in changes])
+    hb = heartbeat.VisibilityHeartbeat(visibility_timeout=5, margin=10)
+    hb.track(["gone"])
+    hb.beat()
+    assert hb.in_flight == 0
+
+
+def test_untrack_waits_for_an_extension_in_flight(monkeypatch):
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_change(changes, queue_url=None):
+        started.set()
+        finish.wait(5)
+        return []
+
+    monkeypatch.setattr(sqs_client, "change_visibility_batch", slow_change)
+    hb = heartbeat.VisibilityHeartbeat(visibility_timeout=5, margin=10)
+    hb.track(["retrying"])
+    beat = threading.Thread(target=hb.beat)
+    beat.start()
+    assert started.wait(5)
+
+    untracked = threading.Event()
+    waiter = threading.Thread(target=lambda: (hb.untrack("retrying", wait=True), untracked.set()))
+    waiter.start()
+    # A retry delay set now would be overwritten by the extension still in flight
+    assert not untracked.wait(0.1)
+    finish.set()
+    assert untracked.wait(5)
+    beat.join(5)
+    waiter.join(5)
+    assert hb.in_flight == 0
+
+
+def test_untrack_without_an_extension_returns_at_once():
+    hb = heartbeat.VisibilityHeartbeat(visibility_timeout=30)
+    hb.track(["done"])
+    hb.untrack("done", wait=True)
+    assert hb.in_flight == 0
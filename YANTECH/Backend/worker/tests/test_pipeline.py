@@ -0,0 +1,90 @@
+import queue
+import threading
+import time
+from collections import Counter
+
+from app.pipeline import MessagePipeline
+
+
+def make_pipeline(max_in_flight: int, **kwargs) -> MessagePipeline:
+    return MessagePipeline(lambda msg: True, lambda msg: None, max_in_flight, **kwargs)
+
+
+def wait_until(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_reserve_takes_only_free_slots():
+    pipeline = make_pipeline(4)
+    assert pipeline.reserve(10) == 4
+    assert pipeline.available() == 0
+    assert pipeline.reserve(1, timeout=0.01) == 0
+    pipeline.release(3)
+    assert pipeline.reserve(10) == 3
+    pipeline.shutdown()
+
+
+def test_headroom_is_kept_for_other_tiers():
+    pipeline = make_pipeline(4, weights={"high": 8, "bulk": 1}, headroom={"bulk": 1})
+    assert pipeline.reserve(10, tier="bulk") == 3
+    assert pipeline.reserve(1, tier="bulk", timeout=0.01) == 0
+    assert pipeline.reserve(10, tier="high") == 1
+    pipeline.shutdown()
+
+
+def contend(pipeline: MessagePipeline, rounds: int) -> Counter:
+    """Hand the pipeline's only slot out ``rounds`` times while both tiers wait for it."""
+    assert pipeline.reserve(1) == 1
+    winners: "queue.Queue[str]" = queue.Queue()
+    stop = threading.Event()
+
+    def poller(tier: str) -> None:
+        while not stop.is_set():
+            if pipeline.reserve(1, tier=tier, timeout=5) and not stop.is_set():
+                winners.put(tier)
+
+    threads = [threading.Thread(target=poller, args=(tier,), daemon=True) for tier in ("high", "bulk")]
+    for thread in threads:
+        thread.start()
+    counts: Counter = Counter()
+    for _ in range(rounds):
+        wait_until(lambda: pipeline._waiting.get("high") == 1 and pipeline._waiting.get("bulk") == 1)
+        pipeline.release(1)
+        counts[winners.get(timeout=5)] += 1
+    stop.set()
+    # Let both pollers return from their last reserve
+    pipeline.release(2)
+    for thread in threads:
+        thread.join(5)
+    pipeline.shutdown()
+    return counts
+
+
+def test_backlogged_tiers_share_by_weight():
+    pipeline = make_pipeline(1, weights={"high": 3, "bulk": 1})
+    assert contend(pipeline, 40) == {"high": 30, "bulk": 10}
+
+
+def test_idle_tier_does_not_bank_credit():
+    pipeline = make_pipeline(1, weights={"high": 1, "bulk": 1})
+    # Bulk runs alone for a while before high arrives
+    for _ in range(20):
+        assert pipeline.reserve(1, tier="bulk") == 1
+        pipeline.release(1)
+    # High starts from the current virtual clock: at most a turn ahead, not 20 turns of saved credit
+    counts = contend(pipeline, 10)
+    assert counts["bulk"] >= 4 and counts["high"] >= 4
+
+
+def test_submitted_messages_are_acknowledged_and_release_slots():
+    acknowledged = []
+    pipeline = MessagePipeline(lambda msg: msg["ok"], acknowledged.append, 2)
+    for ok in (True, False, True):
+        pipeline.submit({"ok": ok})
+    assert pipeline.drain(5)
+    assert len(acknowledged) == 2
+    assert pipeline.available() == 2
+    pipeline.shutdown()
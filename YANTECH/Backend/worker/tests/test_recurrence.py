@@ -0,0 +1,63 @@
+from datetime import datetime, time, timezone
+
+from app.recurrence import first_run, is_recurring, next_occurrence
+
+NOW = datetime(2026, 10, 17, 14, 0, 30, tzinfo=timezone.utc)
+
+
+def utc(*args: int) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_is_recurring():
+    assert not is_recurring(None)
+    assert not is_recurring({})
+    assert not is_recurring({"Once": True, "Days": [1]})
+    assert is_recurring({"Days": [1]})
+    assert is_recurring({"Months": [], "Years": [2027]})
+
+
+def test_next_occurrence_is_strictly_after():
+    at = time(9, 0)
+    assert next_occurrence({}, at, utc(2026, 10, 17, 8, 59)) == utc(2026, 10, 17, 9, 0)
+    assert next_occurrence({}, at, utc(2026, 10, 17, 9, 0)) == utc(2026, 10, 18, 9, 0)
+
+
+def test_next_occurrence_days_of_month():
+    # The 31st is skipped in months that do not have one
+    assert next_occurrence({"Days": [31]}, time(8, 0), utc(2026, 10, 31, 9, 0)) == utc(2026, 12, 31, 8, 0)
+
+
+def test_next_occurrence_months_wrap_to_next_year():
+    assert next_occurrence({"Months": [2], "Days": [1]}, None, utc(2026, 10, 17)) == utc(2027, 2, 1)
+
+
+def test_next_occurrence_iso_weeks():
+    # ISO week 1 of 2027 starts on Monday 4 January
+    assert next_occurrence({"Weeks": [1]}, None, utc(2026, 12, 30)) == utc(2027, 1, 4)
+
+
+def test_next_occurrence_ends_after_last_year():
+    assert next_occurrence({"Years": [2026], "Months": [3]}, None, utc(2026, 10, 17)) is None
+
+
+def test_first_run_without_schedule_sends_now():
+    assert first_run({}, NOW) is None
+
+
+def test_first_run_past_time_is_due_at_once_with_or_without_date():
+    # A one-off start that has passed must not be pushed to tomorrow
+    assert first_run({"Time": "14:00"}, NOW) == utc(2026, 10, 17, 14, 0)
+    assert first_run({"Date": "2026-10-17", "Time": "14:00"}, NOW) == utc(2026, 10, 17, 14, 0)
+
+
+def test_first_run_future_one_off():
+    assert first_run({"Time": "15:30"}, NOW) == utc(2026, 10, 17, 15, 30)
+    assert first_run({"Date": "2026-12-01"}, NOW) == utc(2026, 12, 1, 0, 0)
+
+
+def test_first_run_recurring_starts_at_or_after_now():
+    request = {"Time": "09:00", "Interval": {"Days": [1, 17]}}
+    assert first_run(request, NOW) == utc(2026, 11, 1, 9, 0)
+    request = {"Date": "2027-01-01", "Time": "09:00", "Interval": {"Days": [1, 17]}}
+    assert first_run(request, NOW) == utc(2027, 1, 1, 9, 0)